@@ -0,0 +1,272 @@
+"""
+Materialized aggregates for the canned structured intents.
+
+Revenue growth, total revenue, expenses and investments, revenue by category, monthly
+medical costs and diagnosis trends (sql_intents) all reduce to four small rollups: per
+year and per (year, category) sums of FINANCIAL_TRANSACTIONS, and per (year, month) and
+(year, diagnosis) aggregates of MEDICAL_RECORDS. The store runs those rollups, derives the
+rows each intent's statement returns for every year in the data - same groups, same
+aggregate expressions, same order - and keys them by the normalized SQL nlq_to_sql
+generates for that intent and year, so a matching statement is answered from memory.
+
+A daemon thread reads each table's watermark (max id or date and the row count) every
+AGGREGATE_CHECK_INTERVAL seconds and rebuilds the table's answers when it moved, or when
+they are older than AGGREGATE_REFRESH_INTERVAL. Answers are served only while the last
+successful check is at most AGGREGATE_MAX_STALENESS seconds old; they carry that time as
+as_of, and anything else falls through to the warehouse.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from config import (AGGREGATE_STORE_ENABLED, AGGREGATE_CHECK_INTERVAL, AGGREGATE_REFRESH_INTERVAL,
+                    AGGREGATE_MAX_STALENESS)
+from nlq_processor import intent_sql
+from query_result import LocalAnswer, describe_columns
+from result_cache import normalize_sql
+from result_store import get_result_store
+from snowflake_connector import describe_sql, execute_sql
+from sql_intents import SQL_INTENTS
+
+# Per table: the watermark statement, and the rollups its intents are derived from
+_TABLES = {
+    'FINANCIAL_TRANSACTIONS': {
+        'watermark': "SELECT MAX(transaction_id), MAX(transaction_date), COUNT(*) FROM FINANCIAL_TRANSACTIONS",
+        'rollups': {
+            'by_year': "SELECT YEAR(transaction_date), SUM(CASE WHEN amount > 0 THEN amount END), "
+                       "SUM(CASE WHEN amount < 0 THEN ABS(amount) END) "
+                       "FROM FINANCIAL_TRANSACTIONS GROUP BY YEAR(transaction_date)",
+            'by_category': "SELECT YEAR(transaction_date), category, SUM(CASE WHEN amount > 0 THEN amount END), "
+                           "SUM(amount) FROM FINANCIAL_TRANSACTIONS GROUP BY YEAR(transaction_date), category",
+        },
+    },
+    'MEDICAL_RECORDS': {
+        'watermark': "SELECT MAX(visit_date), COUNT(*) FROM MEDICAL_RECORDS",
+        'rollups': {
+            'by_month': "SELECT YEAR(visit_date), MONTH(visit_date), SUM(treatment_cost) "
+                        "FROM MEDICAL_RECORDS GROUP BY YEAR(visit_date), MONTH(visit_date)",
+            'by_diagnosis': "SELECT YEAR(visit_date), diagnosis, COUNT(*) "
+                            "FROM MEDICAL_RECORDS GROUP BY YEAR(visit_date), diagnosis",
+        },
+    },
+}
+
+
+def _by_value_desc(rows: list) -> list:
+    # ORDER BY value DESC, key - the intents break ties on the group key, so the order is the warehouse's
+    return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+
+def _financial_answers(rollups: dict, years: set) -> dict:
+    by_year = {row[0]: row[1:] for row in rollups['by_year']}
+    answers = {('revenue_growth', None): sorted((year, sums[0]) for year, sums in by_year.items()
+                                                if sums[0] is not None)}
+    for year in years:
+        revenue, expenses = by_year.get(year, (None, None))
+        categories = [row[1:] for row in rollups['by_category'] if row[0] == year]
+        investments = next((total for category, _, total in categories if category == 'Investment'), None)
+        answers[('total_revenue', year)] = [(revenue,)]
+        answers[('total_expenses', year)] = [(expenses,)]
+        answers[('investment_total', year)] = [(investments,)]
+        answers[('revenue_by_category', year)] = _by_value_desc(
+            [(category, revenue) for category, revenue, _ in categories if revenue is not None])
+    return answers
+
+
+def _medical_answers(rollups: dict, years: set) -> dict:
+    answers = {}
+    for year in years:
+        answers[('monthly_medical_costs', year)] = sorted(tuple(row[1:]) for row in rollups['by_month']
+                                                          if row[0] == year)
+        answers[('diagnosis_trends', year)] = _by_value_desc([tuple(row[1:]) for row in rollups['by_diagnosis']
+                                                              if row[0] == year])
+    return answers
+
+
+_DERIVE = {'FINANCIAL_TRANSACTIONS': _financial_answers, 'MEDICAL_RECORDS': _medical_answers}
+
+
+class _TableState:
+    __slots__ = ('watermark', 'built_at', 'verified_at', 'keys')
+
+    def __init__(self, watermark: tuple, built_at: float, keys: list):
+        self.watermark = watermark
+        self.built_at = built_at
+        self.verified_at = built_at
+        self.keys = keys
+
+
+class AggregateStore:
+    """In-memory answers of the canned intents, kept current by a watermark-polling thread"""
+
+    def __init__(self, check_interval: float = AGGREGATE_CHECK_INTERVAL,
+                 refresh_interval: float = AGGREGATE_REFRESH_INTERVAL,
+                 max_staleness: float = AGGREGATE_MAX_STALENESS, enabled: bool = AGGREGATE_STORE_ENABLED):
+        self.check_interval = check_interval
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        # normalized SQL -> (table, columns, rows); table -> _TableState
+        self._answers = {}
+        self._tables = {}
+        # intent name -> cursor description; column names and types don't change between refreshes
+        self._descriptions = {}
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'checks': 0, 'refreshes': 0, 'errors': 0,
+                       'last_refresh_ms': 0.0}
+
+    def _bump(self, key: str, amount: float = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _describe(self, intent, year: int) -> tuple:
+        description = self._descriptions.get(intent.name)
+        if description is None:
+            description = self._descriptions[intent.name] = describe_sql(intent_sql(intent, year))
+        return description
+
+    def _build(self, table: str) -> dict:
+        """normalized SQL -> (columns, rows) for every intent of table and year in its data"""
+        rollups = {name: execute_sql(sql, use_cache=False) for name, sql in _TABLES[table]['rollups'].items()}
+        years = {row[0] for rows in rollups.values() for row in rows if row[0] is not None}
+        years.add(time.localtime().tm_year)
+        answers = {}
+        intents = {intent.name: intent for intent in SQL_INTENTS}
+        for (name, year), rows in _DERIVE[table](rollups, years).items():
+            intent = intents[name]
+            sql_year = year if year is not None else time.localtime().tm_year
+            columns = describe_columns(self._describe(intent, sql_year), rows)
+            answers[normalize_sql(intent_sql(intent, sql_year))] = (columns, rows)
+        return answers
+
+    def refresh(self, force: bool = False) -> dict:
+        """
+        Checks every table's watermark once and rebuilds the answers of tables whose data
+        moved (or all of them, with force); returns table -> 'current', 'refreshed' or 'error'
+        """
+        outcome = {}
+        with self._refresh_lock:
+            for table, spec in _TABLES.items():
+                checked_at = time.time()
+                self._bump('checks')
+                try:
+                    watermark = tuple(execute_sql(spec['watermark'], use_cache=False)[0])
+                    state = self._tables.get(table)
+                    if (not force and state is not None and state.watermark == watermark
+                            and checked_at - state.built_at < self.refresh_interval):
+                        state.verified_at = checked_at
+                        outcome[table] = 'current'
+                        continue
+                    started = time.perf_counter()
+                    answers = self._build(table)
+                except Exception as e:
+                    print(f"⚠️  Aggregate refresh of {table} failed: {e}")
+                    self._bump('errors')
+                    outcome[table] = 'error'
+                    continue
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with self._lock:
+                    previous = self._tables.get(table)
+                    for key in previous.keys if previous is not None else ():
+                        self._answers.pop(key, None)
+                    for key, (columns, rows) in answers.items():
+                        self._answers[key] = (table, columns, rows)
+                    # The watermark was read before the rollups ran, so newer rows only trigger another rebuild
+                    self._tables[table] = _TableState(watermark, checked_at, list(answers))
+                    self._stats['refreshes'] += 1
+                    self._stats['last_refresh_ms'] = elapsed_ms
+                print(f"🧮 Materialized {len(answers)} aggregate answers for {table} in {elapsed_ms:.0f}ms")
+                outcome[table] = 'refreshed'
+        return outcome
+
+    def _ensure_refresher(self):
+        # Threads do not survive a fork, so a worker that inherited this object starts its own
+        if not self._stopped and (self._thread is None or not self._thread.is_alive()):
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._refresh_loop, name='aggregate-refresh',
+                                                    daemon=True)
+                    self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stopped:
+            self.refresh()
+            self._wakeup.wait(self.check_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Starts the background refresher, which materializes the aggregates right away"""
+        if self.enabled:
+            self._ensure_refresher()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def answer(self, sql: str, max_rows: int) -> Optional[LocalAnswer]:
+        """
+        The materialized result of sql, shaped like fetch_sql_spooled(), or None when sql is
+        not a materialized statement or its table was not verified recently enough
+        """
+        if not self.enabled:
+            return None
+        self._ensure_refresher()
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._answers.get(key)
+            state = self._tables.get(entry[0]) if entry is not None else None
+            as_of = state.verified_at if state is not None else None
+            built_at = state.built_at if state is not None else None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if time.time() - as_of > self.max_staleness:
+                self._stats['stale'] += 1
+                return None
+            self._stats['hits'] += 1
+        _, columns, rows = entry
+        result_id = None
+        store = get_result_store()
+        if store.enabled and len(rows) > store.threshold:
+            # Spool the rows like a warehouse result, so the answer pages the same way; a spool
+            # from before the last rebuild holds older rows
+            result_id = store.find(sql, since=built_at)
+            if result_id is None:
+                spill = store.spill(sql)
+                spill.add(list(rows))
+                result_id = spill.close(columns, len(rows))
+        return LocalAnswer(columns, list(rows[:max_rows]), len(rows), result_id, as_of)
+
+    def stats(self) -> dict:
+        """Answers served from memory and refresh counters of this process, plus each table's freshness"""
+        now = time.time()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['answers'] = len(self._answers)
+            stats['tables'] = {table: {'watermark': [str(value) for value in state.watermark],
+                                       'built_seconds_ago': round(now - state.built_at, 1),
+                                       'staleness_seconds': round(now - state.verified_at, 1)}
+                               for table, state in self._tables.items()}
+        stats['enabled'] = self.enabled
+        stats['max_staleness'] = self.max_staleness
+        return stats
+
+
+_store: Optional[AggregateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_aggregate_store() -> AggregateStore:
+    """Returns the process-wide aggregate store; its refresher starts on the first answer()"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AggregateStore()
+    return _store
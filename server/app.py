@@ -1,35 +1,42 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import json
 import os
 from datetime import datetime, timedelta
 import random
 import re
 import sys
+import itertools
+import time
 import requests
-from openai import AzureOpenAI
 
 # Add the server directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the existing NLQ processing logic
-from main import process_nlq
-
-# Initialize Azure OpenAI client (optional - only if credentials are available)
-openai_client = None
-azure_endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
-azure_api_key = os.getenv('AZURE_OPENAI_API_KEY')
-
-if azure_endpoint and azure_api_key:
-    try:
-        openai_client = AzureOpenAI(
-            api_key=azure_api_key,
-            api_version=os.getenv('AZURE_OPENAI_API_VERSION', '2024-12-01-preview'),
-            azure_endpoint=azure_endpoint
-        )
-        print("✅ Azure OpenAI client initialized in Flask app")
-    except Exception as e:
-        print(f"⚠️  Failed to initialize Azure OpenAI client: {e}")
-else:
+from main import process_nlq, iter_nlq_events
+from query_result import QueryResult
+from snowflake_connector import get_pool_stats, iter_sql_result
+from nlq_processor import _CLIENT_NOT_CONFIGURED, nlq_to_sql
+from result_export import EXPORT_FORMATS, export_available, iter_export
+from result_cache import get_sql_cache
+from translation_cache import get_translation_cache, normalize_nlq
+from summary_cache import get_summary_cache
+from report_index import get_report_index
+from passage_ranker import get_passage_stats
+from sql_intents import get_intent_stats
+from entra_token import get_token_stats
+from llm_client import get_llm_client, get_async_llm_client, get_llm_pool_stats
+from single_flight import get_single_flight, get_single_flight_stats
+from result_store import get_result_store
+from aggregate_store import get_aggregate_store
+from table_replica import get_table_replica
+from config import RESULT_PAGE_SIZE, RESULT_PAGE_MAX_SIZE, SNOWFLAKE_FETCH_BATCH_SIZE
+
+# Azure OpenAI clients from the shared registry (None when credentials are not configured)
+openai_client = get_llm_client('summary')
+narrative_client = get_llm_client('narrative')
+if openai_client is None:
     print("⚠️  Azure OpenAI credentials not configured - AI features will be limited")
 
 app = Flask(__name__)
@@ -54,60 +61,80 @@ def analyze_sentiment(query: str) -> str:
 # --- End Sentiment Analysis Function ---
 
 
+def _results_context(results_text: str) -> str:
+    """Describes deterministic results for the summary prompt"""
+    # Handle multi-line results (like year-by-year breakdowns)
+    if '\n' in results_text:
+        lines = results_text.strip().split('\n')
+        if len(lines) > 1 and '|' in results_text:
+            # Format multi-line data for better context
+            formatted_data = ""
+            for line in lines:
+                if '|' in line:
+                    parts = [p.strip() for p in line.split('|')]
+                    if len(parts) == 2:
+                        year, amount = parts
+                        if year.isdigit() and len(year) == 4:
+                            formatted_data += f"Year {year}: ${amount}\n"
+                        else:
+                            formatted_data += f"{year}: ${amount}\n"
+            return f"Multi-year data:\n{formatted_data}"
+        return f"Results: {results_text}"
+    # Single value results
+    try:
+        value = float(results_text.replace(',', ''))
+        formatted_value = f"${value:,.2f}" if value >= 0 else f"-${abs(value):,.2f}"
+        return f"Result: {formatted_value}"
+    except:
+        return f"Result: {results_text}"
+
+
+def _fallback_summary(results_text: str) -> str:
+    """Plain summary used when OpenAI is unavailable or fails"""
+    try:
+        value = float(results_text.replace(',', ''))
+        formatted_value = f"${value:,.2f}" if value >= 0 else f"-${abs(value):,.2f}"
+        return f"Based on your query, the result is {formatted_value}."
+    except:
+        return f"Based on your query, the result is {results_text}."
+
+
+def _summary_messages(query: str, results_text: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": "You are a professional AI assistant helping with financial and medical data analysis. Generate natural, conversational responses that are well-structured and visually appealing. Use bullet points, numbered lists, and clear formatting when presenting data. Always be helpful, concise, and provide insights. Format currency properly for financial data and medical costs. Be conversational but professional. Structure your responses with:\n\n• Key findings as bullet points\n• Clear insights and analysis\n• Easy-to-scan formatting\n• Professional but friendly tone\n\nMake the data easy to understand and visually appealing."
+        },
+        {
+            "role": "user",
+            "content": f"User asked: '{query}'\n\nData found: {_results_context(results_text)}\n\nPlease provide a natural, conversational response explaining this result. Keep it concise but informative, and make it sound like you're having a friendly conversation about the data."
+        }
+    ]
+
+
+def _summary_flight_key(query: str, results_text: str) -> tuple:
+    return 'structured', normalize_nlq(query), results_text
+
+
 def create_human_readable_summary(query: str, results_text: str) -> str:
     """
     Generate conversational AI responses using OpenAI GPT for natural language responses.
+    Identical concurrent requests share one LLM call.
     """
-    try:
-        # Handle multi-line results (like year-by-year breakdowns)
-        if '\n' in results_text:
-            lines = results_text.strip().split('\n')
-            if len(lines) > 1 and '|' in results_text:
-                # Format multi-line data for better context
-                formatted_data = ""
-                for line in lines:
-                    if '|' in line:
-                        parts = [p.strip() for p in line.split('|')]
-                        if len(parts) == 2:
-                            year, amount = parts
-                            if year.isdigit() and len(year) == 4:
-                                formatted_data += f"Year {year}: ${amount}\n"
-                            else:
-                                formatted_data += f"{year}: ${amount}\n"
-                results_context = f"Multi-year data:\n{formatted_data}"
-            else:
-                results_context = f"Results: {results_text}"
-        else:
-            # Single value results
-            try:
-                value = float(results_text.replace(',', ''))
-                formatted_value = f"${value:,.2f}" if value >= 0 else f"-${abs(value):,.2f}"
-                results_context = f"Result: {formatted_value}"
-            except:
-                results_context = f"Result: {results_text}"
-
-        # Check if OpenAI client is available
-        if openai_client is None:
-            try:
-                value = float(results_text.replace(',', ''))
-                formatted_value = f"${value:,.2f}" if value >= 0 else f"-${abs(value):,.2f}"
-                return f"Based on your query, the result is {formatted_value}."
-            except:
-                return f"Based on your query, the result is {results_text}."
+    return get_single_flight('summarization').do(_summary_flight_key(query, results_text),
+                                                 _generate_human_readable_summary, query, results_text)
 
+
+def _generate_human_readable_summary(query: str, results_text: str) -> str:
+    # Check if OpenAI client is available
+    if openai_client is None:
+        return _fallback_summary(results_text)
+
+    try:
         # Generate conversational response using Azure OpenAI
         response = openai_client.chat.completions.create(
             model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a professional AI assistant helping with financial and medical data analysis. Generate natural, conversational responses that are well-structured and visually appealing. Use bullet points, numbered lists, and clear formatting when presenting data. Always be helpful, concise, and provide insights. Format currency properly for financial data and medical costs. Be conversational but professional. Structure your responses with:\n\n• Key findings as bullet points\n• Clear insights and analysis\n• Easy-to-scan formatting\n• Professional but friendly tone\n\nMake the data easy to understand and visually appealing."
-                },
-                {
-                    "role": "user",
-                    "content": f"User asked: '{query}'\n\nData found: {results_context}\n\nPlease provide a natural, conversational response explaining this result. Keep it concise but informative, and make it sound like you're having a friendly conversation about the data."
-                }
-            ],
+            messages=_summary_messages(query, results_text),
             temperature=0.7,
             max_tokens=200
         )
@@ -118,110 +145,151 @@ def create_human_readable_summary(query: str, results_text: str) -> str:
     except Exception as e:
         print(f"OpenAI API error: {e}", flush=True)
         # Fallback to a simple response if OpenAI fails
-        try:
-            value = float(results_text.replace(',', ''))
-            formatted_value = f"${value:,.2f}" if value >= 0 else f"-${abs(value):,.2f}"
-            return f"Based on your query, the result is {formatted_value}."
-        except:
-            return f"Based on your query, the result is {results_text}."
+        return _fallback_summary(results_text)
 
-@app.route('/api/process-nlq', methods=['POST'])
-def process_nlq_endpoint():
+
+async def create_human_readable_summary_async(query: str, results_text: str) -> str:
+    """Async counterpart of create_human_readable_summary()"""
+    return await get_single_flight('summarization').do_async(
+        _summary_flight_key(query, results_text), _generate_human_readable_summary_async, query, results_text)
+
+
+async def _generate_human_readable_summary_async(query: str, results_text: str) -> str:
+    async_client = get_async_llm_client('summary')
+    if async_client is None:
+        return _fallback_summary(results_text)
+
+    try:
+        response = await async_client.chat.completions.create(
+            model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
+            messages=_summary_messages(query, results_text),
+            temperature=0.7,
+            max_tokens=200
+        )
+
+        ai_response = response.choices[0].message.content
+        return ai_response.strip() if ai_response else "I couldn't generate a response at the moment."
+
+    except Exception as e:
+        print(f"OpenAI API error: {e}", flush=True)
+        return _fallback_summary(results_text)
+
+
+def stream_human_readable_summary(query: str, results_text: str):
     """
-    API endpoint for processing natural language queries
+    Streaming variant of create_human_readable_summary: yields tokens as they arrive and
+    returns the complete summary, so callers use `summary = yield from ...`. A request
+    joining an identical summary already streaming gets it whole, as one token.
     """
-    try:
-        # Get the JSON data from the request
-        data = request.get_json(silent=True)
-        if not data:
-            data = {}
+    return (yield from get_single_flight('summarization').do_stream(
+        _summary_flight_key(query, results_text), _stream_human_readable_summary, query, results_text))
 
-        if not data or 'query' not in data:
-            return jsonify({
-                'error': 'Missing query parameter',
-                'query': '',
-                'sql': '',
-                'results': []
-            }), 400
 
-        nlq = data['query']
-        print(f"Processing NLQ via API: {nlq}", flush=True)
+def _stream_human_readable_summary(query: str, results_text: str):
+    if openai_client is None:
+        return _fallback_summary(results_text)
 
-        # Process the query using existing logic
-        result = process_nlq(nlq)
-        print(f"Raw result from process_nlq: {result}", flush=True)
+    tokens = []
+    try:
+        stream = openai_client.chat.completions.create(
+            model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
+            messages=_summary_messages(query, results_text),
+            temperature=0.7,
+            max_tokens=200,
+            stream=True
+        )
+        for chunk in stream:
+            # Azure sends a leading chunk with prompt filter results and no choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                tokens.append(chunk.choices[0].delta.content)
+                yield tokens[-1]
+    except Exception as e:
+        print(f"OpenAI API error: {e}", flush=True)
+        # Tokens already sent stay on screen; the final summary replaces them
+        return _fallback_summary(results_text)
+
+    ai_response = ''.join(tokens).strip()
+    return ai_response if ai_response else "I couldn't generate a response at the moment."
 
-        # Check for GenAI Suite Invoice response
-        if result == "genai_invoice_suite":
-            # Fetch real invoice data from Node.js endpoint
-            try:
-                # Detect if user is asking about a specific status or vendor
-                status_filter = None
-                vendor_filter = None
-                nlq_lower = nlq.lower()
-
-                # Status filters
-                if 'pending approval' in nlq_lower or 'awaiting approval' in nlq_lower:
-                    status_filter = 'pending approval'
-                elif 'exception' in nlq_lower:
-                    status_filter = 'exception'
-                elif 'posted' in nlq_lower:
-                    status_filter = 'posted'
-                elif 'validating' in nlq_lower:
-                    status_filter = 'validating'
-
-                # Vendor filters (AP vendors)
-                if 'tech solutions' in nlq_lower:
-                    vendor_filter = 'Tech Solutions'
-                elif 'global tech' in nlq_lower:
-                    vendor_filter = 'Global Tech'
-                elif 'office supplies' in nlq_lower:
-                    vendor_filter = 'Office Supplies'
-                elif 'cloud services' in nlq_lower:
-                    vendor_filter = 'Cloud Services'
-                elif 'consulting partners' in nlq_lower:
-                    vendor_filter = 'Consulting Partners'
-
-                # Build API params - always set type to payable for AP requests
-                params = {'type': 'payable'}
-                if status_filter:
-                    params['status'] = status_filter
-                if vendor_filter:
-                    params['vendor'] = vendor_filter
-
-                print(f"AP API request params: {params}", flush=True)
-                invoice_data_response = requests.get('http://localhost:5000/api/genai-invoices', params=params, timeout=5)
-                invoice_data = invoice_data_response.json()
-                print(f"AP API response: {invoice_data}", flush=True)
-
-                # Format invoice data for the AI
-                invoices = invoice_data.get('invoices', [])
-                summary = invoice_data.get('summary', {})
-
-                # Build invoice data string for AI
-                invoice_details = ""
-                for inv in invoices:
-                    invoice_details += f"• {inv['vendor']} - Invoice ID: {inv['id']} - Amount: ${inv['amount']:,.2f} - Due: {inv['dueDate']}\n"
-
-                # Detect if this is an action request (approve, reject, update, change)
-                is_action_request = any(word in nlq_lower for word in ['approve', 'reject', 'update', 'change status', 'modify'])
-
-                # Generate AI-powered response with real invoice data
-                if openai_client is None:
-                    ai_summary = f"**Invoice Summary**\n\nFound {summary['count']} invoices totaling ${summary['total']:,.2f}.\n\n{invoice_details}\n\nView details in GenAI Suite dashboard below."
-                else:
-                    if is_action_request:
-                        # Get today's date for approval date
-                        from datetime import datetime
-                        today = datetime.now().strftime('%Y-%m-%d')
-
-                        # For action requests, show detailed success confirmation
-                        invoice_response = openai_client.chat.completions.create(
-                            model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": f"""You are an AI assistant for accounts payable. For approval requests, provide a detailed success confirmation.
+
+def build_nlq_response(nlq: str, result: QueryResult, human_readable_summary: str | None = None) -> dict:
+    """
+    Builds the /api/process-nlq JSON payload for a process_nlq result. Payloads with an
+    'error' key are server errors. A precomputed summary (e.g. one already streamed to the
+    client) skips the summary LLM call for structured results.
+    """
+    route = result.route
+    # Check for GenAI Suite Invoice response
+    if route == "genai_invoice_suite":
+        # Fetch real invoice data from Node.js endpoint
+        try:
+            # Detect if user is asking about a specific status or vendor
+            status_filter = None
+            vendor_filter = None
+            nlq_lower = nlq.lower()
+
+            # Status filters
+            if 'pending approval' in nlq_lower or 'awaiting approval' in nlq_lower:
+                status_filter = 'pending approval'
+            elif 'exception' in nlq_lower:
+                status_filter = 'exception'
+            elif 'posted' in nlq_lower:
+                status_filter = 'posted'
+            elif 'validating' in nlq_lower:
+                status_filter = 'validating'
+
+            # Vendor filters (AP vendors)
+            if 'tech solutions' in nlq_lower:
+                vendor_filter = 'Tech Solutions'
+            elif 'global tech' in nlq_lower:
+                vendor_filter = 'Global Tech'
+            elif 'office supplies' in nlq_lower:
+                vendor_filter = 'Office Supplies'
+            elif 'cloud services' in nlq_lower:
+                vendor_filter = 'Cloud Services'
+            elif 'consulting partners' in nlq_lower:
+                vendor_filter = 'Consulting Partners'
+
+            # Build API params - always set type to payable for AP requests
+            params = {'type': 'payable'}
+            if status_filter:
+                params['status'] = status_filter
+            if vendor_filter:
+                params['vendor'] = vendor_filter
+
+            print(f"AP API request params: {params}", flush=True)
+            invoice_data_response = requests.get('http://localhost:5000/api/genai-invoices', params=params, timeout=5)
+            invoice_data = invoice_data_response.json()
+            print(f"AP API response: {invoice_data}", flush=True)
+
+            # Format invoice data for the AI
+            invoices = invoice_data.get('invoices', [])
+            summary = invoice_data.get('summary', {})
+
+            # Build invoice data string for AI
+            invoice_details = ""
+            for inv in invoices:
+                invoice_details += f"• {inv['vendor']} - Invoice ID: {inv['id']} - Amount: ${inv['amount']:,.2f} - Due: {inv['dueDate']}\n"
+
+            # Detect if this is an action request (approve, reject, update, change)
+            is_action_request = any(word in nlq_lower for word in ['approve', 'reject', 'update', 'change status', 'modify'])
+
+            # Generate AI-powered response with real invoice data
+            if openai_client is None:
+                ai_summary = f"**Invoice Summary**\n\nFound {summary['count']} invoices totaling ${summary['total']:,.2f}.\n\n{invoice_details}\n\nView details in GenAI Suite dashboard below."
+            else:
+                if is_action_request:
+                    # Get today's date for approval date
+                    from datetime import datetime
+                    today = datetime.now().strftime('%Y-%m-%d')
+
+                    # For action requests, show detailed success confirmation
+                    invoice_response = narrative_client.chat.completions.create(
+                        model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": f"""You are an AI assistant for accounts payable. For approval requests, provide a detailed success confirmation.
 
 FORMAT FOR APPROVAL CONFIRMATION:
 Show approval success details professionally with all relevant information.
@@ -238,140 +306,140 @@ EXAMPLE:
 **Payment Update**: Invoice has been queued for payment processing. Payment will be processed within 2-3 business days. Vendor notification email sent automatically.
 
 View complete details in GenAI Suite dashboard below."""
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"User asked: '{nlq}'\n\nInvoice:\n{invoice_details}\n\nGenerate a detailed approval success confirmation showing invoice ID, vendor, status change, invoice amount, approval method (Manager Approval), approval date ({today}), and payment update message. Make it look professional and complete."
-                                }
-                            ],
-                            temperature=0.7,
-                            max_tokens=250
-                        )
-                    else:
-                        # For viewing queries, keep concise format
-                        invoice_response = openai_client.chat.completions.create(
-                            model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": """You are an AI assistant for invoice information. Provide CONCISE responses.
+                            },
+                            {
+                                "role": "user",
+                                "content": f"User asked: '{nlq}'\n\nInvoice:\n{invoice_details}\n\nGenerate a detailed approval success confirmation showing invoice ID, vendor, status change, invoice amount, approval method (Manager Approval), approval date ({today}), and payment update message. Make it look professional and complete."
+                            }
+                        ],
+                        temperature=0.7,
+                        max_tokens=250
+                    )
+                else:
+                    # For viewing queries, keep concise format
+                    invoice_response = narrative_client.chat.completions.create(
+                        model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": """You are an AI assistant for invoice information. Provide CONCISE responses.
 
 FORMAT:
 **Status**: **Count** totaling **$Amount**
 • **Vendor** - **Invoice ID** - **$Amount** - Due: Date
 
 View details in GenAI Suite dashboard below."""
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"User asked: '{nlq}'\n\nInvoice Data:\n{invoice_details}\n\nTotal: {summary['count']} invoices, ${summary['total']:,.2f}\n\nProvide a concise response (3-4 lines) with bullet points and bold for key info."
-                                }
-                            ],
-                            temperature=0.7,
-                            max_tokens=150
-                        )
-                    ai_summary = invoice_response.choices[0].message.content.strip() if invoice_response.choices[0].message.content else ""
-
-            except Exception as e:
-                print(f"Error fetching or processing invoice data: {e}", flush=True)
-                ai_summary = "**Invoice Information**\n\nTo view your invoice details including IDs, amounts, statuses, and vendor information, please access the GenAI Suite dashboard below."
+                            },
+                            {
+                                "role": "user",
+                                "content": f"User asked: '{nlq}'\n\nInvoice Data:\n{invoice_details}\n\nTotal: {summary['count']} invoices, ${summary['total']:,.2f}\n\nProvide a concise response (3-4 lines) with bullet points and bold for key info."
+                            }
+                        ],
+                        temperature=0.7,
+                        max_tokens=150
+                    )
+                ai_summary = invoice_response.choices[0].message.content.strip() if invoice_response.choices[0].message.content else ""
+
+        except Exception as e:
+            print(f"Error fetching or processing invoice data: {e}", flush=True)
+            ai_summary = "**Invoice Information**\n\nTo view your invoice details including IDs, amounts, statuses, and vendor information, please access the GenAI Suite dashboard below."
+
+        return {
+            'query': nlq,
+            'message': 'genai_invoice_suite',
+            'summary': ai_summary,
+            'sql': '',
+            'results': []
+        }
 
-            return jsonify({
-                'query': nlq,
-                'message': 'genai_invoice_suite',
-                'summary': ai_summary,
-                'sql': '',
-                'results': []
-            })
-
-        # Check for GenAI Suite AR (Accounts Receivable) response
-        if result == "genai_ar_suite":
-            # Fetch real AR invoice data from Node.js endpoint
-            try:
-                # Detect if user is asking about a specific status or customer
-                status_filter = None
-                customer_filter = None
-                nlq_lower = nlq.lower()
-
-                # Check if this is an action request first (more flexible matching)
-                is_action_request = (
-                    ('change' in nlq_lower and 'status' in nlq_lower) or
-                    ('update' in nlq_lower and 'status' in nlq_lower) or
-                    ('mark as' in nlq_lower) or
-                    ('set' in nlq_lower and 'status' in nlq_lower)
-                )
-
-                # Status filters for AR (but NOT for action requests targeting that status)
-                if not is_action_request:
-                    if 'overdue' in nlq_lower:
-                        status_filter = 'overdue'
-                    elif 'disputed' in nlq_lower:
-                        status_filter = 'disputed'
-                    elif 'paid' in nlq_lower:
-                        status_filter = 'paid'
-                    elif 'pending' in nlq_lower:
-                        status_filter = 'pending'
-
-                # Customer filters (always apply)
-                if 'manufacturing plus' in nlq_lower:
-                    customer_filter = 'Manufacturing Plus'
-                elif 'techcorp' in nlq_lower or 'tech corp' in nlq_lower:
-                    customer_filter = 'TechCorp'
-                elif 'global retailers' in nlq_lower:
-                    customer_filter = 'Global Retailers'
-                elif 'service dynamics' in nlq_lower:
-                    customer_filter = 'Service Dynamics'
-
-                # Build API URL with filters using params dict (safer than manual string building)
-                params = {'type': 'receivable'}
-                if status_filter:
-                    params['status'] = status_filter
-                if customer_filter:
-                    params['customer'] = customer_filter
-
-                print(f"AR API request params: {params}", flush=True)
-                invoice_data_response = requests.get('http://localhost:5000/api/genai-invoices', params=params, timeout=5)
-                invoice_data = invoice_data_response.json()
-                print(f"AR API response: {invoice_data}", flush=True)
-
-                # Format AR invoice data for the AI
-                invoices = invoice_data.get('invoices', [])
-                summary = invoice_data.get('summary', {})
-                print(f"AR invoices count: {len(invoices)}", flush=True)
-
-                # Build AR invoice data string for AI
-                invoice_details = ""
-
-                # For action requests without a specific customer filter, prioritize overdue/pending invoices
-                if is_action_request and not customer_filter and len(invoices) > 0:
-                    # Sort to prioritize: overdue > pending > disputed > paid
-                    status_priority = {'overdue': 0, 'pending': 1, 'disputed': 2, 'paid': 3}
-                    invoices_sorted = sorted(invoices, key=lambda x: status_priority.get(x.get('status', 'paid'), 4))
-                    # Use only the first (most relevant) invoice for action requests
-                    invoices = invoices_sorted[:1]
-
-                for inv in invoices:
-                    invoice_details += f"• {inv['customer']} - Invoice ID: {inv['id']} - Amount: ${inv['amount']:,.2f} - Due: {inv['dueDate']} - Status: {inv['status']}\n"
-
-                print(f"AR invoice_details for AI: {invoice_details}", flush=True)
-                print(f"AR is_action_request: {is_action_request}", flush=True)
-
-                # Generate AI-powered response with real AR invoice data
-                if openai_client is None:
-                    ai_summary = f"**AR Invoice Summary**\n\nFound {summary['count']} invoices totaling ${summary['total']:,.2f}.\n\n{invoice_details}\n\nView details in GenAI Suite dashboard below."
-                else:
-                    if is_action_request:
-                        # Get today's date for payment date
-                        from datetime import datetime
-                        today = datetime.now().strftime('%Y-%m-%d')
-
-                        # For action requests, show detailed success confirmation
-                        invoice_response = openai_client.chat.completions.create(
-                            model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": f"""You are an AI assistant for accounts receivable. For status change requests, provide a detailed success confirmation.
+    # Check for GenAI Suite AR (Accounts Receivable) response
+    if route == "genai_ar_suite":
+        # Fetch real AR invoice data from Node.js endpoint
+        try:
+            # Detect if user is asking about a specific status or customer
+            status_filter = None
+            customer_filter = None
+            nlq_lower = nlq.lower()
+
+            # Check if this is an action request first (more flexible matching)
+            is_action_request = (
+                ('change' in nlq_lower and 'status' in nlq_lower) or
+                ('update' in nlq_lower and 'status' in nlq_lower) or
+                ('mark as' in nlq_lower) or
+                ('set' in nlq_lower and 'status' in nlq_lower)
+            )
+
+            # Status filters for AR (but NOT for action requests targeting that status)
+            if not is_action_request:
+                if 'overdue' in nlq_lower:
+                    status_filter = 'overdue'
+                elif 'disputed' in nlq_lower:
+                    status_filter = 'disputed'
+                elif 'paid' in nlq_lower:
+                    status_filter = 'paid'
+                elif 'pending' in nlq_lower:
+                    status_filter = 'pending'
+
+            # Customer filters (always apply)
+            if 'manufacturing plus' in nlq_lower:
+                customer_filter = 'Manufacturing Plus'
+            elif 'techcorp' in nlq_lower or 'tech corp' in nlq_lower:
+                customer_filter = 'TechCorp'
+            elif 'global retailers' in nlq_lower:
+                customer_filter = 'Global Retailers'
+            elif 'service dynamics' in nlq_lower:
+                customer_filter = 'Service Dynamics'
+
+            # Build API URL with filters using params dict (safer than manual string building)
+            params = {'type': 'receivable'}
+            if status_filter:
+                params['status'] = status_filter
+            if customer_filter:
+                params['customer'] = customer_filter
+
+            print(f"AR API request params: {params}", flush=True)
+            invoice_data_response = requests.get('http://localhost:5000/api/genai-invoices', params=params, timeout=5)
+            invoice_data = invoice_data_response.json()
+            print(f"AR API response: {invoice_data}", flush=True)
+
+            # Format AR invoice data for the AI
+            invoices = invoice_data.get('invoices', [])
+            summary = invoice_data.get('summary', {})
+            print(f"AR invoices count: {len(invoices)}", flush=True)
+
+            # Build AR invoice data string for AI
+            invoice_details = ""
+
+            # For action requests without a specific customer filter, prioritize overdue/pending invoices
+            if is_action_request and not customer_filter and len(invoices) > 0:
+                # Sort to prioritize: overdue > pending > disputed > paid
+                status_priority = {'overdue': 0, 'pending': 1, 'disputed': 2, 'paid': 3}
+                invoices_sorted = sorted(invoices, key=lambda x: status_priority.get(x.get('status', 'paid'), 4))
+                # Use only the first (most relevant) invoice for action requests
+                invoices = invoices_sorted[:1]
+
+            for inv in invoices:
+                invoice_details += f"• {inv['customer']} - Invoice ID: {inv['id']} - Amount: ${inv['amount']:,.2f} - Due: {inv['dueDate']} - Status: {inv['status']}\n"
+
+            print(f"AR invoice_details for AI: {invoice_details}", flush=True)
+            print(f"AR is_action_request: {is_action_request}", flush=True)
+
+            # Generate AI-powered response with real AR invoice data
+            if openai_client is None:
+                ai_summary = f"**AR Invoice Summary**\n\nFound {summary['count']} invoices totaling ${summary['total']:,.2f}.\n\n{invoice_details}\n\nView details in GenAI Suite dashboard below."
+            else:
+                if is_action_request:
+                    # Get today's date for payment date
+                    from datetime import datetime
+                    today = datetime.now().strftime('%Y-%m-%d')
+
+                    # For action requests, show detailed success confirmation
+                    invoice_response = narrative_client.chat.completions.create(
+                        model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": f"""You are an AI assistant for accounts receivable. For status change requests, provide a detailed success confirmation.
 
 FORMAT FOR STATUS CHANGE CONFIRMATION:
 Show payment success details professionally with all relevant information.
@@ -388,195 +456,217 @@ EXAMPLE:
 **Account Update**: Manufacturing Plus account balance is now $0.00. Customer maintains excellent payment rating. Automatic thank you email sent to customer contact.
 
 View complete details in GenAI Suite dashboard below."""
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"User asked: '{nlq}'\n\nInvoice:\n{invoice_details}\n\nGenerate a detailed payment success confirmation showing invoice ID, customer, status change, payment amount, payment method (Wire Transfer), payment date ({today}), and account update message. Make it look professional and complete."
-                                }
-                            ],
-                            temperature=0.7,
-                            max_tokens=250
-                        )
-                    else:
-                        # For viewing queries, keep concise format
-                        invoice_response = openai_client.chat.completions.create(
-                            model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": """You are an AI assistant for accounts receivable information. Provide CONCISE responses.
+                            },
+                            {
+                                "role": "user",
+                                "content": f"User asked: '{nlq}'\n\nInvoice:\n{invoice_details}\n\nGenerate a detailed payment success confirmation showing invoice ID, customer, status change, payment amount, payment method (Wire Transfer), payment date ({today}), and account update message. Make it look professional and complete."
+                            }
+                        ],
+                        temperature=0.7,
+                        max_tokens=250
+                    )
+                else:
+                    # For viewing queries, keep concise format
+                    invoice_response = narrative_client.chat.completions.create(
+                        model=os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'cdss-openai'),
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": """You are an AI assistant for accounts receivable information. Provide CONCISE responses.
 
 FORMAT:
 **Status**: **Count** totaling **$Amount**
 • **Customer** - **Invoice ID** - **$Amount** - Due: Date
 
 View details in GenAI Suite dashboard below."""
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"User asked: '{nlq}'\n\nAR Invoice Data:\n{invoice_details}\n\nTotal: {summary['count']} invoices, ${summary['total']:,.2f}\n\nProvide a concise response (3-4 lines) with bullet points and bold for key info."
-                                }
-                            ],
-                            temperature=0.7,
-                            max_tokens=150
-                        )
-                    ai_summary = invoice_response.choices[0].message.content.strip() if invoice_response.choices[0].message.content else ""
-
-            except Exception as e:
-                print(f"Error fetching or processing AR invoice data: {e}", flush=True)
-                ai_summary = "**Accounts Receivable Information**\n\nTo view your AR invoice details including IDs, amounts, statuses, and customer information, please access the GenAI Suite dashboard below."
+                            },
+                            {
+                                "role": "user",
+                                "content": f"User asked: '{nlq}'\n\nAR Invoice Data:\n{invoice_details}\n\nTotal: {summary['count']} invoices, ${summary['total']:,.2f}\n\nProvide a concise response (3-4 lines) with bullet points and bold for key info."
+                            }
+                        ],
+                        temperature=0.7,
+                        max_tokens=150
+                    )
+                ai_summary = invoice_response.choices[0].message.content.strip() if invoice_response.choices[0].message.content else ""
+
+        except Exception as e:
+            print(f"Error fetching or processing AR invoice data: {e}", flush=True)
+            ai_summary = "**Accounts Receivable Information**\n\nTo view your AR invoice details including IDs, amounts, statuses, and customer information, please access the GenAI Suite dashboard below."
+
+        return {
+            'query': nlq,
+            'message': 'genai_ar_suite',
+            'summary': ai_summary,
+            'sql': '',
+            'results': []
+        }
 
-            return jsonify({
-                'query': nlq,
-                'message': 'genai_ar_suite',
-                'summary': ai_summary,
-                'sql': '',
-                'results': []
-            })
+    # Check for Power BI dashboard special responses
+    if route == "powerbi_financial_dashboard":
+        return {
+            'query': nlq,
+            'message': 'powerbi_financial_dashboard',
+            'summary': 'Processing your financial report...',
+            'sql': '',
+            'results': []
+        }
 
-        # Check for Power BI dashboard special responses
-        if result == "powerbi_financial_dashboard":
-            return jsonify({
-                'query': nlq,
-                'message': 'powerbi_financial_dashboard',
-                'summary': 'Processing your financial report...',
-                'sql': '',
-                'results': []
-            })
+    if route == "powerbi_medical_dashboard":
+        return {
+            'query': nlq,
+            'message': 'powerbi_medical_dashboard',
+            'summary': 'Processing your medical report...',
+            'sql': '',
+            'results': []
+        }
 
-        if result == "powerbi_medical_dashboard":
-            return jsonify({
-                'query': nlq,
-                'message': 'powerbi_medical_dashboard',
-                'summary': 'Processing your medical report...',
-                'sql': '',
-                'results': []
-            })
+    # Legacy support for old powerbi_dashboard response
+    if route == "powerbi_dashboard":
+        return {
+            'query': nlq,
+            'message': 'powerbi_financial_dashboard',
+            'summary': 'Processing your financial report...',
+            'sql': '',
+            'results': []
+        }
 
-        # Legacy support for old powerbi_dashboard response
-        if result == "powerbi_dashboard":
-            return jsonify({
-                'query': nlq,
-                'message': 'powerbi_financial_dashboard',
-                'summary': 'Processing your financial report...',
-                'sql': '',
-                'results': []
-            })
+    if result.kind == 'error':
+        return {
+            'error': result.message,
+            'query': nlq,
+            'sql': '',
+            'results': []
+        }
 
-        # Parse the result to extract components
-        if "Error:" in result:
-            return jsonify({
-                'error': result,
-                'query': nlq,
-                'sql': '',
-                'results': []
-            }), 500
+    # Structured rows go out as they came from the cursor, keyed by column name
+    if result.kind == 'structured':
+        # Create human-readable summary based on query type and results
+        if human_readable_summary is None:
+            human_readable_summary = create_human_readable_summary(nlq, result.text)
+        print(f"Human-readable summary: {human_readable_summary}")
 
-        # For structured queries, extract numeric results (NEW FORMAT)
-        if "(Source: Structured - financial_transactions)" in result or "(Source: Structured - medical_records)" in result:
-            # Extract the deterministic result portion
-            if "(Source: Structured - financial_transactions)" in result:
-                results_text = result.split(" (Source: Structured - financial_transactions)")[0].strip()
-            else:
-                results_text = result.split(" (Source: Structured - medical_records)")[0].strip()
-            print(f"Extracted structured results: {results_text}")
-
-            # Create human-readable summary based on query type and results
-            human_readable_summary = create_human_readable_summary(nlq, results_text)
-            print(f"Human-readable summary: {human_readable_summary}")
-
-            # Format as structured results for frontend
-            try:
-                # Parse multi-line results (e.g., "2025 | 3000.00\n2026 | 4000.50")
-                if '\n' in results_text:
-                    lines = results_text.strip().split('\n')
-                    formatted_results = []
-                    for line in lines:
-                        if '|' in line:
-                            parts = [p.strip() for p in line.split('|')]
-                            row_data = {}
-                            for i, part in enumerate(parts):
-                                row_data[f"column_{i}"] = part
-                            formatted_results.append(row_data)
-                        else:
-                            formatted_results.append({"value": line.strip()})
-                else:
-                    # Single value result
-                    formatted_results = [{"value": results_text}]
+        payload = {
+            'query': nlq,
+            'sql': result.sql,
+            'columns': result.column_info(),
+            'results': result.records(),
+            'total_rows': result.total_rows,
+            'summary': human_readable_summary,
+            'message': result.message
+        }
+        if result.result_id is not None:
+            # The rest of the rows are paged from the result store, not the warehouse
+            payload['result_id'] = result.result_id
+            payload['results_url'] = f"/api/results/{result.result_id}"
+        # Answers from the materialized aggregates or the table replica say how current they are
+        payload.update(result.freshness())
+        return payload
+
+    # PDF analyses and unstructured report summaries (single and consolidated)
+    if result.kind in ('analysis', 'summary'):
+        return {
+            'query': nlq,
+            'sql': '',
+            'results': [],
+            'summary': result.summary,
+            'message': result.message
+        }
 
-                print(f"Formatted structured results: {formatted_results}")
-            except Exception as e:
-                print(f"Error formatting results: {e}")
-                formatted_results = [{"value": results_text}]
+    # Default response
+    return {
+        'query': nlq,
+        'sql': result.sql or '',
+        'results': [],
+        'message': result.message
+    }
 
-            return jsonify({
-                'query': nlq,
-                'sql': 'Generated SQL query',
-                'results': formatted_results,
-                'summary': human_readable_summary,
-                'message': result
-            })
-
-        # For PDF queries (new)
-        elif "Analysis (Source: PDF Documents)" in result:
-            print(f"Processing PDF result: {result}")
-            analysis_text = result.split("Analysis (Source: PDF Documents): ")[1]
-            print(f"Extracted PDF analysis text: {analysis_text}")
-            return jsonify({
-                'query': nlq,
-                'sql': '',
-                'results': [],
-                'summary': analysis_text,
-                'message': result
-            })
-
-        # For structured queries with analysis (new OpenAI analysis)
-        elif "Analysis (Source: Structured" in result:
-            print(f"Processing structured analysis result: {result}")
-            if "financial_transactions" in result:
-                analysis_text = result.split("Analysis (Source: Structured - financial_transactions): ")[1]
-            else:
-                analysis_text = result.split("Analysis (Source: Structured - medical_records): ")[1]
-            print(f"Extracted analysis text: {analysis_text}")
-            return jsonify({
-                'query': nlq,
-                'sql': '',
-                'results': [],
-                'summary': analysis_text,
-                'message': result
-            })
-
-        # For unstructured queries (summaries) - both single and consolidated
-        elif "Summary (Source: Unstructured" in result:
-            print(f"Processing unstructured query result: {result}")
-            # Handle both regular and consolidated summaries
-            if "Consolidated" in result:
-                if "financial_reports" in result:
-                    summary_text = result.split("Summary (Source: Unstructured - financial_reports, Consolidated ")[1].split("): ", 1)[1]
-                else:
-                    summary_text = result.split("Summary (Source: Unstructured - medical_reports, Consolidated ")[1].split("): ", 1)[1]
-            else:
-                if "financial_reports" in result:
-                    summary_text = result.split("Summary (Source: Unstructured - financial_reports): ")[1]
-                else:
-                    summary_text = result.split("Summary (Source: Unstructured - medical_reports): ")[1]
-            print(f"Extracted summary text: {summary_text}")
-            return jsonify({
-                'query': nlq,
-                'sql': '',
-                'results': [],
-                'summary': summary_text,
-                'message': result
-            })
 
-        # Default response
-        return jsonify({
+def _sse(event: str, data) -> str:
+    """One Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_nlq_events(nlq: str):
+    """
+    Server-Sent Events for one query: 'route' immediately, 'result' with the deterministic
+    structured rows as soon as the SQL returns, 'token' for every LLM summary token, then
+    'done' carrying the same payload the JSON endpoint returns ('error' on failure).
+    """
+    try:
+        result = None
+        for event, data in iter_nlq_events(nlq, stream=True):
+            if event == 'route':
+                yield _sse('route', data)
+            elif event == 'result':
+                yield _sse('result', {'columns': data.column_info(), 'results': data.records(),
+                                      'total_rows': data.total_rows, 'source': data.source,
+                                      **data.freshness()})
+            elif event == 'token':
+                yield _sse('token', {'text': data})
+            elif event == 'message':
+                result = data
+        print(f"Raw result from process_nlq: {result}", flush=True)
+
+        # Structured summaries are generated here rather than in process_nlq, so stream them too
+        human_readable_summary = None
+        if result.kind == 'structured':
+            summary_tokens = stream_human_readable_summary(nlq, result.text)
+            while True:
+                try:
+                    yield _sse('token', {'text': next(summary_tokens)})
+                except StopIteration as done:
+                    human_readable_summary = done.value
+                    break
+
+        payload = build_nlq_response(nlq, result, human_readable_summary)
+        yield _sse('error' if 'error' in payload else 'done', payload)
+    except Exception as e:
+        print(f"API Error: {e}")
+        yield _sse('error', {
+            'error': f'Internal server error: {str(e)}',
             'query': nlq,
             'sql': '',
-            'results': [],
-            'message': result
+            'results': []
         })
 
+
+@app.route('/api/process-nlq', methods=['POST'])
+def process_nlq_endpoint():
+    """
+    API endpoint for processing natural language queries.
+    Send {"stream": true} or "Accept: text/event-stream" to receive Server-Sent Events.
+    """
+    try:
+        # Get the JSON data from the request
+        data = request.get_json(silent=True)
+        if not data:
+            data = {}
+
+        if not data or 'query' not in data:
+            return jsonify({
+                'error': 'Missing query parameter',
+                'query': '',
+                'sql': '',
+                'results': []
+            }), 400
+
+        nlq = data['query']
+        print(f"Processing NLQ via API: {nlq}", flush=True)
+
+        # Streaming clients get Server-Sent Events; everyone else keeps the JSON contract
+        if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(stream_with_context(stream_nlq_events(nlq)),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        # Process the query using existing logic
+        result = process_nlq(nlq)
+        print(f"Raw result from process_nlq: {result}", flush=True)
+
+        payload = build_nlq_response(nlq, result)
+        return jsonify(payload), (500 if 'error' in payload else 200)
+
     except Exception as e:
         print(f"API Error: {e}")
         query_value = ''
@@ -589,6 +679,165 @@ View details in GenAI Suite dashboard below."""
             'results': []
         }), 500
 
+@app.route('/api/results/<result_id>', methods=['GET'])
+def get_result_page(result_id):
+    """
+    One page of a spooled structured result (the result_id of a /api/process-nlq answer).
+    Query parameters: offset, limit (default RESULT_PAGE_SIZE), sort (a column name) and
+    order ('asc' or 'desc'). Pages are read from the result store, never the warehouse.
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', RESULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    if offset < 0 or limit < 1:
+        return jsonify({'error': 'offset must be >= 0 and limit >= 1'}), 400
+    limit = min(limit, RESULT_PAGE_MAX_SIZE)
+    sort = request.args.get('sort') or None
+    order = request.args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "order must be 'asc' or 'desc'"}), 400
+
+    try:
+        page = get_result_store().page(result_id, offset, limit, sort, order == 'desc')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"API Error: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    if page is None:
+        return jsonify({'error': 'Result not found or expired', 'result_id': result_id}), 404
+
+    rows = QueryResult('structured', columns=page['columns'], rows=page['rows'])
+    next_offset = offset + len(page['rows'])
+    return jsonify({
+        'result_id': result_id,
+        'sql': page['sql'],
+        'columns': rows.column_info(),
+        'results': rows.records(),
+        'offset': offset,
+        'limit': limit,
+        'sort': sort,
+        'order': order,
+        'total_rows': page['total_rows'],
+        'stored_rows': page['stored_rows'],
+        # Rows past RESULT_STORE_MAX_ROWS were counted but not spooled
+        'truncated': page['stored_rows'] < page['total_rows'],
+        'next_offset': next_offset if next_offset < page['stored_rows'] else None
+    })
+
+
+def _stored_batches(result_id: str, columns: tuple):
+    for rows in get_result_store().iter_rows(result_id, SNOWFLAKE_FETCH_BATCH_SIZE):
+        yield columns, rows
+
+
+def _export_stream(first: tuple, batches, fmt: str, label: str):
+    """Encodes the batches as fmt, logging the row count and throughput once the download completes"""
+    started = time.perf_counter()
+    exported = 0
+
+    def counted():
+        nonlocal exported
+        for columns, rows in itertools.chain([first], batches):
+            exported += len(rows)
+            yield columns, rows
+
+    yield from iter_export(counted(), fmt)
+    elapsed = time.perf_counter() - started
+    print(f"📤 Exported {exported} rows of {label} as {fmt} in {elapsed:.2f}s "
+          f"({exported / elapsed if elapsed else 0:,.0f} rows/s)", flush=True)
+
+
+def _export_response(batches, fmt: str, label: str, filename: str):
+    """
+    A chunked download of the batches. The first batch is read before the response starts,
+    so a failing query still gets a JSON error instead of a truncated file.
+    """
+    try:
+        first = next(batches)
+    except StopIteration:
+        first = ((), [])
+    content_type, extension = EXPORT_FORMATS[fmt]
+    return Response(stream_with_context(_export_stream(first, batches, fmt, label)),
+                    content_type=content_type,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}.{extension}"',
+                             'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _export_format():
+    """The requested export format, or an error response"""
+    data = request.get_json(silent=True) or {}
+    fmt = (request.args.get('format') or data.get('format') or 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return None, (jsonify({'error': f"format must be one of {sorted(EXPORT_FORMATS)}"}), 400)
+    if not export_available(fmt):
+        return None, (jsonify({'error': f"{fmt} export requires pyarrow, which is not installed"}), 501)
+    return fmt, None
+
+
+@app.route('/api/results/<result_id>/export', methods=['GET'])
+def export_result(result_id):
+    """
+    Streams every row of a spooled result as ?format=csv|ndjson|arrow. Rows come from the
+    result store; a result cut off at RESULT_STORE_MAX_ROWS re-runs its validated SQL.
+    """
+    fmt, error = _export_format()
+    if error:
+        return error
+    try:
+        result = get_result_store().describe(result_id)
+        if result is None:
+            return jsonify({'error': 'Result not found or expired', 'result_id': result_id}), 404
+        if result['stored_rows'] < result['total_rows']:
+            batches = iter_sql_result(result['sql'])
+        else:
+            batches = _stored_batches(result_id, result['columns'])
+        return _export_response(batches, fmt, f"result {result_id}", f"result-{result_id}")
+    except Exception as e:
+        print(f"API Error: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}', 'result_id': result_id}), 500
+
+
+@app.route('/api/export', methods=['GET', 'POST'])
+def export_query():
+    """
+    Streams the full rows behind a structured question: {"query": ..., "format": "csv" |
+    "ndjson" | "arrow"} (or the same as query parameters). The question is translated to
+    validated SQL as /api/process-nlq does; a live spooled result of that SQL is reused,
+    otherwise the SQL runs and its rows are passed on batch by batch.
+    """
+    data = request.get_json(silent=True) or {}
+    nlq = request.args.get('query') or data.get('query')
+    if not nlq:
+        return jsonify({'error': 'Missing query parameter'}), 400
+    fmt, error = _export_format()
+    if error:
+        return error
+    try:
+        sql = nlq_to_sql(nlq)
+    except ValueError as e:
+        # A missing LLM client is the service being unavailable, not a bad question
+        status = 503 if str(e) == _CLIENT_NOT_CONFIGURED else 400
+        return jsonify({'error': str(e), 'query': nlq}), status
+    except Exception as e:
+        print(f"API Error: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}', 'query': nlq}), 500
+    try:
+        store = get_result_store()
+        result_id = store.find(sql)
+        result = store.describe(result_id) if result_id is not None else None
+        if result is not None and result['stored_rows'] >= result['total_rows']:
+            batches = _stored_batches(result_id, result['columns'])
+        else:
+            batches = iter_sql_result(sql)
+        return _export_response(batches, fmt, f"'{nlq}'", 'export')
+    except Exception as e:
+        print(f"API Error: {e}")
+        return jsonify({'error': f'Internal server error: {str(e)}', 'query': nlq, 'sql': sql}), 500
+
+
 # --- Dashboard API Endpoints ---
 @app.route('/api/dashboard/chat-history')
 def get_chat_history():
@@ -693,10 +942,65 @@ def get_chat_metrics():
 # --- End Dashboard API Endpoints ---
 
 
+@app.route('/api/clear-cache', methods=['POST'])
+def clear_cache():
+    """
+    Invalidate the SQL result cache and the spooled results, plus the summary cache when
+    everything is cleared.
+    Accepts an optional JSON body {"tables": [...]} to only drop results from those tables.
+    """
+    data = request.get_json(silent=True) or {}
+    tables = data.get('tables')
+    if tables is not None and not isinstance(tables, list):
+        return jsonify({'error': 'tables must be a list of table names'}), 400
+
+    removed = get_sql_cache().invalidate(tables)
+    removed_results = get_result_store().clear(tables)
+    # Summaries are keyed by report content, not tables, so only a full clear drops them
+    removed_summaries = get_summary_cache().clear() if tables is None else 0
+    print(f"🧹 Cleared {removed} cached SQL results, {removed_results} spooled results and "
+          f"{removed_summaries} summaries (tables: {tables or 'all'})", flush=True)
+    return jsonify({
+        'status': 'success',
+        'removed': removed,
+        'removed_results': removed_results,
+        'removed_summaries': removed_summaries,
+        'tables': tables or 'all'
+    })
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    Hit/miss counters and occupancy of the SQL result, NLQ translation and summary caches, the
+    report index, the result store, the materialized aggregates and the table replica, and how
+    many pipeline calls were coalesced with identical ones in flight
+    """
+    return jsonify({
+        'sql_cache': get_sql_cache().stats(),
+        'nlq_translation_cache': get_translation_cache().stats(),
+        'summary_cache': get_summary_cache().stats(),
+        'report_index': get_report_index().stats(),
+        'pdf_passages': get_passage_stats(),
+        'sql_intents': get_intent_stats(),
+        'single_flight': get_single_flight_stats(),
+        'result_store': get_result_store().stats(),
+        'aggregate_store': get_aggregate_store().stats(),
+        'table_replica': get_table_replica().stats()
+    })
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'nlq-processor'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'nlq-processor',
+        'snowflake_pool': get_pool_stats(),
+        'sql_cache': get_sql_cache().stats(),
+        'entra_token': get_token_stats(),
+        'llm_pool': get_llm_pool_stats()
+    })
 
 if __name__ == '__main__':
     print("🚀 Starting Flask NLQ Processing Server...")
@@ -0,0 +1,152 @@
+"""
+ASGI entry point for the async NLQ pipeline, served alongside the Flask app:
+
+    uvicorn asgi:app --app-dir server --port 8001
+
+POST /api/process-nlq keeps the Flask endpoint's JSON contract, but runs process_nlq_async,
+so a request waiting on Azure OpenAI or Snowflake holds no thread and a single process can
+keep hundreds of them in flight. The SQLite-backed caches and stores (translation and
+summary caches, report index, result store) are only read and written on worker threads,
+never on the event loop. A client that disconnects cancels its request's pipeline, and with
+it the Snowflake query or LLM call in flight. Streaming (SSE) and every other route stay on
+Flask.
+Written against the bare ASGI interface so no web framework is needed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import process_nlq_async
+from app import build_nlq_response, create_human_readable_summary_async
+from snowflake_connector import get_pool_stats
+from result_cache import get_sql_cache
+from llm_client import get_async_llm_pool_stats
+from single_flight import get_single_flight_stats
+
+_HEADERS = [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')]
+
+
+async def _send_json(send, payload: dict, status: int = 200):
+    body = json.dumps(payload, default=str).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': _HEADERS + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its response was sent"""
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _unless_disconnected(receive, coroutine):
+    """
+    Awaits coroutine in its own task, racing it against the client's http.disconnect; on a
+    disconnect the task is cancelled (its cleanup awaited) and ClientDisconnected is raised
+    """
+    work = asyncio.ensure_future(coroutine)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+    if work.cancelled():
+        raise ClientDisconnected()
+    return work.result()
+
+
+async def _answer_nlq(nlq: str) -> dict:
+    """The /api/process-nlq payload for nlq"""
+    result = await process_nlq_async(nlq)
+    print(f"Raw result from process_nlq_async: {result}", flush=True)
+
+    if result.kind == 'structured':
+        # The summary LLM call is awaited here, so building the payload does no I/O
+        summary = await create_human_readable_summary_async(nlq, result.text)
+        return build_nlq_response(nlq, result, summary)
+    # GenAI Suite replies call the Node invoice API and the LLM synchronously
+    return await asyncio.to_thread(build_nlq_response, nlq, result)
+
+
+async def process_nlq_endpoint(receive, send):
+    """Async counterpart of the Flask /api/process-nlq endpoint (JSON responses only)"""
+    nlq = ''
+    try:
+        try:
+            data = json.loads(await _read_body(receive) or b'{}')
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict) or 'query' not in data:
+            await _send_json(send, {'error': 'Missing query parameter', 'query': '', 'sql': '',
+                                    'results': []}, 400)
+            return
+
+        nlq = data['query']
+        print(f"Processing NLQ via ASGI: {nlq}", flush=True)
+        payload = await _unless_disconnected(receive, _answer_nlq(nlq))
+        await _send_json(send, payload, 500 if 'error' in payload else 200)
+    except ClientDisconnected:
+        print(f"Client disconnected; cancelled NLQ: {nlq}", flush=True)
+    except Exception as e:
+        print(f"API Error: {e}")
+        await _send_json(send, {'error': f'Internal server error: {str(e)}', 'query': nlq,
+                                'sql': '', 'results': []}, 500)
+
+
+async def health_check(send):
+    await _send_json(send, {
+        'status': 'healthy',
+        'service': 'nlq-processor-async',
+        'snowflake_pool': get_pool_stats(),
+        'sql_cache': get_sql_cache().stats(),
+        'llm_pool': get_async_llm_pool_stats(),
+        'single_flight': get_single_flight_stats()
+    })
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    if method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 204, 'headers': [
+            (b'access-control-allow-origin', b'*'),
+            (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+            (b'access-control-allow-headers', b'content-type')]})
+        await send({'type': 'http.response.body', 'body': b''})
+    elif path == '/api/process-nlq' and method == 'POST':
+        await process_nlq_endpoint(receive, send)
+    elif path == '/health' and method == 'GET':
+        await health_check(send)
+    else:
+        await _send_json(send, {'error': 'Not found'}, 404)
@@ -0,0 +1,105 @@
+"""
+Latency of the canned intents answered from the materialized aggregates vs the warehouse,
+and a check that both give the same rows.
+
+Seeds a local backend database, materializes the aggregates once (timed), then for every
+materialized intent and seeded year compares the store's answer with execute_sql() on the
+same statement - rows, order and values must be identical - and times both. A second pass
+appends transactions, so the watermark moves, and checks that one refresh brings the
+answers back in line with the warehouse.
+
+    python server/benchmarks/bench_aggregates.py --transactions 400000 --medical-records 100000
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+
+def _timed(run, repeat: int):
+    """(median milliseconds, last result)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def _compare(store, statements, repeat: int, report: bool) -> int:
+    """Prints per-statement latencies when report is set; returns how many answers differ"""
+    from snowflake_connector import execute_sql
+    mismatches = 0
+    for label, sql in statements:
+        aggregate_ms, answer = _timed(lambda: store.answer(sql, 10 ** 6), repeat)
+        warehouse_ms, rows = _timed(lambda: execute_sql(sql, use_cache=False), repeat)
+        identical = answer is not None and list(answer.rows) == list(rows)
+        mismatches += not identical
+        if report:
+            print(f"{label:32s} {len(rows):5d} {warehouse_ms:10.2f} {aggregate_ms:10.4f} "
+                  f"{warehouse_ms / max(aggregate_ms, 1e-6):9,.0f}x {'yes' if identical else 'NO'}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--medical-records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            'SQL_BACKEND': 'local',
+            'LOCAL_DB_PATH': os.path.join(directory, 'warehouse.sqlite3'),
+            'LOCAL_DB_TRANSACTIONS': str(args.transactions),
+            'LOCAL_DB_MEDICAL_RECORDS': str(args.medical_records),
+            'RESULT_STORE_PATH': os.path.join(directory, 'result_store.sqlite3'),
+            'SQL_CACHE_ENABLED': 'false',
+        })
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from aggregate_store import AggregateStore
+        from local_backend import SEED_YEARS, seed_database
+        from nlq_processor import intent_sql
+        from sql_intents import SQL_INTENTS
+        seed_database(os.environ['LOCAL_DB_PATH'], args.transactions, args.medical_records)
+
+        # No background thread: refreshes run here, so they can be timed
+        store = AggregateStore()
+        store._stopped = True
+        started = time.perf_counter()
+        store.refresh(force=True)
+        print(f"materialized {store.stats()['answers']} answers in {(time.perf_counter() - started) * 1000:.0f}ms\n")
+
+        statements = []
+        for intent in SQL_INTENTS:
+            for year in SEED_YEARS + (SEED_YEARS[-1] + 1,):
+                sql = intent_sql(intent, year)
+                # Revenue growth spans every year, so it has one statement
+                single = intent.name == 'revenue_growth'
+                if store.answer(sql, 1) is not None:
+                    statements.append((intent.name if single else f"{intent.name} {year}", sql))
+                if single:
+                    break
+        print(f"{'statement':32s} {'rows':>5s} {'warehouse':>10s} {'aggregate':>10s} {'speedup':>10s} identical")
+        print(f"{'':32s} {'':5s} {'ms':>10s} {'ms':>10s}")
+        mismatches = _compare(store, statements, args.repeat, report=True)
+
+        # New rows move the watermark; one refresh must pick them up
+        with sqlite3.connect(os.environ['LOCAL_DB_PATH']) as db:
+            db.execute("INSERT INTO financial_transactions SELECT transaction_id + 10000000, transaction_date, "
+                       "amount, category, description FROM financial_transactions WHERE transaction_id % 97 = 0")
+        started = time.perf_counter()
+        outcome = store.refresh()
+        print(f"\nafter appending transactions: {outcome} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        mismatches += _compare(store, statements, 1, report=False)
+        print(f"{len(statements) * 2 - mismatches} of {len(statements) * 2} answers identical to execute_sql")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Load comparison: the Flask /api/process-nlq endpoint (process_nlq on a thread pool) versus
+the ASGI endpoint (process_nlq_async on one event loop).
+
+Runs against the local SQL backend and an in-process mock Azure OpenAI endpoint that
+answers every completion after a fixed latency, with the translation and result caches
+off so each request pays for the LLM round trips. The sync side gets --threads workers,
+like a threaded gunicorn worker; the async side runs every request concurrently. Both
+share one LLM pool size, and every request arrives at once, so latency includes queueing.
+
+    python server/benchmarks/bench_async_pipeline.py --requests 256 --threads 16 --llm-connections 64 --llm-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QUERIES = [
+    "What was the largest transaction in 2024?",
+    "What is the financial summary for Q2?",
+    "How many transactions did we have in 2023?",
+]
+
+
+def start_mock_llm(latency: float) -> int:
+    """Serves chat completions on a background event loop; returns the port"""
+    sql = "SELECT MAX(amount) FROM FINANCIAL_TRANSACTIONS WHERE YEAR(transaction_date) = 2024"
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                headers = dict(line.split(': ', 1) for line in head.decode().split('\r\n')[1:] if ': ' in line)
+                length = int(headers.get('Content-Length') or headers.get('content-length') or 0)
+                request = json.loads(await reader.readexactly(length))
+                await asyncio.sleep(latency)
+                content = sql if 'SQL expert' in request['messages'][-1]['content'] else "- insight one\n- insight two"
+                body = json.dumps({'id': 'bench', 'object': 'chat.completion', 'created': 0, 'model': 'bench',
+                                   'choices': [{'index': 0, 'finish_reason': 'stop',
+                                                'message': {'role': 'assistant', 'content': content}}]}).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    ready = threading.Event()
+    port = []
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024))
+        port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return port[0]
+
+
+def summarize(name: str, latencies: list, elapsed: float, peak_threads: int):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:6s} {len(latencies) / elapsed:8.1f} req/s   p50 {statistics.median(latencies) * 1000:7.0f}ms"
+          f"   p95 {p95 * 1000:7.0f}ms   peak threads {peak_threads}")
+
+
+class ThreadSampler:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+
+def run_sync(flask_app, queries: list, threads: int):
+    client = flask_app.test_client()
+    client.post('/api/process-nlq', json={'query': queries[0]})  # opens the client pool outside the timed run
+
+    def one(nlq):
+        response = client.post('/api/process-nlq', json={'query': nlq})
+        assert response.status_code == 200, response.get_json()
+        # Every request arrives at once, so latency includes the wait for a free thread
+        return time.perf_counter() - started
+
+    with ThreadSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(one, queries))
+        summarize('sync', latencies, time.perf_counter() - started, sampler.peak)
+
+
+def run_async(asgi_app, queries: list):
+    async def one(nlq):
+        started = time.perf_counter()
+        body = json.dumps({'query': nlq}).encode()
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_app({'type': 'http', 'path': '/api/process-nlq', 'method': 'POST'}, receive, send)
+        assert sent[0]['status'] == 200, sent[-1]['body']
+        return time.perf_counter() - started
+
+    async def main():
+        await one(queries[0])  # opens the async client pool outside the timed run
+        with ThreadSampler() as sampler:
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one(nlq) for nlq in queries))
+            summarize('async', latencies, time.perf_counter() - started, sampler.peak)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--threads', type=int, default=16, help='sync worker threads')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds per mock completion')
+    parser.add_argument('--llm-connections', type=int, default=64, help='LLM pool size for both sides')
+    parser.add_argument('--transactions', type=int, default=2000,
+                        help='seeded FINANCIAL_TRANSACTIONS rows; keep small so LLM waits dominate')
+    args = parser.parse_args()
+
+    port = start_mock_llm(args.llm_latency)
+    os.environ.update({
+        'SQL_BACKEND': 'local',
+        'LOCAL_DB_PATH': os.path.join(tempfile.gettempdir(), f'nlq_bench_warehouse_{args.transactions}.sqlite3'),
+        'LOCAL_DB_TRANSACTIONS': str(args.transactions),
+        'LOCAL_DB_MEDICAL_RECORDS': '500',
+        'SNOWFLAKE_ASYNC_MAX_CONCURRENCY': '8',  # same warehouse concurrency as the sync pool
+        'SQL_CACHE_ENABLED': 'false',
+        'NLQ_CACHE_ENABLED': 'false',
+        'AZURE_OPENAI_ENDPOINT': f'http://127.0.0.1:{port}',
+        'AZURE_OPENAI_API_KEY': 'bench',
+        'USE_ENTRA_ID': 'false',
+        'LLM_HTTP2': 'false',
+        'LLM_MAX_CONNECTIONS': str(args.llm_connections),
+        'LLM_MAX_KEEPALIVE_CONNECTIONS': str(args.llm_connections),
+    })
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import builtins
+    quiet = builtins.print
+    builtins.print = lambda *a, **k: None  # the pipeline logs every step
+    try:
+        from app import app as flask_app
+        from asgi import app as asgi_app
+        from snowflake_connector import fetch_sql_preview
+        fetch_sql_preview("SELECT 1", max_rows=1)  # seeds the local warehouse
+
+        queries = [QUERIES[i % len(QUERIES)] for i in range(args.requests)]
+        results = []
+        builtins.print = lambda *a, **k: results.append((a, k)) if a and str(a[0]).startswith(('sync', 'async')) else None
+        run_sync(flask_app, queries, args.threads)
+        run_async(asgi_app, queries)
+    finally:
+        builtins.print = quiet
+    print(f"{args.requests} requests, {args.threads} sync threads, {args.llm_connections} LLM connections, "
+          f"{args.llm_latency * 1000:.0f}ms per LLM call")
+    for a, k in results:
+        print(*a, **k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Bytes read and latency of YEAR()/MONTH() filters before and after rewrite_date_predicates().
+
+Seeds a local backend database, clusters FINANCIAL_TRANSACTIONS and MEDICAL_RECORDS by
+their date column and indexes it - the SQLite stand-in for Snowflake micro-partitions,
+whose per-partition min/max dates let the warehouse skip partitions for a range
+predicate but not for YEAR(date) = N. Each canned statement (the SQL intents, the local
+backend's benchmark queries, month/quarter filters and year guards added by nlq_to_sql)
+then runs as emitted and as rewritten, on a fresh connection with a small page cache,
+reporting the bytes read from the database file and the best-of-N latency (and with
+--show-plans the access path SQLite chose), and checking both return the same rows.
+
+    python server/benchmarks/bench_date_predicates.py --transactions 200000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_backend import BENCHMARK_QUERIES, seed_database, translate_snowflake_sql
+from nlq_processor import _finalize_sql, extract_year_from_nlq
+from sql_intents import SQL_INTENTS
+from sql_rewrite import rewrite_date_predicates
+
+# Clustered by date, like a table loaded in date order
+CLUSTER_SQL = """
+    CREATE TABLE financial_transactions_sorted AS SELECT * FROM financial_transactions ORDER BY transaction_date;
+    DROP TABLE financial_transactions;
+    ALTER TABLE financial_transactions_sorted RENAME TO financial_transactions;
+    CREATE INDEX financial_transactions_date ON financial_transactions (transaction_date);
+    CREATE TABLE medical_records_sorted AS SELECT * FROM medical_records ORDER BY visit_date;
+    DROP TABLE medical_records;
+    ALTER TABLE medical_records_sorted RENAME TO medical_records;
+    CREATE INDEX medical_records_date ON medical_records (visit_date);
+    VACUUM;
+"""
+
+# LLM output without a year filter: (statement with the YEAR() guard the string-replace
+# injector used to add, raw statement, question) - the rewrite side runs the raw statement
+# through _finalize_sql as _translate does
+GUARDED_QUERIES = {
+    'guard: revenue by category': (
+        "SELECT category, SUM(amount) as total FROM FINANCIAL_TRANSACTIONS WHERE YEAR(transaction_date) = 2024 "
+        "AND amount > 0 GROUP BY category ORDER BY total DESC",
+        "SELECT category, SUM(amount) as total FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 "
+        "GROUP BY category ORDER BY total DESC",
+        "revenue by category in 2024"),
+    'guard: expenses or travel': (
+        "SELECT SUM(ABS(amount)) FROM FINANCIAL_TRANSACTIONS WHERE YEAR(transaction_date) = 2025 "
+        "AND (amount < 0 OR category = 'Travel')",
+        "SELECT SUM(ABS(amount)) FROM FINANCIAL_TRANSACTIONS WHERE amount < 0 OR category = 'Travel'",
+        "expenses in 2025"),
+}
+
+# Month and quarter filters alongside the year
+PERIOD_QUERIES = {
+    'march 2024 medical costs': "SELECT SUM(treatment_cost) FROM MEDICAL_RECORDS "
+                                "WHERE YEAR(visit_date) = 2024 AND MONTH(visit_date) = 3",
+    'q2 2025 revenue': "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS "
+                       "WHERE amount > 0 AND YEAR(transaction_date) = 2025 AND QUARTER(transaction_date) = 2",
+}
+
+
+def _read_bytes() -> int:
+    """Bytes this process has read through read(2) so far (Linux only)"""
+    with open('/proc/self/io') as io:
+        for line in io:
+            if line.startswith('rchar:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _open(path: str) -> sqlite3.Connection:
+    # No mmap and a 64-page cache, so every page a query touches is an actual read
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA mmap_size = 0")
+    db.execute("PRAGMA cache_size = 64")
+    return db
+
+
+def _plan(path: str, sql: str) -> str:
+    db = _open(path)
+    try:
+        details = [row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    finally:
+        db.close()
+    scans = [detail for detail in details if detail.startswith(('SCAN', 'SEARCH'))]
+    return '; '.join(scans or details)
+
+
+def _run(path: str, sql: str, repeat: int) -> tuple[list, int, float]:
+    """(rows, bytes read, best latency in ms), each run on a fresh connection"""
+    rows, read, timings = [], 0, []
+    for _ in range(repeat):
+        db = _open(path)
+        try:
+            before = _read_bytes()
+            started = time.perf_counter()
+            rows = db.execute(sql).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+            read = _read_bytes() - before
+        finally:
+            db.close()
+    return rows, read, min(timings)
+
+
+def statements() -> list:
+    """(name, statement as before, statement as rewritten) for every statement the rewrite changes"""
+    queries = {f"intent: {intent.name}": intent.sql(2025) for intent in SQL_INTENTS}
+    queries.update(BENCHMARK_QUERIES)
+    queries.update(PERIOD_QUERIES)
+    pairs = [(name, sql, rewrite_date_predicates(sql)) for name, sql in queries.items()]
+    pairs += [(name, legacy, _finalize_sql(sql, extract_year_from_nlq(nlq)))
+              for name, (legacy, sql, nlq) in GUARDED_QUERIES.items()]
+    return [(name, before, after) for name, before, after in pairs if before != after]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--medical-records', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--show-plans', action='store_true', help="print the SQLite access path of each statement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'warehouse.sqlite3')
+        seed_database(path, args.transactions, args.medical_records)
+        db = sqlite3.connect(path)
+        db.executescript(CLUSTER_SQL)
+        db.close()
+        print(f"Database file: {os.path.getsize(path) / 1e6:.1f} MB\n")
+
+        print(f"{'statement':40s} {'read MB':>8s} {'->':>2s} {'rewritten':>9s} {'ms':>8s} {'->':>2s} {'rewritten':>9s}  rows")
+        totals = [0, 0, 0.0, 0.0]
+        mismatches = 0
+        for name, sql, rewritten in statements():
+            original_sql, rewritten_sql = translate_snowflake_sql(sql), translate_snowflake_sql(rewritten)
+            original_rows, original_read, original_ms = _run(path, original_sql, args.repeat)
+            rewritten_rows, rewritten_read, rewritten_ms = _run(path, rewritten_sql, args.repeat)
+            same = sorted(map(repr, original_rows)) == sorted(map(repr, rewritten_rows))
+            mismatches += not same
+            totals[0] += original_read
+            totals[1] += rewritten_read
+            totals[2] += original_ms
+            totals[3] += rewritten_ms
+            print(f"{name[:40]:40s} {original_read / 1e6:8.2f} -> {rewritten_read / 1e6:9.2f} "
+                  f"{original_ms:8.2f} -> {rewritten_ms:9.2f}  {'same' if same else 'DIFFERENT'}")
+            if args.show_plans:
+                print(f"    before: {_plan(path, original_sql)}")
+                print(f"    after:  {_plan(path, rewritten_sql)}")
+                print(f"    sql:    {rewritten}")
+
+        print(f"\n{'total':40s} {totals[0] / 1e6:8.2f} -> {totals[1] / 1e6:9.2f} "
+              f"{totals[2]:8.2f} -> {totals[3]:9.2f}")
+        if mismatches:
+            print(f"⚠️  {mismatches} statements returned different rows after the rewrite")
+
+
+if __name__ == "__main__":
+    main()
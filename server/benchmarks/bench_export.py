@@ -0,0 +1,96 @@
+"""
+Rows per second and peak memory of the streaming result export, per format.
+
+Seeds a local backend database and exports the full rows of each statement through
+iter_sql_result() + iter_export() - what /api/export streams - as CSV, NDJSON and Arrow
+IPC, discarding the chunks. For comparison, the buffered path an export would otherwise
+take (fetch every row, then serialize one JSON document) runs on the same statements.
+Throughput is the best of --repeat runs; peak memory is measured with tracemalloc in a
+separate run, so it does not slow the timed ones. Streaming peaks stay at about one batch
+as the row count grows; the buffered peak grows with it.
+
+    python server/benchmarks/bench_export.py --transactions 400000 --medical-records 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+STATEMENTS = {
+    'all transactions': "SELECT * FROM FINANCIAL_TRANSACTIONS",
+    'visits for a diagnosis': "SELECT patient_id, visit_date, diagnosis, treatment_cost, notes FROM MEDICAL_RECORDS "
+                              "WHERE diagnosis = 'Hypertension'",
+}
+
+
+def _buffered(sql: str) -> int:
+    """Fetch everything, then serialize one JSON array; returns bytes produced"""
+    from query_result import QueryResult
+    from snowflake_connector import iter_sql_result
+    columns, rows = (), []
+    for columns, batch in iter_sql_result(sql):
+        rows.extend(batch)
+    return len(json.dumps(QueryResult('structured', columns=columns, rows=rows).records()).encode())
+
+
+def _streamed(sql: str, fmt: str) -> int:
+    from result_export import iter_export
+    from snowflake_connector import iter_sql_result
+    return sum(len(chunk) for chunk in iter_export(iter_sql_result(sql), fmt))
+
+
+def _measure(run, repeat: int) -> tuple[float, int, int]:
+    """(best seconds, bytes produced, peak traced bytes)"""
+    timings = []
+    produced = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        produced = run()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), produced, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--medical-records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            'SQL_BACKEND': 'local',
+            'LOCAL_DB_PATH': os.path.join(directory, 'warehouse.sqlite3'),
+            'LOCAL_DB_TRANSACTIONS': str(args.transactions),
+            'LOCAL_DB_MEDICAL_RECORDS': str(args.medical_records),
+            'SQL_CACHE_ENABLED': 'false',
+        })
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from local_backend import seed_database
+        from result_export import EXPORT_FORMATS, export_available
+        from snowflake_connector import iter_sql_result
+        seed_database(os.environ['LOCAL_DB_PATH'], args.transactions, args.medical_records)
+
+        print(f"{'statement':24s} {'format':13s} {'rows':>8s} {'rows/s':>10s} {'MB':>7s} {'MB/s':>7s} {'peak MB':>8s}")
+        for name, sql in STATEMENTS.items():
+            rows = sum(len(batch) for _, batch in iter_sql_result(sql))
+            runs = {fmt: (lambda fmt=fmt: _streamed(sql, fmt)) for fmt in EXPORT_FORMATS if export_available(fmt)}
+            runs['buffered json'] = lambda: _buffered(sql)
+            for label, run in runs.items():
+                seconds, produced, peak = _measure(run, args.repeat)
+                print(f"{name[:24]:24s} {label:13s} {rows:8d} {rows / seconds:10,.0f} {produced / 1e6:7.1f} "
+                      f"{produced / 1e6 / seconds:7.1f} {peak / 1e6:8.2f}")
+        if not export_available('arrow'):
+            print("\narrow skipped: pyarrow is not installed")
+
+
+if __name__ == "__main__":
+    main()
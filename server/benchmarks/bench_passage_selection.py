@@ -0,0 +1,84 @@
+"""
+Prompt size and answer coverage of BM25 passage selection for PDF questions.
+
+Builds a long synthetic annual report in which each question's answer appears in exactly
+one passage, then compares the prompt tokens of sending the whole document with those of
+select_passages(), checks the answer-bearing passage survives selection, and times the
+selection itself.
+
+    python server/benchmarks/bench_passage_selection.py --sections 60
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PDF_CONTEXT_TOKENS
+from passage_ranker import select_passages
+from summarizer import estimate_tokens
+
+SEGMENTS = ["consulting", "services", "product licenses", "support contracts", "cloud hosting",
+            "training", "hardware resale", "managed security"]
+REGIONS = ["North America", "Europe", "Asia Pacific", "Latin America"]
+
+# (question, fact that answers it) - each fact is planted once in the report
+NEEDLES = [
+    ("What was the amount of invoice INV-24-5848?",
+     "Invoice INV-24-5848 issued to Manufacturing Plus totalled $184,250 with net 30 terms."),
+    ("How much did payroll cost in fiscal 2024?",
+     "Payroll expense for fiscal 2024 was $12.4 million, up 6% on the prior year."),
+    ("What is the dividend per share?",
+     "The board approved a final dividend of $0.42 per share payable in March."),
+    ("How many employees do we have at year end?",
+     "Headcount at year end stood at 1,284 employees across nine offices."),
+    ("What was the goodwill impairment charge?",
+     "A goodwill impairment charge of $3.1 million was recorded for the hardware resale unit."),
+]
+
+
+def build_report(sections: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    paragraphs = ["Annual Report 2024. This document presents the consolidated results of the group "
+                  "for the fiscal year ended December 31, 2024."]
+    for i in range(sections):
+        segment, region = rng.choice(SEGMENTS), rng.choice(REGIONS)
+        paragraphs.append(
+            f"Section {i + 1}: {segment.title()} in {region}. Revenue from {segment} in {region} reached "
+            f"${rng.randint(2, 90)}.{rng.randint(0, 9)} million, a change of {rng.randint(-12, 25)}% year over "
+            f"year. Margins were {rng.choice(['stable', 'higher', 'slightly lower'])} as the team "
+            f"{rng.choice(['renegotiated supplier terms', 'expanded the sales force', 'invested in automation'])}. "
+            f"Management expects {rng.choice(['continued growth', 'a flat year', 'moderate expansion'])} in "
+            f"{region} driven by {rng.choice(SEGMENTS)} demand and customer retention of "
+            f"{rng.randint(80, 97)}%.")
+    for offset, (_, fact) in enumerate(NEEDLES):
+        paragraphs.insert(1 + (offset + 1) * len(paragraphs) // (len(NEEDLES) + 1), fact)
+    return "\n\n".join(paragraphs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=60)
+    parser.add_argument('--budget', type=int, default=PDF_CONTEXT_TOKENS, help='prompt token budget')
+    args = parser.parse_args()
+
+    report = build_report(args.sections)
+    full_tokens = estimate_tokens(report)
+    print(f"Report: {args.sections} sections, {full_tokens} tokens; budget {args.budget} tokens\n")
+    print(f"{'question':48s} {'tokens':>7s} {'select':>9s}  answer kept")
+    kept_total = 0
+    for question, fact in NEEDLES:
+        selected = select_passages(report, question, max_tokens=args.budget)
+        seconds = min(timeit.repeat(lambda: select_passages(report, question, max_tokens=args.budget),
+                                    number=5, repeat=3)) / 5
+        kept = fact in selected
+        kept_total += kept
+        print(f"{question[:48]:48s} {estimate_tokens(selected):7d} {seconds * 1000:7.2f}ms  {'yes' if kept else 'NO'}")
+    print(f"\nFull document: {full_tokens} prompt tokens per question; answers kept {kept_total}/{len(NEEDLES)}")
+
+
+if __name__ == "__main__":
+    main()
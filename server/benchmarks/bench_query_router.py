@@ -0,0 +1,139 @@
+"""
+Micro-benchmark: per-query routing cost of the keyword cascades that process_nlq used to
+run versus the single-pass query_router. Also checks both produce the same decisions.
+
+    python server/benchmarks/bench_query_router.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_router import route_query
+
+QUERIES = [
+    "What is the total revenue in 2025?",
+    "What is the financial summary for Q2?",
+    "Show me revenue growth over the years",
+    "Which invoices are pending approval?",
+    "Approve invoice INV-24-5848 from Tech Solutions",
+    "Mark as paid the invoice sent to Manufacturing Plus",
+    "Show overdue receivables",
+    "Open financial dashboard",
+    "Show medical analytics in Power BI",
+    "Summarize the annual report pdf",
+    "Give me the annual medical summary",
+    "Consolidated highlights for all 2024 quarterly reports",
+    "Patient cost summary for 2025",
+    "Diagnosis trends 2024",
+    "Monthly medical costs",
+    "Q3 medical report overview",
+    "How much did we spend on consulting services in 2023?",
+    "What were total expenses in 2024 compared to the previous year and which month had the maximum spend?",
+]
+
+
+def legacy_route(nlq: str):
+    """The routing checks process_nlq, classify_query, is_medical_query and wants_consolidation ran before"""
+    nlq_lower = nlq.lower()
+    quarters = ["q1", "q2", "q3", "q4"]
+    medical_keywords = [
+        "patient", "diagnosis", "treatment", "medical", "visit",
+        "medical cost", "treatment cost", "patient cost", "diagnosis trends",
+        "medical record", "medical report", "medical summary"
+    ]
+    is_medical = any(keyword in nlq_lower for keyword in medical_keywords)
+    consolidation_keywords = ["all", "overall", "full year", "annual", "ytd", "entire", "consolidated", "highlights", "overview", "reports", "year"]
+    has_quarter = any(q in nlq_lower for q in quarters)
+    consolidation = any(keyword in nlq_lower for keyword in consolidation_keywords) and not has_quarter
+    quarter = next((q for q in quarters if q in nlq_lower), None)
+    annual_summary = "annual" in nlq_lower or "summary" in nlq_lower
+
+    ap_strong_indicators = [
+        "approve invoice", "approve the invoice", "pending approval",
+        "awaiting approval", "reject invoice", "reject the invoice",
+        "accounts payable", "ap automation", "vendor invoice",
+        "invoice processing", "invoice automation", "ap dashboard"
+    ]
+    ap_vendor_indicators = ["tech solutions", "global tech", "office supplies co", "cloud services inc", "consulting partners"]
+    general_invoice_indicators = ["invoice", "invoices", "which invoices", "show invoices", "invoice status"]
+    ar_strong_indicators = [
+        "accounts receivable", "ar automation", "customer invoice",
+        "receivable", "receivables", "collection", "customer payment",
+        "ar dashboard", "invoice sent to", "invoice to"
+    ]
+    ar_customer_indicators = ["manufacturing plus", "techcorp", "global retailers", "service dynamics"]
+    status_action_indicators = [
+        "change status", "update status", "mark as", "set status",
+        "change the status", "update the status", "mark it as", "set it to"
+    ]
+    financial_indicators = ["financial dashboard", "finance dashboard", "financial analytics",
+                            "finance report", "financial report", "show financial", "open financial"]
+    medical_indicators = ["medical dashboard", "medical analytics", "medical report",
+                          "show medical", "open medical", "healthcare dashboard"]
+
+    route = None
+    if any(i in nlq_lower for i in ap_strong_indicators) or any(v in nlq_lower for v in ap_vendor_indicators):
+        route = "genai_invoice_suite"
+    elif (any(i in nlq_lower for i in ar_strong_indicators) or any(c in nlq_lower for c in ar_customer_indicators)
+          or any(i in nlq_lower for i in status_action_indicators)):
+        route = "genai_ar_suite"
+    elif any(i in nlq_lower for i in general_invoice_indicators):
+        route = "genai_invoice_suite"
+    elif any(i in nlq_lower for i in financial_indicators):
+        route = "powerbi_financial_dashboard"
+    elif any(i in nlq_lower for i in medical_indicators):
+        route = "powerbi_medical_dashboard"
+    elif "power bi" in nlq_lower or "powerbi" in nlq_lower:
+        route = "powerbi_financial_dashboard"
+
+    pdf_indicators = [
+        "annual report", "pdf", "document", "invoice", "q4 invoice",
+        "uploaded", "file", "files", "annual medical summary", "medical report content",
+        "show me the medical report", "content of medical report"
+    ]
+    structured_indicators = [
+        "total", "sum", "maximum", "minimum", "max", "min", "count",
+        "which month", "what month", "expense", "revenue", "amount",
+        "transaction", "calculate", "find", "show me", "financials",
+        "performance", "sold", "services", "products", "consulting",
+        "patient", "diagnosis", "treatment", "cost", "medical", "visit",
+        "diagnosis trends", "patient cost", "treatment cost", "medical cost"
+    ]
+    unstructured_keywords = ["summary", "report", "update", "highlight", "highlights", "overview", "annual", "ytd", "medical report", "medical summary"]
+    if any(i in nlq_lower for i in pdf_indicators):
+        query_type = "pdf"
+    elif any(k in nlq_lower for k in unstructured_keywords) or has_quarter:
+        query_type = "unstructured"
+    elif any(i in nlq_lower for i in structured_indicators):
+        query_type = "structured"
+    else:
+        query_type = "structured"
+
+    # process_nlq re-ran the medical check in every branch that built a source label
+    for _ in range(3):
+        is_medical = any(keyword in nlq_lower for keyword in medical_keywords)
+    return route, query_type, is_medical, consolidation, quarter, annual_summary
+
+
+def router_route(nlq: str):
+    decision = route_query(nlq)
+    return (decision.route, decision.query_type, decision.is_medical,
+            decision.wants_consolidation, decision.quarter, decision.wants_annual_summary)
+
+
+def main(number: int = 20000):
+    mismatches = [q for q in QUERIES if legacy_route(q) != router_route(q)]
+    for query in mismatches:
+        print(f"MISMATCH {query!r}: legacy={legacy_route(query)} router={router_route(query)}")
+    print(f"{len(QUERIES) - len(mismatches)}/{len(QUERIES)} queries routed identically")
+
+    for name, fn in (('legacy cascades', legacy_route), ('single-pass router', router_route)):
+        seconds = timeit.timeit(lambda: [fn(q) for q in QUERIES], number=number)
+        print(f"{name:20s} {seconds / (number * len(QUERIES)) * 1e6:7.2f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Sync cost and query latency of the local table replica.
+
+Seeds a local backend database, reloads the replica from it (timed, rows/s), appends rows
+to both tables and times the incremental sync that pulls them, then runs a set of
+structured statements on the replica and through execute_sql(). The local backend is
+itself SQLite, so the query timings here show the replica's engine cost, not the warehouse
+round trip it saves; the check is that both give the same rows, with sums compared to the
+cent (the replica may add floating-point values in a different order) and rows that tie
+on the ORDER BY key allowed in either order.
+
+    python server/benchmarks/bench_replica.py --transactions 400000 --medical-records 100000
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+STATEMENTS = {
+    'revenue by category': "SELECT category, SUM(amount) as total FROM FINANCIAL_TRANSACTIONS "
+                           "WHERE transaction_date >= '2024-01-01' AND transaction_date < '2025-01-01' "
+                           "AND amount > 0 GROUP BY category ORDER BY total DESC",
+    'one month of spend': "SELECT SUM(ABS(amount)) FROM FINANCIAL_TRANSACTIONS WHERE amount < 0 "
+                          "AND transaction_date >= '2025-06-01' AND transaction_date < '2025-07-01'",
+    'services revenue': "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 "
+                        "AND transaction_date >= '2025-01-01' AND transaction_date < '2026-01-01' "
+                        "AND (description ILIKE '%service%' OR description ILIKE '%consulting%')",
+    'cost per patient': "SELECT patient_id, SUM(treatment_cost) as total_cost FROM MEDICAL_RECORDS "
+                        "WHERE visit_date >= '2024-01-01' AND visit_date < '2025-01-01' "
+                        "GROUP BY patient_id ORDER BY total_cost DESC",
+}
+
+
+def _rounded(rows: list) -> list:
+    return sorted(tuple(round(value, 2) if isinstance(value, float) else value for value in row) for row in rows)
+
+
+def _timed(run, repeat: int):
+    """(median milliseconds, last result)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--medical-records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            'SQL_BACKEND': 'local',
+            'LOCAL_DB_PATH': os.path.join(directory, 'warehouse.sqlite3'),
+            'LOCAL_DB_TRANSACTIONS': str(args.transactions),
+            'LOCAL_DB_MEDICAL_RECORDS': str(args.medical_records),
+            'RESULT_STORE_ENABLED': 'false',
+            'SQL_CACHE_ENABLED': 'false',
+        })
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from local_backend import seed_database
+        from snowflake_connector import execute_sql
+        from table_replica import REPLICATED_TABLES, TableReplica
+        seed_database(os.environ['LOCAL_DB_PATH'], args.transactions, args.medical_records)
+
+        # No background thread: syncs run here, so they can be timed
+        replica = TableReplica(path=os.path.join(directory, 'replica.sqlite3'), enabled=True)
+        replica._stopped = True
+        for table in REPLICATED_TABLES:
+            started = time.perf_counter()
+            replica.sync(table, force=True)
+            seconds = time.perf_counter() - started
+            rows = replica.stats()['tables'][table]['rows']
+            print(f"reload {table:24s} {rows:8d} rows {seconds * 1000:8.0f}ms {rows / seconds:10,.0f} rows/s")
+
+        with sqlite3.connect(os.environ['LOCAL_DB_PATH']) as db:
+            db.execute("INSERT INTO financial_transactions SELECT transaction_id + 100000000, '2025-12-31', amount, "
+                       "category, description FROM financial_transactions WHERE transaction_id % 100 = 0")
+            db.execute("INSERT INTO medical_records SELECT patient_id, '2025-12-31', diagnosis, treatment_cost, notes "
+                       "FROM medical_records WHERE patient_id % 100 = 0")
+        for table in REPLICATED_TABLES:
+            before = replica.stats()['rows_pulled']
+            started = time.perf_counter()
+            outcome = replica.sync(table, force=True)
+            print(f"{outcome:6s} {table:24s} {replica.stats()['rows_pulled'] - before:8d} rows "
+                  f"{(time.perf_counter() - started) * 1000:8.0f}ms")
+
+        print(f"\n{'statement':20s} {'rows':>6s} {'replica ms':>11s} {'execute_sql ms':>15s} same")
+        for name, sql in STATEMENTS.items():
+            replica_ms, answer = _timed(lambda: replica.answer(sql, 10 ** 6), args.repeat)
+            warehouse_ms, rows = _timed(lambda: execute_sql(sql, use_cache=False), args.repeat)
+            same = answer is not None and _rounded(answer.rows) == _rounded(rows)
+            print(f"{name:20s} {len(rows):6d} {replica_ms:11.2f} {warehouse_ms:15.2f} {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,25 @@ AZURE_OPENAI_API_KEY: Optional[str] = os.getenv('AZURE_OPENAI_API_KEY')
 AZURE_OPENAI_DEPLOYMENT_NAME: str = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4o')
 AZURE_OPENAI_API_VERSION: str = os.getenv('AZURE_OPENAI_API_VERSION', '2024-12-01-preview')
 USE_ENTRA_ID: bool = os.getenv('USE_ENTRA_ID', 'False').lower() == 'true'
+ENTRA_TOKEN_SCOPE: str = os.getenv('ENTRA_TOKEN_SCOPE', 'https://cognitiveservices.azure.com/.default')
+# Seconds before expiry at which the cached Entra ID token is refreshed in the background
+ENTRA_TOKEN_REFRESH_MARGIN: float = float(os.getenv('ENTRA_TOKEN_REFRESH_MARGIN', '300'))
+# A token with less validity than this is not handed out; callers wait for the refresh instead
+ENTRA_TOKEN_MIN_VALIDITY: float = float(os.getenv('ENTRA_TOKEN_MIN_VALIDITY', '60'))
+
+# Shared LLM HTTP client pool (one per worker process); size LLM_MAX_CONNECTIONS to the
+# number of requests a worker serves concurrently
+LLM_MAX_CONNECTIONS: int = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '10'))
+LLM_KEEPALIVE_EXPIRY: float = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '120'))
+LLM_HTTP2: bool = os.getenv('LLM_HTTP2', 'True').lower() == 'true'
+LLM_CONNECT_TIMEOUT: float = float(os.getenv('LLM_CONNECT_TIMEOUT', '10'))
+# Read timeouts per call purpose, in seconds
+LLM_TIMEOUTS: dict = {
+    'sql': float(os.getenv('LLM_TIMEOUT_SQL', '30')),
+    'summary': float(os.getenv('LLM_TIMEOUT_SUMMARY', '60')),
+    'narrative': float(os.getenv('LLM_TIMEOUT_NARRATIVE', '20')),
+}
 
 # Snowflake Configuration
 SNOWFLAKE_ACCOUNT: str = os.getenv('SNOWFLAKE_ACCOUNT', '')
@@ -22,6 +41,114 @@ SNOWFLAKE_WAREHOUSE: str = os.getenv('SNOWFLAKE_WAREHOUSE', '')
 SNOWFLAKE_DATABASE: str = os.getenv('SNOWFLAKE_DATABASE', 'financial_demo')
 SNOWFLAKE_SCHEMA: str = os.getenv('SNOWFLAKE_SCHEMA', 'public')
 
+# Snowflake Connection Pool
+SNOWFLAKE_POOL_MAX_SIZE: int = int(os.getenv('SNOWFLAKE_POOL_MAX_SIZE', '8'))
+SNOWFLAKE_POOL_TIMEOUT: float = float(os.getenv('SNOWFLAKE_POOL_TIMEOUT', '30'))
+SNOWFLAKE_POOL_MAX_AGE: float = float(os.getenv('SNOWFLAKE_POOL_MAX_AGE', '3300'))
+SNOWFLAKE_POOL_HEALTH_CHECK_IDLE: float = float(os.getenv('SNOWFLAKE_POOL_HEALTH_CHECK_IDLE', '300'))
+# Full-result reads (exports, replica loads) use connections of their own, outside the pool; at most this many at once
+SNOWFLAKE_EXPORT_MAX_CONNECTIONS: int = int(os.getenv('SNOWFLAKE_EXPORT_MAX_CONNECTIONS', '2'))
+
+# Snowflake Result Fetching
+SNOWFLAKE_FETCH_BATCH_SIZE: int = int(os.getenv('SNOWFLAKE_FETCH_BATCH_SIZE', '1000'))
+SNOWFLAKE_FETCH_MAX_BYTES: int = int(os.getenv('SNOWFLAKE_FETCH_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Snowflake Asynchronous Execution
+SNOWFLAKE_ASYNC_MAX_CONCURRENCY: int = int(os.getenv('SNOWFLAKE_ASYNC_MAX_CONCURRENCY', '4'))
+SNOWFLAKE_ASYNC_POLL_INTERVAL: float = float(os.getenv('SNOWFLAKE_ASYNC_POLL_INTERVAL', '0.25'))
+SNOWFLAKE_ASYNC_MAX_POLL_INTERVAL: float = float(os.getenv('SNOWFLAKE_ASYNC_MAX_POLL_INTERVAL', '2.0'))
+
+# SQL Result Cache
+SQL_CACHE_ENABLED: bool = os.getenv('SQL_CACHE_ENABLED', 'True').lower() == 'true'
+SQL_CACHE_MAX_ENTRIES: int = int(os.getenv('SQL_CACHE_MAX_ENTRIES', '256'))
+SQL_CACHE_MAX_BYTES: int = int(os.getenv('SQL_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+# Seconds a cached result stays valid, per source table (a query uses the shortest TTL of its tables)
+SQL_CACHE_TABLE_TTLS: dict = {
+    'FINANCIAL_TRANSACTIONS': float(os.getenv('SQL_CACHE_TTL_FINANCIAL_TRANSACTIONS', '300')),
+    'FINANCIAL_REPORTS': float(os.getenv('SQL_CACHE_TTL_FINANCIAL_REPORTS', '3600')),
+    'MEDICAL_RECORDS': float(os.getenv('SQL_CACHE_TTL_MEDICAL_RECORDS', '300')),
+    'MEDICAL_REPORTS': float(os.getenv('SQL_CACHE_TTL_MEDICAL_REPORTS', '3600')),
+}
+SQL_CACHE_DEFAULT_TTL: float = float(os.getenv('SQL_CACHE_DEFAULT_TTL', '60'))
+
+# SQL Execution Backend: 'snowflake' or 'local' (embedded SQLite seeded with synthetic data)
+SQL_BACKEND: str = os.getenv('SQL_BACKEND', 'snowflake').lower()
+LOCAL_DB_PATH: str = os.getenv('LOCAL_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'local_warehouse.sqlite3'))
+LOCAL_DB_TRANSACTIONS: int = int(os.getenv('LOCAL_DB_TRANSACTIONS', '100000'))
+LOCAL_DB_MEDICAL_RECORDS: int = int(os.getenv('LOCAL_DB_MEDICAL_RECORDS', '20000'))
+LOCAL_DB_SEED: int = int(os.getenv('LOCAL_DB_SEED', '42'))
+# Re-seed an existing local database whose scale or seed differs from the above; otherwise it is kept
+LOCAL_DB_RESEED: bool = os.getenv('LOCAL_DB_RESEED', 'False').lower() == 'true'
+
+# NLQ -> SQL Translation Cache (SQLite file shared by all workers)
+NLQ_CACHE_ENABLED: bool = os.getenv('NLQ_CACHE_ENABLED', 'True').lower() == 'true'
+NLQ_CACHE_PATH: str = os.getenv('NLQ_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nlq_cache.sqlite3'))
+NLQ_CACHE_TTL: float = float(os.getenv('NLQ_CACHE_TTL', str(7 * 24 * 3600)))
+# Year-parameterized templates: a template serves new years once the LLM has confirmed it this many times
+NLQ_TEMPLATE_ENABLED: bool = os.getenv('NLQ_TEMPLATE_ENABLED', 'True').lower() == 'true'
+NLQ_TEMPLATE_MIN_CONFIRMATIONS: int = int(os.getenv('NLQ_TEMPLATE_MIN_CONFIRMATIONS', '1'))
+# Rewrite YEAR()/MONTH()/QUARTER() filters into date ranges Snowflake can prune micro-partitions on
+SQL_DATE_REWRITE_ENABLED: bool = os.getenv('SQL_DATE_REWRITE_ENABLED', 'True').lower() == 'true'
+
+# Single-flight: identical concurrent SQL generation, Snowflake and summary calls share one execution
+SINGLE_FLIGHT_ENABLED: bool = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+# Seconds a thread waits on another request's call before running the work itself
+SINGLE_FLIGHT_WAIT_TIMEOUT: float = float(os.getenv('SINGLE_FLIGHT_WAIT_TIMEOUT', '120'))
+
+# Unstructured Summary Cache (SQLite file shared by all workers, LRU-bounded, keyed by content hash)
+SUMMARY_CACHE_ENABLED: bool = os.getenv('SUMMARY_CACHE_ENABLED', 'True').lower() == 'true'
+SUMMARY_CACHE_PATH: str = os.getenv('SUMMARY_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'summary_cache.sqlite3'))
+SUMMARY_CACHE_MAX_ENTRIES: int = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '512'))
+
+# Map-reduce summarization: token budget per chunk and concurrent chunk completions per process
+SUMMARY_CHUNK_TOKENS: int = int(os.getenv('SUMMARY_CHUNK_TOKENS', '3000'))
+SUMMARY_MAP_CONCURRENCY: int = int(os.getenv('SUMMARY_MAP_CONCURRENCY', '4'))
+
+# PDF questions: prompt token budget for the passages selected from a document, and passage size
+PDF_CONTEXT_TOKENS: int = int(os.getenv('PDF_CONTEXT_TOKENS', '1500'))
+PDF_PASSAGE_TOKENS: int = int(os.getenv('PDF_PASSAGE_TOKENS', '150'))
+
+# Local full-text index of report content (SQLite FTS5 file shared by all workers, memory-mapped)
+REPORT_INDEX_ENABLED: bool = os.getenv('REPORT_INDEX_ENABLED', 'True').lower() == 'true'
+REPORT_INDEX_PATH: str = os.getenv('REPORT_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'report_index.sqlite3'))
+# Seconds between incremental syncs of a report table with the warehouse
+REPORT_INDEX_SYNC_INTERVAL: float = float(os.getenv('REPORT_INDEX_SYNC_INTERVAL', '300'))
+REPORT_INDEX_MMAP_BYTES: int = int(os.getenv('REPORT_INDEX_MMAP_BYTES', str(256 * 1024 * 1024)))
+
+# Paginated result cursors: structured results with more rows than the answer shows are spooled
+# to a SQLite file shared by all workers and paged through /api/results/<id>
+RESULT_STORE_ENABLED: bool = os.getenv('RESULT_STORE_ENABLED', 'True').lower() == 'true'
+RESULT_STORE_PATH: str = os.getenv('RESULT_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'result_store.sqlite3'))
+# Results with more rows than this get a handle (the structured answer renders 5)
+RESULT_STORE_THRESHOLD: int = int(os.getenv('RESULT_STORE_THRESHOLD', '5'))
+# Seconds a result stays pageable after it was last read
+RESULT_STORE_TTL: float = float(os.getenv('RESULT_STORE_TTL', '1800'))
+RESULT_STORE_MAX_ROWS: int = int(os.getenv('RESULT_STORE_MAX_ROWS', '1000000'))
+RESULT_STORE_MAX_RESULTS: int = int(os.getenv('RESULT_STORE_MAX_RESULTS', '200'))
+RESULT_PAGE_SIZE: int = int(os.getenv('RESULT_PAGE_SIZE', '100'))
+RESULT_PAGE_MAX_SIZE: int = int(os.getenv('RESULT_PAGE_MAX_SIZE', '1000'))
+
+# Materialized aggregates: the canned structured intents are answered from in-memory rollups,
+# rebuilt when a table's watermark (max id / date, row count) moves
+AGGREGATE_STORE_ENABLED: bool = os.getenv('AGGREGATE_STORE_ENABLED', 'True').lower() == 'true'
+# Seconds between watermark checks, and the longest a table's rollups go without a rebuild
+AGGREGATE_CHECK_INTERVAL: float = float(os.getenv('AGGREGATE_CHECK_INTERVAL', '30'))
+AGGREGATE_REFRESH_INTERVAL: float = float(os.getenv('AGGREGATE_REFRESH_INTERVAL', '3600'))
+# Answers are served only while the last successful watermark check is at most this old
+AGGREGATE_MAX_STALENESS: float = float(os.getenv('AGGREGATE_MAX_STALENESS', '120'))
+
+# Local replica of FINANCIAL_TRANSACTIONS / MEDICAL_RECORDS (SQLite file shared by all workers, memory-mapped),
+# synced incrementally by id / date watermark. Off by default: the replica computes in floating point where
+# Snowflake sums scaled NUMBERs exactly
+REPLICA_ENABLED: bool = os.getenv('REPLICA_ENABLED', 'False').lower() == 'true'
+REPLICA_PATH: str = os.getenv('REPLICA_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'table_replica.sqlite3'))
+REPLICA_SYNC_INTERVAL: float = float(os.getenv('REPLICA_SYNC_INTERVAL', '60'))
+# Freshness SLA: statements only run on the replica while every table they read synced at most this long ago
+REPLICA_MAX_STALENESS: float = float(os.getenv('REPLICA_MAX_STALENESS', '300'))
+REPLICA_MMAP_BYTES: int = int(os.getenv('REPLICA_MMAP_BYTES', str(1024 * 1024 * 1024)))
+# Seconds between full reloads, which also pick up rows edited in place below the watermark
+REPLICA_RELOAD_INTERVAL: float = float(os.getenv('REPLICA_RELOAD_INTERVAL', '86400'))
+
 class Config:
     """Configuration class for the Financial NLQ system"""
     
@@ -42,6 +169,7 @@ class Config:
     SNOWFLAKE_WAREHOUSE: str = SNOWFLAKE_WAREHOUSE
     SNOWFLAKE_DATABASE: str = SNOWFLAKE_DATABASE
     SNOWFLAKE_SCHEMA: str = SNOWFLAKE_SCHEMA
+    SQL_BACKEND: str = SQL_BACKEND
     
     # Application Configuration
     DEBUG: bool = os.getenv('DEBUG', 'True').lower() == 'true'
@@ -58,14 +186,18 @@ class Config:
             print("⚠️  Warning: No OpenAI credentials found. Using mock responses.")
             print("   Set AZURE_OPENAI_ENDPOINT + AZURE_OPENAI_API_KEY or OPENAI_API_KEY")
         
-        if not self.SNOWFLAKE_ACCOUNT:
-            print("⚠️  Warning: No Snowflake credentials found. Using mock data.")
+        if self.SQL_BACKEND == 'local':
+            print(f"🧪 Using local SQL backend with synthetic data: {LOCAL_DB_PATH}")
+        elif not self.SNOWFLAKE_ACCOUNT:
+            print("⚠️  Warning: No Snowflake credentials found.")
             print("   Set SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER, SNOWFLAKE_PASSWORD")
+            print("   or SQL_BACKEND=local to use the offline mock data backend")
     
     def get_connection_status(self) -> dict:
         """Get the status of configured connections"""
         return {
             'azure_openai': bool(self.AZURE_OPENAI_ENDPOINT and self.AZURE_OPENAI_API_KEY),
             'openai': bool(self.OPENAI_API_KEY),
-            'snowflake': bool(self.SNOWFLAKE_ACCOUNT and self.SNOWFLAKE_USER and self.SNOWFLAKE_PASSWORD)
+            'snowflake': bool(self.SNOWFLAKE_ACCOUNT and self.SNOWFLAKE_USER and self.SNOWFLAKE_PASSWORD),
+            'sql_backend': self.SQL_BACKEND
         }
\ No newline at end of file
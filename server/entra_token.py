@@ -0,0 +1,173 @@
+"""
+Cached Entra ID access tokens for Azure OpenAI.
+
+The OpenAI SDK calls azure_ad_token_provider before every request. Handing it
+DefaultAzureCredential().get_token directly means a managed-identity or Azure CLI round
+trip per chat completion. EntraTokenManager keeps the token in memory and a daemon thread
+refreshes it ENTRA_TOKEN_REFRESH_MARGIN seconds before it expires, so requests only ever
+read the cached value. A request only waits when there is no usable token at all (first
+call, or the background refresh kept failing), and concurrent waiters share one refresh.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from azure.identity import DefaultAzureCredential
+from config import ENTRA_TOKEN_SCOPE, ENTRA_TOKEN_REFRESH_MARGIN, ENTRA_TOKEN_MIN_VALIDITY
+
+# Retry delays for failed background refreshes, doubling up to the cap
+_RETRY_MIN_DELAY = 5.0
+_RETRY_MAX_DELAY = 60.0
+
+
+class EntraTokenManager:
+    """Thread-safe token cache with proactive background refresh"""
+
+    def __init__(self, credential, scope: str = ENTRA_TOKEN_SCOPE,
+                 refresh_margin: float = ENTRA_TOKEN_REFRESH_MARGIN,
+                 min_validity: float = ENTRA_TOKEN_MIN_VALIDITY):
+        self.credential = credential
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self.min_validity = min_validity
+        self._token: Optional[str] = None
+        self._expires_on = 0.0
+        self._fetched_at = 0.0
+        # Held for the duration of a credential call, so concurrent callers share one refresh
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'cache_hits': 0, 'blocking_refreshes': 0, 'background_refreshes': 0,
+                       'failures': 0, 'last_refresh_ms': 0.0, 'max_refresh_ms': 0.0,
+                       'total_refresh_ms': 0.0, 'last_error': None}
+
+    def _bump(self, key: str, amount: float = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _usable(self) -> bool:
+        return self._token is not None and self._expires_on - time.time() > self.min_validity
+
+    def _refresh_due_at(self) -> float:
+        # Tokens issued with less lifetime than the margin are refreshed halfway through instead
+        lifetime = self._expires_on - self._fetched_at
+        return self._expires_on - min(self.refresh_margin, lifetime / 2)
+
+    def _refresh(self, background: bool):
+        """Fetches a new token from the credential; caller must hold _refresh_lock"""
+        started = time.perf_counter()
+        try:
+            access_token = self.credential.get_token(self.scope)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats['failures'] += 1
+                self._stats['last_error'] = str(e)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._token = access_token.token
+        self._expires_on = float(access_token.expires_on)
+        self._fetched_at = time.time()
+        with self._stats_lock:
+            self._stats['background_refreshes' if background else 'blocking_refreshes'] += 1
+            self._stats['last_refresh_ms'] = elapsed_ms
+            self._stats['max_refresh_ms'] = max(self._stats['max_refresh_ms'], elapsed_ms)
+            self._stats['total_refresh_ms'] += elapsed_ms
+        print(f"🔑 Entra ID token refreshed in {elapsed_ms:.0f}ms "
+              f"({'background' if background else 'blocking'}), valid for {self._expires_on - time.time():.0f}s",
+              flush=True)
+
+    def _ensure_refresher(self):
+        # Threads do not survive a fork, so a worker that inherited this object starts its own
+        if not self._stopped and (self._thread is None or not self._thread.is_alive()):
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._refresh_loop, name='entra-token-refresh',
+                                                    daemon=True)
+                    self._thread.start()
+
+    def _refresh_loop(self):
+        retry_delay = _RETRY_MIN_DELAY
+        while not self._stopped:
+            refresh_at = self._refresh_due_at()
+            if self._token is not None and time.time() < refresh_at:
+                self._wakeup.wait(refresh_at - time.time())
+                self._wakeup.clear()
+                continue
+            try:
+                with self._refresh_lock:
+                    # A blocking caller may have refreshed while this thread waited for the lock
+                    if self._token is None or time.time() >= self._refresh_due_at():
+                        self._refresh(background=True)
+                retry_delay = _RETRY_MIN_DELAY
+            except Exception as e:
+                print(f"⚠️  Background Entra ID token refresh failed, retrying in {retry_delay:.0f}s: {e}",
+                      flush=True)
+                self._wakeup.wait(retry_delay)
+                self._wakeup.clear()
+                retry_delay = min(retry_delay * 2, _RETRY_MAX_DELAY)
+
+    def start(self):
+        """Starts the background refresher, which fetches the first token right away"""
+        self._ensure_refresher()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def get_token(self) -> str:
+        """Returns a cached access token; only blocks when no usable token is cached"""
+        self._ensure_refresher()
+        if self._usable():
+            self._bump('cache_hits')
+            return self._token
+        with self._refresh_lock:
+            # Another caller (or the refresher) may have fetched a token while we waited
+            if not self._usable():
+                self._refresh(background=False)
+                self._wakeup.set()
+            else:
+                self._bump('cache_hits')
+            return self._token
+
+    async def get_token_async(self) -> str:
+        """get_token() for AsyncAzureOpenAI; a refresh that has to block runs off the event loop"""
+        self._ensure_refresher()
+        if self._usable():
+            self._bump('cache_hits')
+            return self._token
+        return await asyncio.to_thread(self.get_token)
+
+    def stats(self) -> dict:
+        """Refresh latency and failure counters, plus how long the cached token remains valid"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        refreshes = stats['blocking_refreshes'] + stats['background_refreshes']
+        stats['avg_refresh_ms'] = round(stats.pop('total_refresh_ms') / refreshes, 1) if refreshes else 0.0
+        stats['last_refresh_ms'] = round(stats['last_refresh_ms'], 1)
+        stats['max_refresh_ms'] = round(stats['max_refresh_ms'], 1)
+        stats['expires_in'] = round(self._expires_on - time.time()) if self._token is not None else None
+        return stats
+
+
+_manager: Optional[EntraTokenManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_token_manager() -> EntraTokenManager:
+    """Returns the process-wide token manager backed by DefaultAzureCredential"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = EntraTokenManager(DefaultAzureCredential())
+    return _manager
+
+
+def get_token_stats() -> Optional[dict]:
+    """Token manager counters, or None when Entra ID authentication is not in use"""
+    return _manager.stats() if _manager is not None else None
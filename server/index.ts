@@ -99,17 +99,30 @@ app.all(["/api", "/api/"], (req, res) => {
   });
 });
 
-// Add a cache clearing endpoint
-app.post('/api/clear-cache', (req, res) => {
+// Add a cache clearing endpoint (also invalidates the Python SQL result cache)
+app.post('/api/clear-cache', async (req, res) => {
   res.set({
     'Cache-Control': 'no-cache, no-store, must-revalidate',
     'Pragma': 'no-cache',
     'Expires': '0'
   });
   
+  let backend: any = null;
+  try {
+    const response = await fetch('http://localhost:8000/api/clear-cache', {
+      method: 'POST',
+      headers: { 'content-type': 'application/json' },
+      body: JSON.stringify(req.body ?? {})
+    });
+    backend = await response.json();
+  } catch (error) {
+    console.error('Failed to clear Python SQL cache:', error);
+  }
+  
   res.status(200).json({
     status: 'success',
     message: 'Cache clearing instruction sent',
+    backend,
     timestamp: new Date().toISOString()
   });
 });
@@ -1249,6 +1262,9 @@ app.get('/api/dashboard/automation-services', (req, res) => {
   });
 });
 
+// Download formats of /api/export and /api/results/<id>/export (server/result_export.py)
+const EXPORT_CONTENT_TYPES = ['text/csv', 'application/x-ndjson', 'application/vnd.apache.arrow.stream'];
+
 // Proxy API requests to Python Flask backend
 app.use('/api/', async (req, res) => {
   try {
@@ -1269,8 +1285,56 @@ app.use('/api/', async (req, res) => {
     }
     
     const response = await fetch(url, fetchOptions);
+
+    // Server-Sent Events (streaming /api/process-nlq) are relayed chunk by chunk instead of buffered
+    if ((response.headers.get('content-type') || '').includes('text/event-stream') && response.body) {
+      res.status(response.status);
+      res.set({
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache, no-transform',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no'
+      });
+      res.flushHeaders();
+      const reader = response.body.getReader();
+      req.on('close', () => { reader.cancel().catch(() => {}); });
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        res.write(value);
+      }
+      res.end();
+      return;
+    }
+
+    // Exports (CSV, NDJSON, Arrow IPC) are relayed as raw bytes, chunk by chunk: decoding them
+    // as text would corrupt Arrow files, and buffering them would hold the whole download
+    const contentType = response.headers.get('content-type') || '';
+    if (EXPORT_CONTENT_TYPES.some((type) => contentType.startsWith(type)) && response.body) {
+      res.status(response.status);
+      res.set({
+        'Content-Type': contentType,
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+      });
+      const disposition = response.headers.get('content-disposition');
+      if (disposition) {
+        res.set('Content-Disposition', disposition);
+      }
+      res.flushHeaders();
+      const reader = response.body.getReader();
+      req.on('close', () => { reader.cancel().catch(() => {}); });
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        res.write(value);
+      }
+      res.end();
+      return;
+    }
+
     const data = await response.text();
-    
+
     res.status(response.status);
     
     // Add cache-busting headers to all API responses
@@ -1289,6 +1353,11 @@ app.use('/api/', async (req, res) => {
     res.send(data);
   } catch (error) {
     console.error('Proxy error:', error);
+    if (res.headersSent) {
+      // A relayed stream failed or its client went away mid-download
+      res.end();
+      return;
+    }
     res.status(503).json({ error: 'Backend service unavailable' });
   }
 });
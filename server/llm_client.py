@@ -0,0 +1,244 @@
+"""
+Process-wide Azure OpenAI client registry.
+
+Every LLM call in the server (SQL generation in nlq_processor, summaries and invoice
+narratives in app.py) goes through one AzureOpenAI client and therefore one httpx
+connection pool, so TLS connections to the endpoint are reused across call sites instead
+of each module keeping its own. HTTP/2 is used when the optional h2 package is installed.
+Each call purpose gets a view of the shared client with its own timeout. The async
+pipeline gets the same setup as an AsyncAzureOpenAI client per event loop.
+"""
+
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from typing import Optional
+
+import httpx
+from openai import AzureOpenAI, AsyncAzureOpenAI
+
+from config import (AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_API_VERSION,
+                    USE_ENTRA_ID, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    LLM_KEEPALIVE_EXPIRY, LLM_HTTP2, LLM_CONNECT_TIMEOUT, LLM_TIMEOUTS)
+from entra_token import get_token_manager
+
+
+class _PoolMeter:
+    """Request and connection counters shared by the sync and async metered transports"""
+
+    def _init_meter(self):
+        self._lock = threading.Lock()
+        self._seen_connections = weakref.WeakSet()
+        self._stats = {'requests': 0, 'failures': 0, 'in_flight': 0, 'peak_in_flight': 0,
+                       'connections_opened': 0, 'total_wait_ms': 0.0}
+
+    def _begin(self) -> float:
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['in_flight'] += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+        return time.perf_counter()
+
+    def _end(self, started: float, failed: bool):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats['in_flight'] -= 1
+            self._stats['total_wait_ms'] += elapsed_ms
+            if failed:
+                self._stats['failures'] += 1
+            # A connection the pool has not reported before means a new TCP/TLS handshake
+            for connection in self._connections():
+                if connection not in self._seen_connections:
+                    self._seen_connections.add(connection)
+                    self._stats['connections_opened'] += 1
+
+    def _connections(self) -> list:
+        # httpcore exposes the live connections of its pool; tolerate versions that don't
+        return list(getattr(getattr(self, '_pool', None), 'connections', []))
+
+    def stats(self) -> dict:
+        connections = self._connections()
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats['requests']
+        stats['avg_response_headers_ms'] = round(stats.pop('total_wait_ms') / requests, 1) if requests else 0.0
+        stats['open_connections'] = len(connections)
+        stats['idle_connections'] = sum(1 for c in connections if getattr(c, 'is_idle', lambda: False)())
+        stats['http2_connections'] = sum(1 for c in connections
+                                         if 'HTTP/2' in getattr(c, 'info', lambda: '')())
+        stats['max_connections'] = LLM_MAX_CONNECTIONS
+        stats['utilization'] = round(stats['in_flight'] / LLM_MAX_CONNECTIONS, 3) if LLM_MAX_CONNECTIONS else 0.0
+        return stats
+
+
+class _MeteredTransport(_PoolMeter, httpx.HTTPTransport):
+    """HTTP transport that counts requests and the pool connections they were served on"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._init_meter()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = self._begin()
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self._end(started, failed)
+
+
+class _MeteredAsyncTransport(_PoolMeter, httpx.AsyncHTTPTransport):
+    """
+    asyncio counterpart of _MeteredTransport. Requests beyond the pool size wait on a
+    semaphore rather than in httpcore's pool, whose scheduling rescans every queued
+    request each time a connection frees up and gets quadratically slower under the
+    hundreds of concurrent requests an event loop can issue.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._init_meter()
+        self._slots = asyncio.Semaphore(max(1, LLM_MAX_CONNECTIONS))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = self._begin()
+        failed = True
+        try:
+            async with self._slots:
+                response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self._end(started, failed)
+
+
+def _http2_available() -> bool:
+    if not LLM_HTTP2:
+        return False
+    if importlib.util.find_spec('h2') is None:
+        print("⚠️  LLM_HTTP2 is enabled but the h2 package is not installed - using HTTP/1.1")
+        return False
+    return True
+
+
+def _llm_configured() -> bool:
+    if not AZURE_OPENAI_ENDPOINT:
+        print("⚠️  AZURE_OPENAI_ENDPOINT not configured - NLQ features disabled")
+        return False
+    if not USE_ENTRA_ID and not AZURE_OPENAI_API_KEY:
+        print("⚠️  AZURE_OPENAI_API_KEY is required when not using Entra ID - NLQ features disabled")
+        return False
+    return True
+
+
+def _build_client(asynchronous: bool = False):
+    """Returns (client, metered transport), or (None, None) when not configured"""
+    if not _llm_configured():
+        return None, None
+
+    limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                          max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                          keepalive_expiry=LLM_KEEPALIVE_EXPIRY)
+    http2 = _http2_available()
+    timeout = httpx.Timeout(LLM_TIMEOUTS['summary'], connect=LLM_CONNECT_TIMEOUT)
+    if asynchronous:
+        transport = _MeteredAsyncTransport(limits=limits, http2=http2, retries=1)
+        http_client = httpx.AsyncClient(transport=transport, timeout=timeout)
+        client_class = AsyncAzureOpenAI
+    else:
+        transport = _MeteredTransport(limits=limits, http2=http2, retries=1)
+        http_client = httpx.Client(transport=transport, timeout=timeout)
+        client_class = AzureOpenAI
+    auth = 'Entra ID' if USE_ENTRA_ID else 'API key'
+    try:
+        if USE_ENTRA_ID:
+            # Tokens are cached and refreshed in the background instead of fetched per completion
+            token_manager = get_token_manager()
+            token_manager.start()
+            client = client_class(azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                                  azure_ad_token_provider=(token_manager.get_token_async if asynchronous
+                                                           else token_manager.get_token),
+                                  api_version=AZURE_OPENAI_API_VERSION or "2024-02-01",
+                                  http_client=http_client)
+        else:
+            client = client_class(azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                                  api_key=AZURE_OPENAI_API_KEY,
+                                  api_version=AZURE_OPENAI_API_VERSION or "2024-02-01",
+                                  http_client=http_client)
+    except Exception as e:
+        print(f"⚠️  Failed to initialize Azure OpenAI with {auth}: {e}")
+        return None, None
+    print(f"✅ {'Async ' if asynchronous else ''}Azure OpenAI client initialized with {auth} "
+          f"(pool: {LLM_MAX_CONNECTIONS} connections, HTTP/{'2' if http2 else '1.1'})")
+    return client, transport
+
+
+_client: Optional[AzureOpenAI] = None
+_transport: Optional[_MeteredTransport] = None
+_purpose_clients: dict = {}
+_initialized = False
+_lock = threading.Lock()
+
+
+def get_llm_client(purpose: str = 'summary') -> Optional[AzureOpenAI]:
+    """
+    Returns the shared client configured with the timeout for purpose ('sql', 'summary' or
+    'narrative'), or None when Azure OpenAI is not configured.
+    """
+    global _client, _transport, _initialized
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                _client, _transport = _build_client()
+                _initialized = True
+    if _client is None:
+        return None
+    return _purpose_view(_client, _purpose_clients, purpose)
+
+
+def _purpose_view(client, views: dict, purpose: str):
+    view = views.get(purpose)
+    if view is None:
+        # with_options copies the client but keeps its http_client, so every purpose shares the pool
+        view = client.with_options(timeout=httpx.Timeout(LLM_TIMEOUTS[purpose], connect=LLM_CONNECT_TIMEOUT))
+        views[purpose] = view
+    return view
+
+
+# httpx.AsyncClient connections belong to the event loop that opened them, so keep one per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+def get_async_llm_client(purpose: str = 'summary') -> Optional[AsyncAzureOpenAI]:
+    """
+    AsyncAzureOpenAI counterpart of get_llm_client() for the running event loop, or None
+    when Azure OpenAI is not configured.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client, transport = _build_client(asynchronous=True)
+        entry = (client, transport, {})
+        _async_clients[loop] = entry
+    client, _, views = entry
+    if client is None:
+        return None
+    return _purpose_view(client, views, purpose)
+
+
+def get_async_llm_pool_stats() -> Optional[dict]:
+    """Pool counters of the running event loop's async client"""
+    entry = _async_clients.get(asyncio.get_running_loop())
+    return entry[1].stats() if entry is not None and entry[1] is not None else None
+
+
+def get_llm_pool_stats() -> Optional[dict]:
+    """
+    Request counts, connection reuse and utilization of the shared pool. in_flight includes
+    requests waiting for a connection, so utilization above 1 means the pool is too small.
+    """
+    return _transport.stats() if _transport is not None else None
@@ -0,0 +1,511 @@
+"""
+Offline SQL backend: an embedded SQLite database seeded with synthetic data.
+
+Selected with SQL_BACKEND=local. It exposes the subset of the Snowflake connection and
+cursor interface that snowflake_connector/snowflake_async use, so pooling, caching and
+batched fetching behave the same as against a live account. Statements are translated
+from the Snowflake dialect the app emits (VARIANT paths such as
+report_data:content::string, ILIKE, YEAR()/MONTH(), TO_DATE(), DATE_TRUNC()) into SQLite
+before running; constructs without a translation fail with NotSupportedError.
+
+Seed or re-seed the database and time the canned queries with:
+    python local_backend.py --transactions 10000000 --benchmark
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from config import (LOCAL_DB_PATH, LOCAL_DB_TRANSACTIONS, LOCAL_DB_MEDICAL_RECORDS,
+                    LOCAL_DB_SEED, LOCAL_DB_RESEED)
+
+SEED_YEARS = (2023, 2024, 2025)
+INSERT_CHUNK_SIZE = 50000
+
+# --- Snowflake -> SQLite translation ---
+
+_TOKEN_PATTERN = re.compile(r"""
+    '(?:[^']|'')*'            # string literal
+  | "(?:[^"]|"")*"            # quoted identifier
+  | ::                        # cast operator
+  | [A-Za-z_][A-Za-z0-9_$]*   # identifier / keyword
+  | \d+(?:\.\d+)?             # number
+  | \s+                       # whitespace
+  | .                         # any other single character
+""", re.VERBOSE | re.DOTALL)
+
+# Date-part functions rewritten to native strftime() calls (C code, no Python UDF per row)
+_DATE_PART_FORMATS = {'YEAR': '%Y', 'MONTH': '%m', 'DAY': '%d', 'QUARTER': None}
+
+# DATE_TRUNC(part, e) as SQLite date() modifiers; {e} is the translated expression
+_DATE_TRUNC_FORMATS = {
+    'YEAR': "date({e}, 'start of year')",
+    'QUARTER': "date({e}, 'start of month', printf('-%d months', (CAST(strftime('%m', {e}) AS INTEGER) - 1) % 3))",
+    'MONTH': "date({e}, 'start of month')",
+    # Weeks start on Monday, as in Snowflake's default WEEK_START
+    'WEEK': "date({e}, printf('-%d days', (CAST(strftime('%w', {e}) AS INTEGER) + 6) % 7))",
+    'DAY': "date({e})",
+}
+
+_CAST_WRAPPERS = {
+    'STRING': ('CAST(', ' AS TEXT)'),
+    'VARCHAR': ('CAST(', ' AS TEXT)'),
+    'TEXT': ('CAST(', ' AS TEXT)'),
+    'DATE': ('date(', ')'),
+    'INT': ('CAST(', ' AS INTEGER)'),
+    'INTEGER': ('CAST(', ' AS INTEGER)'),
+    'NUMBER': ('CAST(', ' AS REAL)'),
+    'FLOAT': ('CAST(', ' AS REAL)'),
+    'DOUBLE': ('CAST(', ' AS REAL)'),
+    'DECIMAL': ('CAST(', ' AS REAL)'),
+}
+
+
+def _is_word(token: str) -> bool:
+    return bool(token) and (token[0].isalpha() or token[0] == '_')
+
+
+def _next_significant(tokens: list, i: int) -> int:
+    i += 1
+    while i < len(tokens) and not tokens[i].strip():
+        i += 1
+    return i
+
+
+def _prev_significant(tokens: list, i: int) -> int:
+    i -= 1
+    while i >= 0 and not tokens[i].strip():
+        i -= 1
+    return i
+
+
+def _matching_close(tokens: list, open_index: int) -> int:
+    depth = 0
+    for i in range(open_index, len(tokens)):
+        if tokens[i] == '(':
+            depth += 1
+        elif tokens[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _matching_open(tokens: list, close_index: int) -> int:
+    depth = 0
+    for i in range(close_index, -1, -1):
+        if tokens[i] == ')':
+            depth += 1
+        elif tokens[i] == '(':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _translate_date_trunc(tokens: list, name_index: int) -> int:
+    """Replaces DATE_TRUNC(part, expr) at name_index with one token; returns the index after it"""
+    open_index = _next_significant(tokens, name_index)
+    if open_index >= len(tokens) or tokens[open_index] != '(':
+        return name_index + 1
+    close_index = _matching_close(tokens, open_index)
+    part_index = _next_significant(tokens, open_index)
+    comma_index = _next_significant(tokens, part_index)
+    part = tokens[part_index].strip("'").upper() if part_index < close_index else ''
+    if part not in _DATE_TRUNC_FORMATS or comma_index >= close_index or tokens[comma_index] != ',':
+        raise sqlite3.NotSupportedError(
+            f"DATE_TRUNC({part or '?'}, ...) is not supported by the local SQL backend; "
+            f"use one of {', '.join(_DATE_TRUNC_FORMATS)}")
+    expression = translate_snowflake_sql(''.join(tokens[comma_index + 1:close_index]))
+    tokens[name_index:close_index + 1] = [f"({_DATE_TRUNC_FORMATS[part].format(e=expression)})"]
+    return name_index + 1
+
+
+def translate_snowflake_sql(sql: str) -> str:
+    """Rewrites the Snowflake constructs used by this app into equivalent SQLite SQL"""
+    tokens = _TOKEN_PATTERN.findall(sql.strip().rstrip(';'))
+
+    # DATE_TRUNC first, so its operand is translated on its own and can be repeated
+    i = 0
+    while i < len(tokens):
+        i = _translate_date_trunc(tokens, i) if tokens[i].upper() == 'DATE_TRUNC' else i + 1
+
+    # VARIANT path access: col:field -> json_extract(col, '$.field')
+    i = 0
+    while i + 2 < len(tokens):
+        if _is_word(tokens[i]) and tokens[i + 1] == ':' and _is_word(tokens[i + 2]):
+            tokens[i:i + 3] = [f"json_extract({tokens[i]}, '$.{tokens[i + 2]}')"]
+        i += 1
+
+    for i, token in enumerate(tokens):
+        upper = token.upper()
+        if upper == 'ILIKE':
+            # SQLite LIKE is already case-insensitive for ASCII text
+            tokens[i] = 'LIKE'
+        elif upper == 'TO_DATE':
+            tokens[i] = 'date'
+        elif upper in _DATE_PART_FORMATS:
+            open_index = _next_significant(tokens, i)
+            if open_index < len(tokens) and tokens[open_index] == '(':
+                close_index = _matching_close(tokens, open_index)
+                if upper == 'QUARTER':
+                    tokens[i] = "((CAST(strftime('%m', "
+                    tokens[close_index] = ") AS INTEGER) + 2) / 3)"
+                else:
+                    tokens[i] = f"CAST(strftime('{_DATE_PART_FORMATS[upper]}', "
+                    tokens[close_index] = ") AS INTEGER)"
+                tokens[open_index] = ''
+
+    # Postfix casts: expr::type -> CAST(expr AS ...), dropping type arguments such as NUMBER(10, 2)
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == '::':
+            type_index = _next_significant(tokens, i)
+            prefix, suffix = _CAST_WRAPPERS.get(tokens[type_index].upper(), ('', ''))
+            arguments_index = _next_significant(tokens, type_index)
+            if arguments_index < len(tokens) and tokens[arguments_index] == '(':
+                for j in range(arguments_index, _matching_close(tokens, arguments_index) + 1):
+                    tokens[j] = ''
+            operand_end = _prev_significant(tokens, i)
+            operand_start = operand_end
+            if tokens[operand_end] == ')':
+                operand_start = _matching_open(tokens, operand_end)
+                name_index = _prev_significant(tokens, operand_start)
+                if name_index >= 0 and _is_word(tokens[name_index]):
+                    operand_start = name_index
+            tokens[operand_start] = prefix + tokens[operand_start]
+            tokens[i] = ''
+            tokens[type_index] = suffix
+        i += 1
+
+    return ''.join(tokens)
+
+
+# --- DB-API shim with the Snowflake-specific methods the app calls ---
+
+class LocalCursor:
+    """Cursor over the local database that accepts Snowflake-dialect SQL"""
+
+    def __init__(self, connection: "LocalConnection"):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+        self._buffer = None
+        self.sfqid = None
+        self.rowcount = -1
+        self.description = None
+
+    def execute(self, sql: str):
+        with self._connection._lock:
+            self._cursor.execute(translate_snowflake_sql(sql))
+        self._buffer = None
+        self.description = self._cursor.description
+        self.sfqid = str(uuid.uuid4())
+        return self
+
+    def execute_async(self, sql: str):
+        """Runs the statement immediately and parks its rows under a query id"""
+        self.execute(sql)
+        self._connection._async_results[self.sfqid] = (self.description, self._cursor.fetchall())
+        return {'queryId': self.sfqid}
+
+    def get_results_from_sfqid(self, query_id: str):
+        self.description, rows = self._connection._async_results.pop(query_id)
+        self._buffer = iter(rows)
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size: int = 1) -> list:
+        if self._buffer is not None:
+            rows = []
+            for row in self._buffer:
+                rows.append(row)
+                if len(rows) >= size:
+                    break
+            return rows
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self) -> list:
+        if self._buffer is not None:
+            return list(self._buffer)
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class LocalConnection:
+    """Connection to the local database, shaped like snowflake.connector's connection"""
+
+    def __init__(self, path: str = LOCAL_DB_PATH, seed_if_needed: bool = True):
+        if seed_if_needed:
+            ensure_seeded(path)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.create_function('SYSTEM$CANCEL_QUERY', 1, lambda query_id: 'query cancelled',
+                                 deterministic=True)
+        self._lock = threading.Lock()
+        self._async_results = {}
+        self._closed = False
+
+    def cursor(self) -> LocalCursor:
+        return LocalCursor(self)
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._db.close()
+
+    # Queries run synchronously, so they have always finished by the time they are polled
+    def get_query_status_throw_if_error(self, query_id: str) -> str:
+        return 'SUCCESS'
+
+    def is_still_running(self, status) -> bool:
+        return False
+
+
+def connect(path: str = LOCAL_DB_PATH, seed_if_needed: bool = True) -> LocalConnection:
+    """Opens a connection to the local backend, seeding the database first if needed"""
+    return LocalConnection(path, seed_if_needed)
+
+
+# --- Synthetic data ---
+
+_REVENUE_ROWS = [
+    ('Revenue', 'Product sales - enterprise licenses'),
+    ('Revenue', 'Product sales - hardware bundle'),
+    ('Product Sales', 'Product subscription renewal'),
+    ('Services', 'Professional services engagement'),
+    ('Services', 'Managed service retainer'),
+    ('Consulting', 'Strategy consulting project'),
+    ('Consulting', 'Implementation consulting services'),
+    ('Investment', 'Investment income - treasury bonds'),
+]
+_EXPENSE_ROWS = [
+    ('Payroll', 'Monthly payroll'),
+    ('Operations', 'Office rent and utilities'),
+    ('Operations', 'Cloud infrastructure'),
+    ('Marketing', 'Digital advertising campaign'),
+    ('Travel', 'Client site travel'),
+    ('Supplies', 'Office supplies purchase'),
+]
+_DIAGNOSES = [
+    ('Hypertension', 180.0), ('Type 2 Diabetes', 240.0), ('Asthma', 150.0),
+    ('Influenza', 95.0), ('Migraine', 130.0), ('Back Pain', 160.0),
+    ('Fracture', 1450.0), ('Pneumonia', 980.0), ('Anxiety Disorder', 210.0),
+    ('Annual Checkup', 120.0),
+]
+_QUARTER_ENDS = {'q1': '03-31', 'q2': '06-30', 'q3': '09-30', 'q4': '12-31'}
+
+
+def _random_date(rng: random.Random, years=SEED_YEARS) -> str:
+    start = date(years[0], 1, 1)
+    span = (date(years[-1], 12, 31) - start).days
+    return (start + timedelta(days=rng.randint(0, span))).isoformat()
+
+
+def _transaction_rows(count: int, rng: random.Random):
+    for transaction_id in range(1, count + 1):
+        if rng.random() < 0.6:
+            category, description = rng.choice(_REVENUE_ROWS)
+            amount = round(rng.uniform(500, 25000), 2)
+        else:
+            category, description = rng.choice(_EXPENSE_ROWS)
+            amount = -round(rng.uniform(100, 15000), 2)
+        yield (transaction_id, _random_date(rng), amount, category, description)
+
+
+def _medical_rows(count: int, rng: random.Random):
+    patients = max(1, count // 8)
+    for _ in range(count):
+        diagnosis, base_cost = rng.choice(_DIAGNOSES)
+        cost = round(base_cost * rng.uniform(0.6, 1.8), 2)
+        yield (rng.randint(1000, 1000 + patients), _random_date(rng), diagnosis, cost,
+               f"Follow-up recommended for {diagnosis.lower()}")
+
+
+def _report_rows(domain: str):
+    """Quarterly and annual report documents as VARIANT-like JSON"""
+    rows = []
+    for year in SEED_YEARS:
+        for q_key, month_day in _QUARTER_ENDS.items():
+            quarter = q_key.upper()
+            if domain == 'financial':
+                content = (f"{quarter} {year} Financial Report. Revenue grew steadily driven by services "
+                           f"and consulting. Operating expenses were kept within budget; payroll remained "
+                           f"the largest cost. Investment income contributed to net margin.")
+                file_name = f"{q_key}_financial_report_{year}.json"
+            else:
+                content = (f"{quarter} {year} Medical Report. Patient visits were stable. Hypertension and "
+                           f"diabetes remained the leading diagnoses. Average treatment cost per visit "
+                           f"was in line with the prior quarter.")
+                file_name = f"{q_key}_medical_{year}.pdf"
+            rows.append({
+                'report_id': f"{domain[:3].upper()}-{year}-{quarter}",
+                'report_date': f"{year}-{month_day}",
+                'content': content,
+                'file_name': file_name,
+                'source_type': 'JSON' if domain == 'financial' else 'PDF',
+            })
+        if domain == 'financial':
+            rows.append({
+                'report_id': f"FIN-{year}-ANNUAL",
+                'report_date': f"{year}-12-31",
+                'content': (f"Annual Report {year}. Total revenue increased year over year. Services and "
+                            f"consulting lines outperformed product sales. Invoice summary: Q4 invoices "
+                            f"were issued to enterprise customers with net 30 terms."),
+                'file_name': f"annual_report_{year}.pdf",
+                'source_type': 'PDF',
+            })
+            rows.append({
+                'report_id': f"FIN-{year}-Q4-INVOICE",
+                'report_date': f"{year}-12-31",
+                'content': f"Q4 {year} invoice. Line items: consulting services, product licenses, support.",
+                'file_name': f"q4_invoice_{year}.pdf",
+                'source_type': 'PDF',
+            })
+        else:
+            rows.append({
+                'report_id': f"MED-{year}-ANNUAL",
+                'report_date': f"{year}-12-31",
+                'content': (f"ANNUAL MEDICAL SUMMARY {year}. Patient volume grew across all quarters. "
+                            f"Chronic conditions drove most treatment cost."),
+                'file_name': f"annual_medical_summary_{year}.pdf",
+                'source_type': 'PDF',
+            })
+    return [(json.dumps(row),) for row in rows]
+
+
+def _insert_chunked(db: sqlite3.Connection, sql: str, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= INSERT_CHUNK_SIZE:
+            db.executemany(sql, chunk)
+            chunk = []
+    if chunk:
+        db.executemany(sql, chunk)
+
+
+def seed_database(path: str = LOCAL_DB_PATH, transactions: int = LOCAL_DB_TRANSACTIONS,
+                  medical_records: int = LOCAL_DB_MEDICAL_RECORDS, seed: int = LOCAL_DB_SEED):
+    """(Re)creates the local database with deterministic synthetic data"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.executescript("""
+            CREATE TABLE financial_transactions (
+                transaction_id INTEGER, transaction_date DATE, amount REAL,
+                category TEXT, description TEXT);
+            CREATE TABLE medical_records (
+                patient_id INTEGER, visit_date DATE, diagnosis TEXT,
+                treatment_cost REAL, notes TEXT);
+            CREATE TABLE financial_reports (report_data TEXT);
+            CREATE TABLE medical_reports (report_data TEXT);
+            CREATE TABLE seed_info (transactions INTEGER, medical_records INTEGER, seed INTEGER);
+        """)
+        _insert_chunked(db, "INSERT INTO financial_transactions VALUES (?, ?, ?, ?, ?)",
+                        _transaction_rows(transactions, rng))
+        _insert_chunked(db, "INSERT INTO medical_records VALUES (?, ?, ?, ?, ?)",
+                        _medical_rows(medical_records, rng))
+        db.executemany("INSERT INTO financial_reports VALUES (?)", _report_rows('financial'))
+        db.executemany("INSERT INTO medical_reports VALUES (?)", _report_rows('medical'))
+        db.execute("INSERT INTO seed_info VALUES (?, ?, ?)", (transactions, medical_records, seed))
+        db.commit()
+    finally:
+        db.close()
+    print(f"🧪 Seeded local SQL backend at {path} with {transactions} transactions and "
+          f"{medical_records} medical records in {time.perf_counter() - started:.1f}s")
+
+
+_seed_lock = threading.Lock()
+
+
+def ensure_seeded(path: str = LOCAL_DB_PATH, reseed: bool = LOCAL_DB_RESEED):
+    """
+    Seeds the database if it does not exist. An existing one built for another scale or seed
+    is kept as it is - with a warning - unless reseed (LOCAL_DB_RESEED) is set.
+    """
+    with _seed_lock:
+        if os.path.exists(path):
+            try:
+                db = sqlite3.connect(path)
+                try:
+                    info = db.execute("SELECT transactions, medical_records, seed FROM seed_info").fetchone()
+                finally:
+                    db.close()
+            except sqlite3.Error as e:
+                info = f"unreadable seed_info ({e})"
+            expected = (LOCAL_DB_TRANSACTIONS, LOCAL_DB_MEDICAL_RECORDS, LOCAL_DB_SEED)
+            if info == expected:
+                return
+            if not reseed:
+                print(f"⚠️  Local database {path} was seeded as {info}, not {expected} "
+                      f"(transactions, medical records, seed); keeping it. Set LOCAL_DB_RESEED=true to rebuild it")
+                return
+        seed_database(path)
+
+
+# Canned statements in the shapes nlq_to_sql and process_nlq emit
+BENCHMARK_QUERIES = {
+    'total revenue 2025': "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 AND YEAR(transaction_date) = 2025",
+    'total expenses 2025': "SELECT SUM(ABS(amount)) FROM FINANCIAL_TRANSACTIONS WHERE amount < 0 AND YEAR(transaction_date) = 2025",
+    'revenue by category': "SELECT category, SUM(amount) as total FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 GROUP BY category ORDER BY total DESC",
+    'services revenue': "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 AND (description ILIKE '%service%' OR description ILIKE '%consulting%')",
+    'diagnosis trends': "SELECT diagnosis, COUNT(*) as count FROM MEDICAL_RECORDS WHERE YEAR(visit_date) = 2025 GROUP BY diagnosis ORDER BY count DESC",
+    'monthly medical costs': "SELECT MONTH(visit_date) as month, SUM(treatment_cost) as monthly_cost FROM MEDICAL_RECORDS WHERE YEAR(visit_date) = 2025 GROUP BY MONTH(visit_date) ORDER BY month",
+    'consolidated financial reports': "SELECT report_data:content::string AS content FROM financial_reports WHERE YEAR(TO_DATE(report_data:report_date::string)) = 2025 ORDER BY TO_DATE(report_data:report_date::string)",
+    'quarter financial report': "SELECT report_data:content::string FROM financial_reports WHERE report_data:report_date::date = '2025-06-30'",
+    'annual medical summary': "SELECT report_data:content::string as content FROM medical_reports WHERE report_data:content::string ILIKE '%ANNUAL%' AND report_data:content::string ILIKE '%SUMMARY%' LIMIT 1",
+}
+
+
+def run_benchmark(path: str = LOCAL_DB_PATH, repeat: int = 3):
+    """Times each canned query against the local backend (best of `repeat` runs)"""
+    conn = connect(path, seed_if_needed=False)
+    try:
+        for name, sql in BENCHMARK_QUERIES.items():
+            timings = []
+            rows = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cur = conn.cursor()
+                cur.execute(sql)
+                rows = cur.fetchall()
+                cur.close()
+                timings.append(time.perf_counter() - started)
+            print(f"{name:32s} {min(timings) * 1000:9.2f} ms  {len(rows):6d} rows")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed and benchmark the local SQL backend")
+    parser.add_argument('--transactions', type=int, default=LOCAL_DB_TRANSACTIONS)
+    parser.add_argument('--medical-records', type=int, default=LOCAL_DB_MEDICAL_RECORDS)
+    parser.add_argument('--seed', type=int, default=LOCAL_DB_SEED)
+    parser.add_argument('--path', default=LOCAL_DB_PATH)
+    parser.add_argument('--benchmark', action='store_true', help="time the canned queries after seeding")
+    args = parser.parse_args()
+
+    seed_database(args.path, args.transactions, args.medical_records, args.seed)
+    if args.benchmark:
+        run_benchmark(args.path)
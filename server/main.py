@@ -1,5 +1,21 @@
-from nlq_processor import nlq_to_sql, summarize_unstructured, enforce_deterministic_results
-from snowflake_connector import execute_sql
+import asyncio
+import time
+
+from nlq_processor import (nlq_to_sql, nlq_to_sql_async, summarize_unstructured,
+                           summarize_unstructured_async, stream_summarize_unstructured,
+                           enforce_deterministic_results, DETERMINISTIC_PREVIEW_ROWS)
+from snowflake_connector import execute_sql, fetch_sql_result, fetch_sql_spooled
+from snowflake_async import execute_many, execute_many_async, fetch_sql_result_async, fetch_sql_spooled_async
+from query_router import route_query
+from summarizer import condense_documents, condense_documents_async
+from report_index import get_report_index, report_ids_predicate
+from passage_ranker import select_passages, record_answer_latency
+from single_flight import get_single_flight
+from translation_cache import normalize_nlq
+from result_cache import normalize_sql
+from query_result import QueryResult
+from aggregate_store import get_aggregate_store
+from table_replica import get_table_replica
 
 # Mapping of quarter names to report dates
 def quarter_dates(year):
@@ -18,180 +34,90 @@ def extract_year(nlq: str) -> int:
 
 def is_medical_query(nlq: str) -> bool:
     """Detect if query is related to medical data"""
-    medical_keywords = [
-        "patient", "diagnosis", "treatment", "medical", "visit", 
-        "medical cost", "treatment cost", "patient cost", "diagnosis trends", 
-        "medical record", "medical report", "medical summary"
-    ]
-    nlq_lower = nlq.lower()
-    return any(keyword in nlq_lower for keyword in medical_keywords)
+    return route_query(nlq).is_medical
 
 def wants_consolidation(nlq: str) -> bool:
-    """Check if query wants consolidated/all reports"""
-    consolidation_keywords = ["all", "overall", "full year", "annual", "ytd", "entire", "consolidated", "highlights", "overview", "reports", "year"]
-    nlq_lower = nlq.lower()
-    
-    # Has consolidation keywords AND no specific quarter mentioned
-    has_consolidation = any(keyword in nlq_lower for keyword in consolidation_keywords)
-    quarters = quarter_dates(2025).keys()
-    has_quarter = any(q in nlq_lower for q in quarters)
-    
-    return has_consolidation and not has_quarter
+    """Check if query wants consolidated/all reports (consolidation keywords AND no specific quarter)"""
+    return route_query(nlq).wants_consolidation
 
 def classify_query(nlq: str) -> str:
     """
     Classifies query as 'structured', 'unstructured', or 'pdf'.
     Returns the query type for intelligent routing.
     """
-    nlq_lower = nlq.lower()
-    quarters = quarter_dates(2025).keys()
-    
-    # PDF-specific indicators (highest priority)
-    pdf_indicators = [
-        "annual report", "pdf", "document", "invoice", "q4 invoice", 
-        "uploaded", "file", "files", "annual medical summary", "medical report content",
-        "show me the medical report", "content of medical report"
-    ]
-    
-    # Strong indicators of structured queries 
-    structured_indicators = [
-        "total", "sum", "maximum", "minimum", "max", "min", "count", 
-        "which month", "what month", "expense", "revenue", "amount", 
-        "transaction", "calculate", "find", "show me", "financials", 
-        "performance", "sold", "services", "products", "consulting",
-        # Medical indicators
-        "patient", "diagnosis", "treatment", "cost", "medical", "visit", 
-        "diagnosis trends", "patient cost", "treatment cost", "medical cost"
-    ]
-    
-    # Unstructured report keywords
-    unstructured_keywords = ["summary", "report", "update", "highlight", "highlights", "overview", "annual", "ytd", "medical report", "medical summary"]
-    
-    # Priority: PDF > Unstructured with summary/quarter > Structured > Default unstructured
-    if any(indicator in nlq_lower for indicator in pdf_indicators):
-        return "pdf"
-    
-    # CRITICAL FIX: Check for unstructured patterns BEFORE structured patterns
-    # This ensures "financials summary Q1" routes to unstructured, not structured
-    has_unstructured_keyword = any(keyword in nlq_lower for keyword in unstructured_keywords)
-    has_quarter = any(q in nlq_lower for q in quarters)
-    
-    if has_unstructured_keyword or has_quarter:
-        return "unstructured"
-    elif any(indicator in nlq_lower for indicator in structured_indicators):
-        return "structured"
-    else:
-        return "structured"  # Default to structured
+    return route_query(nlq).query_type
 
 def is_unstructured_query(nlq: str) -> bool:
     """Legacy function for backwards compatibility"""
     return classify_query(nlq) == "unstructured"
 
-def process_nlq(nlq: str):
+class _Io:
+    """An I/O step the pipeline needs; the sync or async driver performs it and sends back the result"""
+
+    __slots__ = ('kind', 'args', 'kwargs')
+
+    def __init__(self, kind: str, *args, **kwargs):
+        self.kind = kind
+        self.args = args
+        self.kwargs = kwargs
+
+def _report_lookup_sql(select: str, table: str, report_ids, scan_where: str, suffix: str = ""):
     """
-    Processes an NLQ automatically, determining if it's structured, unstructured, or PDF-based,
-    and includes the source in the output.
+    SQL for the report rows a text lookup selects: by id when the report index resolved it
+    (None when it matched nothing), otherwise with the content scan predicate scan_where.
+    """
+    if report_ids is None:
+        where = scan_where
+    elif report_ids:
+        where = report_ids_predicate(report_ids)
+    else:
+        return None
+    return f"""
+                    SELECT {select}
+                    FROM {table}
+                    WHERE {where}
+                    {suffix}
+                    """
+
+def _nlq_pipeline(nlq: str):
+    """
+    The process_nlq logic without any I/O of its own. It yields (event, data) pairs for the
+    caller and _Io steps ('translate', 'find_reports', 'aggregate', 'replica', 'preview', 'spool',
+    'execute' - a list of statements run concurrently, 'condense', 'summarize') for the driver,
+    which sends each step's result back in (or throws its exception in). The last event is
+    always ('message', QueryResult).
     """
     try:
-        # Check for GenAI Suite Invoice requests FIRST
-        nlq_lower = nlq.lower()
-        
-        # Check for accounts payable FIRST (approval workflows are AP-specific)
-        ap_strong_indicators = [
-            "approve invoice", "approve the invoice", "pending approval", 
-            "awaiting approval", "reject invoice", "reject the invoice",
-            "accounts payable", "ap automation", "vendor invoice",
-            "invoice processing", "invoice automation", "ap dashboard"
-        ]
-        
-        # AP vendor names (these are companies sending invoices TO us)
-        ap_vendor_indicators = [
-            "tech solutions", "global tech", "office supplies co", 
-            "cloud services inc", "consulting partners"
-        ]
-        
-        # Generic invoice indicators (could be AP or AR, need more context)
-        general_invoice_indicators = [
-            "invoice", "invoices", "which invoices", "show invoices", "invoice status"
-        ]
-        
-        # Check for AP first - approval workflows and vendor names
-        if (any(indicator in nlq_lower for indicator in ap_strong_indicators) or 
-            any(vendor in nlq_lower for vendor in ap_vendor_indicators)):
-            print(f"Detected GenAI Suite AP (Accounts Payable) request", flush=True)
-            return "genai_invoice_suite"
-        
-        # Check for accounts receivable (AR-specific indicators)
-        ar_strong_indicators = [
-            "accounts receivable", "ar automation", "customer invoice", 
-            "receivable", "receivables", "collection", "customer payment",
-            "ar dashboard", "invoice sent to", "invoice to"
-        ]
-        
-        # AR customer names (these are companies we sent invoices TO)
-        ar_customer_indicators = [
-            "manufacturing plus", "techcorp", "global retailers", "service dynamics"
-        ]
-        
-        # Status change actions (change status, mark as paid, etc.)
-        status_action_indicators = [
-            "change status", "update status", "mark as", "set status",
-            "change the status", "update the status", "mark it as", "set it to"
-        ]
-        has_status_action = any(indicator in nlq_lower for indicator in status_action_indicators)
-        
-        # Route to AR if: AR-specific indicators OR customer names OR status change without AP context
-        if (any(indicator in nlq_lower for indicator in ar_strong_indicators) or 
-            any(customer in nlq_lower for customer in ar_customer_indicators) or
-            has_status_action):
-            print(f"Detected GenAI Suite AR (Accounts Receivable) request", flush=True)
-            return "genai_ar_suite"
-        
-        # Generic invoice queries default to AP (most common use case)
-        if any(indicator in nlq_lower for indicator in general_invoice_indicators):
-            print(f"Detected GenAI Suite AP (Accounts Payable) request", flush=True)
-            return "genai_invoice_suite"
-        
-        # Check for Power BI dashboard request
-        # Check for financial dashboard
-        financial_indicators = ["financial dashboard", "finance dashboard", "financial analytics", 
-                              "finance report", "financial report", "show financial", "open financial"]
-        if any(indicator in nlq_lower for indicator in financial_indicators):
-            print(f"Detected Financial Power BI dashboard request", flush=True)
-            return "powerbi_financial_dashboard"
-        
-        # Check for medical dashboard
-        medical_indicators = ["medical dashboard", "medical analytics", "medical report", 
-                            "show medical", "open medical", "healthcare dashboard"]
-        if any(indicator in nlq_lower for indicator in medical_indicators):
-            print(f"Detected Medical Power BI dashboard request", flush=True)
-            return "powerbi_medical_dashboard"
-        
-        # Legacy support for generic Power BI requests (defaults to financial)
-        if "power bi" in nlq_lower or "powerbi" in nlq_lower:
-            print(f"Detected generic Power BI dashboard request (defaulting to financial)", flush=True)
-            return "powerbi_financial_dashboard"
+        # Scan the query once; every routing check below reads from this decision
+        decision = route_query(nlq)
+        yield 'route', {'route': decision.route, 'query_type': decision.query_type,
+                        'is_medical': decision.is_medical}
+
+        # GenAI Suite (AP/AR) and Power BI dashboard requests are answered outside Snowflake
+        if decision.route is not None:
+            print(decision.route_message, flush=True)
+            yield 'message', QueryResult('route', route=decision.route)
+            return
         
         # Extract common variables upfront to avoid scoping issues
         year = extract_year(nlq)
         quarters_map = quarter_dates(year)
         
-        query_type = classify_query(nlq)
+        query_type = decision.query_type
         print(f"Query: '{nlq}' classified as: {query_type}", flush=True)
         
         # Handle PDF queries
         if query_type == "pdf":
             # Determine if this is a medical or financial PDF query  
-            if is_medical_query(nlq):
+            if decision.is_medical:
                 # For medical PDF queries, filter by content to get the right document
-                if "annual" in nlq.lower() or "summary" in nlq.lower():
-                    sql = f"""
-                    SELECT report_data:content::string as content
-                    FROM medical_reports 
-                    WHERE report_data:content::string ILIKE '%ANNUAL%'
-                       AND report_data:content::string ILIKE '%SUMMARY%'
-                    LIMIT 1
-                    """
+                if decision.wants_annual_summary:
+                    report_ids = yield _Io('find_reports', 'medical_reports', all_terms=('ANNUAL', 'SUMMARY'))
+                    sql = _report_lookup_sql(
+                        "report_data:content::string as content", "medical_reports", report_ids,
+                        "report_data:content::string ILIKE '%ANNUAL%' "
+                        "AND report_data:content::string ILIKE '%SUMMARY%'",
+                        "LIMIT 1")
                 else:
                     sql = f"""
                     SELECT report_data:content::string as content
@@ -200,9 +126,12 @@ def process_nlq(nlq: str):
                     LIMIT 5
                     """
             else:
-                sql = nlq_to_sql(nlq)
+                sql = yield _Io('translate', nlq)
             print(f"Generated SQL for PDF: {sql}")
-            results = execute_sql(sql)
+            # Only the first document is analyzed, so don't pull the rest
+            results = []
+            if sql is not None:
+                _, results, _ = yield _Io('preview', sql, 1)
             print(f"Snowflake results for PDF: {results}")
             
             if results and len(results) > 0:
@@ -222,118 +151,296 @@ def process_nlq(nlq: str):
                 
                 print(f"Found PDF content (columns: {len(row)}): {pdf_content[:200]}...")
                 
-                # Analyze the real PDF content
-                analysis = summarize_unstructured(pdf_content, f"Answer this question based on the PDF content: {nlq}")
+                # Analyze the real PDF content, sending the model only the passages relevant to the question
+                pdf_context = select_passages(pdf_content, nlq)
+                if pdf_context is not pdf_content:
+                    print(f"Selected {len(pdf_context)} of {len(pdf_content)} PDF characters for the question")
+                trimmed = pdf_context is not pdf_content
+                # Only answers the model actually generated count, not summary cache hits
+                analysis = yield _Io('summarize', pdf_context, f"Answer this question based on the PDF content: {nlq}",
+                                     on_llm_call=lambda elapsed_ms: record_answer_latency(elapsed_ms, trimmed))
                 print(f"Generated analysis for PDF: {analysis}")
-                return f"Analysis (Source: PDF Documents): {analysis}"
+                yield 'message', QueryResult('analysis', "PDF Documents", summary=analysis)
             else:
-                return f"No PDF content found for: {nlq} (Source: PDF Documents)"
+                yield 'message', QueryResult('notice', "PDF Documents", text=f"No PDF content found for: {nlq}")
         
         # Handle unstructured queries (existing logic)
         elif query_type == "unstructured":
             print(f"Processing as unstructured query")
             
-            if wants_consolidation(nlq):
+            if decision.wants_consolidation:
                 # Consolidated query - get ALL reports for the year
                 print(f"Processing consolidated query for year {year}")
-                # Determine if this is a medical or financial query
-                if is_medical_query(nlq):
+                report_sql = {
                     # For medical reports, directly access CORTEX.PARSE_DOCUMENT parsed content
-                    report_sql = f"""
+                    'medical_reports': f"""
                         SELECT report_data:content::string AS content 
                         FROM medical_reports 
                         WHERE report_data:content::string IS NOT NULL
                         ORDER BY report_data:report_date::string
-                    """
-                else:
-                    report_sql = f"""
+                    """,
+                    'financial_reports': f"""
                         SELECT report_data:content::string AS content 
                         FROM financial_reports 
                         WHERE YEAR(TO_DATE(report_data:report_date::string)) = {year}
                         ORDER BY TO_DATE(report_data:report_date::string)
-                    """
-                print(f"Executing consolidated SQL: {report_sql}")
+                    """,
+                }
+                # A request naming both domains reads both report sets, concurrently
+                statements = [report_sql[source] for source in decision.report_sources]
+                source_type = ", ".join(decision.report_sources)
+                print(f"Executing consolidated SQL: {statements}")
                 try:
-                    results = execute_sql(report_sql)
+                    result_sets = yield _Io('execute', statements)
+                    results = [row for rows in result_sets for row in rows]
                     print(f"Snowflake results for consolidated: {results}")
                     if results and len(results) > 0:
-                        # Combine all report contents
+                        # Map-reduce the reports down to one prompt's worth of content
                         contents = [row[0] for row in results if row[0]]
-                        combined_content = "\n\n".join(contents)
-                        print(f"Combined {len(contents)} reports, total length: {len(combined_content)}")
+                        combined_content = yield _Io('condense', contents)
+                        print(f"Condensed {len(contents)} reports to {len(combined_content)} characters")
                         
                         # Use consolidated prompt
                         consolidated_prompt = f"Consolidate highlights across all {year} quarterly reports for: {nlq}. Focus on totals/trends and provide clear actionable insights. Avoid per-quarter repetition."
-                        summary = summarize_unstructured(combined_content, consolidated_prompt)
+                        summary = yield _Io('summarize', combined_content, consolidated_prompt)
                         print(f"Generated consolidated summary: {summary}")
-                        source_type = "medical_reports" if is_medical_query(nlq) else "financial_reports"
-                        return f"Summary (Source: Unstructured - {source_type}, Consolidated {year}): {summary}"
+                        yield 'message', QueryResult('summary', f"Unstructured - {source_type}, Consolidated {year}",
+                                                     summary=summary)
                     else:
-                        source_type = "medical_reports" if is_medical_query(nlq) else "financial_reports"
-                        return f"No report data found for year {year} (Source: Unstructured - {source_type}, Consolidated {year})."
+                        yield 'message', QueryResult('notice', f"Unstructured - {source_type}, Consolidated {year}",
+                                                     text=f"No report data found for year {year}")
                 except Exception as snowflake_error:
                     print(f"Snowflake error for consolidated: {snowflake_error}")
-                    source_type = "medical_reports" if is_medical_query(nlq) else "financial_reports"
-                    return f"Error retrieving consolidated report data: {snowflake_error} (Source: Unstructured - {source_type}, Consolidated {year})"
+                    yield 'message', QueryResult('notice', f"Unstructured - {source_type}, Consolidated {year}",
+                                                 text=f"Error retrieving consolidated report data: {snowflake_error}")
             else:
                 # Specific quarter query
-                q_key = next((q for q in quarters_map if q in nlq.lower()), None)
+                q_key = decision.quarter
                 quarter_date = quarters_map.get(q_key or "q1", quarters_map["q1"])  # Default to Q1
                 
                 # Determine if this is a medical or financial query
-                if is_medical_query(nlq):
+                if decision.is_medical:
                     # For medical reports, search for quarter text in the parsed PDF content
                     quarter_text = q_key.upper() if q_key else "Q1"
-                    report_sql = f"""
-                        SELECT report_data:content::string 
-                        FROM medical_reports 
-                        WHERE (report_data:content::string ILIKE '%{quarter_text}%' 
+                    report_ids = yield _Io('find_reports', 'medical_reports',
+                                           any_terms=(quarter_text, f"{quarter_text} {year}"),
+                                           file_name_like=f"%{q_key}_%{year}%")
+                    report_sql = _report_lookup_sql(
+                        "report_data:content::string", "medical_reports", report_ids,
+                        f"""(report_data:content::string ILIKE '%{quarter_text}%'
                            OR report_data:content::string ILIKE '%{quarter_text} {year}%'
                            OR report_data:file_name::string ILIKE '%{q_key}_%{year}%')
-                        AND report_data:content::string IS NOT NULL
-                    """
+                        AND report_data:content::string IS NOT NULL""")
                 else:
                     report_sql = f"SELECT report_data:content::string FROM financial_reports WHERE report_data:report_date::date = '{quarter_date}'"
                 print(f"Executing quarter-specific SQL: {report_sql}")
                 try:
-                    results = execute_sql(report_sql)
+                    results = []
+                    if report_sql is not None:
+                        _, results, _ = yield _Io('preview', report_sql, 1)
                     print(f"Snowflake results for quarter: {results}")
                     if results and len(results) > 0 and results[0][0]:
                         content = results[0][0]
                         print(f"Found content for quarter: {content[:200]}...")
-                        summary = summarize_unstructured(content, nlq)
+                        summary = yield _Io('summarize', content, nlq)
                         print(f"Generated quarter summary: {summary}")
-                        source_type = "medical_reports" if is_medical_query(nlq) else "financial_reports"
-                        return f"Summary (Source: Unstructured - {source_type}): {summary}"
+                        source_type = decision.report_source
+                        yield 'message', QueryResult('summary', f"Unstructured - {source_type}", summary=summary)
                     else:
                         quarter_label = q_key.upper() if q_key else "quarter"
                         print(f"No report data found for {quarter_label}")
-                        source_type = "medical_reports" if is_medical_query(nlq) else "financial_reports"
-                        return f"No report data found for {quarter_label} (Source: Unstructured - {source_type})."
+                        source_type = decision.report_source
+                        yield 'message', QueryResult('notice', f"Unstructured - {source_type}",
+                                                     text=f"No report data found for {quarter_label}")
                 except Exception as snowflake_error:
                     print(f"Snowflake error for quarter: {snowflake_error}")
-                    source_type = "medical_reports" if is_medical_query(nlq) else "financial_reports"
-                    return f"Error retrieving report data: {snowflake_error} (Source: Unstructured - {source_type})"
+                    source_type = decision.report_source
+                    yield 'message', QueryResult('notice', f"Unstructured - {source_type}",
+                                                 text=f"Error retrieving report data: {snowflake_error}")
         else:
             # For structured data, generate and execute the query
-            sql = nlq_to_sql(nlq)
+            sql = yield _Io('translate', nlq)
             print(f"Generated SQL: {sql}")
-            results = execute_sql(sql)
-            print(f"Snowflake results for structured: {results}")
+            # Canned intents are answered from the materialized aggregates, and other statements over the
+            # replicated tables from the local replica, while those are fresh
+            local = yield _Io('aggregate', sql, DETERMINISTIC_PREVIEW_ROWS)
+            if local is None:
+                local = yield _Io('replica', sql, DETERMINISTIC_PREVIEW_ROWS)
+            if local is not None:
+                columns, results, total_rows, result_id, as_of = local
+                print(f"⚡ Answered locally with data as of {time.time() - as_of:.0f}s ago")
+            else:
+                # Only the rows enforce_deterministic_results can render are kept in memory; the total comes
+                # from the cursor, and larger results are spooled to the result store for paging
+                columns, results, total_rows, result_id = yield _Io('spool', sql, DETERMINISTIC_PREVIEW_ROWS)
+                as_of = None
+            print(f"Snowflake results for structured ({total_rows} rows): {results}")
             
             # CRITICAL FIX: Return exact deterministic results without LLM modification
             if results and len(results) > 0:
                 # Use deterministic results for 100% precision
-                exact_result = enforce_deterministic_results(results, nlq)
+                exact_result = enforce_deterministic_results(results, nlq, total_rows)
                 print(f"Deterministic result for structured: {exact_result}")
                 # Determine source based on query content
-                source_table = "medical_records" if is_medical_query(nlq) else "financial_transactions"
-                return f"{exact_result} (Source: Structured - {source_table})"
+                source_table = decision.source_table
+                result = QueryResult('structured', f"Structured - {source_table}", sql=sql, columns=columns,
+                                     rows=results, total_rows=total_rows, text=exact_result, result_id=result_id,
+                                     as_of=as_of)
+                yield 'result', result
+                yield 'message', result
             else:
-                source_table = "medical_records" if is_medical_query(nlq) else "financial_transactions"
-                return f"No results found for: {nlq} (Source: Structured - {source_table})"
+                source_table = decision.source_table
+                yield 'message', QueryResult('notice', f"Structured - {source_table}", sql=sql,
+                                             columns=columns, text=f"No results found for: {nlq}")
     except Exception as e:
-        return f"Error: {e} (Source: N/A)"
+        yield 'message', QueryResult('error', "N/A", text=str(e))
+
+def _flight_key(step: _Io):
+    """(coalescing group, key) for a step, or (None, None) for steps that are not coalesced"""
+    if step.kind == 'translate':
+        return get_single_flight('sql_generation'), normalize_nlq(step.args[0])
+    if step.kind in ('preview', 'spool'):
+        sql, max_rows = step.args
+        return get_single_flight('warehouse'), (step.kind, normalize_sql(sql), max_rows)
+    if step.kind == 'execute':
+        return get_single_flight('warehouse'), ('execute', tuple(normalize_sql(sql) for sql in step.args[0]))
+    if step.kind == 'condense':
+        return get_single_flight('summarization'), ('condense', tuple(step.args[0]))
+    if step.kind == 'summarize':
+        content, prompt = step.args
+        return get_single_flight('summarization'), ('summarize', normalize_nlq(prompt), content)
+    return None, None
+
+def _run_step(step: _Io):
+    """Runs one non-streaming pipeline I/O step synchronously"""
+    if step.kind == 'translate':
+        return nlq_to_sql(*step.args)
+    if step.kind == 'find_reports':
+        return get_report_index().find(*step.args, **step.kwargs)
+    if step.kind == 'aggregate':
+        return get_aggregate_store().answer(*step.args)
+    if step.kind == 'replica':
+        return get_table_replica().answer(*step.args)
+    if step.kind == 'preview':
+        sql, max_rows = step.args
+        return fetch_sql_result(sql, max_rows=max_rows)
+    if step.kind == 'spool':
+        return fetch_sql_spooled(*step.args)
+    if step.kind == 'execute':
+        statements = step.args[0]
+        # A single statement needs no event loop
+        return [execute_sql(statements[0])] if len(statements) == 1 else execute_many(statements)
+    if step.kind == 'condense':
+        return condense_documents(*step.args)
+    return summarize_unstructured(*step.args, **step.kwargs)
+
+def _perform(step: _Io, stream: bool):
+    """
+    Runs one pipeline I/O step synchronously, yielding ('token', text) events while a summary
+    streams. Identical steps already running for other requests are waited on, not repeated.
+    """
+    group, key = _flight_key(step)
+    if not (stream and step.kind == 'summarize'):
+        return _run_step(step) if group is None else group.do(key, _run_step, step)
+    tokens = group.do_stream(key, stream_summarize_unstructured, *step.args, **step.kwargs)
+    while True:
+        try:
+            token = next(tokens)
+        except StopIteration as done:
+            return done.value
+        yield 'token', token
+
+async def _run_step_async(step: _Io):
+    """Runs one pipeline I/O step on the async LLM client and async Snowflake execution"""
+    if step.kind == 'translate':
+        return await nlq_to_sql_async(*step.args)
+    if step.kind == 'find_reports':
+        # Local SQLite reads, plus an occasional incremental sync with the warehouse
+        return await asyncio.to_thread(get_report_index().find, *step.args, **step.kwargs)
+    if step.kind == 'aggregate':
+        # A dict lookup, plus a local spool of answers with more rows than the preview
+        return await asyncio.to_thread(get_aggregate_store().answer, *step.args)
+    if step.kind == 'replica':
+        # A query on the local SQLite replica
+        return await asyncio.to_thread(get_table_replica().answer, *step.args)
+    if step.kind == 'preview':
+        sql, max_rows = step.args
+        return await fetch_sql_result_async(sql, max_rows=max_rows)
+    if step.kind == 'spool':
+        return await fetch_sql_spooled_async(*step.args)
+    if step.kind == 'execute':
+        return await execute_many_async(*step.args)
+    if step.kind == 'condense':
+        return await condense_documents_async(*step.args)
+    return await summarize_unstructured_async(*step.args, **step.kwargs)
+
+async def _perform_async(step: _Io):
+    """_perform() for the async driver: identical in-flight steps on this event loop are shared"""
+    group, key = _flight_key(step)
+    if group is None:
+        return await _run_step_async(step)
+    return await group.do_async(key, _run_step_async, step)
+
+def iter_nlq_events(nlq: str, stream: bool = False):
+    """
+    Processes an NLQ as a sequence of (event, data) pairs, in the order they become available:
+      'route'   - routing decision, before any Snowflake or LLM call
+      'result'  - the structured QueryResult, as soon as the SQL returns
+      'token'   - summary tokens as the LLM generates them (only when stream=True)
+      'message' - the final process_nlq QueryResult, always last
+    """
+    pipeline = _nlq_pipeline(nlq)
+    reply, error = None, None
+    while True:
+        try:
+            item = pipeline.throw(error) if error is not None else pipeline.send(reply)
+        except StopIteration:
+            return
+        reply, error = None, None
+        if isinstance(item, _Io):
+            try:
+                reply = yield from _perform(item, stream)
+            except Exception as e:
+                error = e
+        else:
+            yield item
+
+async def aiter_nlq_events(nlq: str):
+    """iter_nlq_events() for asyncio callers: the same pipeline, with every I/O step awaited"""
+    pipeline = _nlq_pipeline(nlq)
+    reply, error = None, None
+    while True:
+        try:
+            item = pipeline.throw(error) if error is not None else pipeline.send(reply)
+        except StopIteration:
+            return
+        reply, error = None, None
+        if isinstance(item, _Io):
+            try:
+                reply = await _perform_async(item)
+            except Exception as e:
+                error = e
+        else:
+            yield item
+
+def process_nlq(nlq: str):
+    """
+    Processes an NLQ automatically, determining if it's structured, unstructured, or PDF-based,
+    and returns a QueryResult recording the source (str() gives the source-tagged message).
+    """
+    message = None
+    for event, data in iter_nlq_events(nlq):
+        if event == 'message':
+            message = data
+    return message
+
+async def process_nlq_async(nlq: str):
+    """process_nlq() for asyncio callers; holds no thread while waiting on the LLM or Snowflake"""
+    message = None
+    async for event, data in aiter_nlq_events(nlq):
+        if event == 'message':
+            message = data
+    return message
 
 if __name__ == "__main__":
     # Example structured NLQ
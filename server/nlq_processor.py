@@ -1,45 +1,19 @@
-import httpx
+import asyncio
+import hashlib
 import re
-from openai import AzureOpenAI
-from azure.identity import DefaultAzureCredential
-from config import (AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY,
-                    AZURE_OPENAI_DEPLOYMENT_NAME, AZURE_OPENAI_API_VERSION,
-                    USE_ENTRA_ID)
-
-# Custom HTTP client with default settings and explicit timeout
-http_client = httpx.Client(
-    timeout=httpx.Timeout(30.0, connect=10.0),  # Adjust timeout as needed
-)
-
-# Initialize Azure OpenAI client with proper type handling (optional)
-client = None
-
-if AZURE_OPENAI_ENDPOINT:
-    if USE_ENTRA_ID:
-        try:
-            credential = DefaultAzureCredential()
-            token_provider = lambda: credential.get_token(
-                "https://cognitiveservices.azure.com/.default").token
-            client = AzureOpenAI(azure_endpoint=AZURE_OPENAI_ENDPOINT,
-                                 azure_ad_token_provider=token_provider,
-                                 api_version=AZURE_OPENAI_API_VERSION or "2024-02-01",
-                                 http_client=http_client)
-            print("✅ Azure OpenAI client initialized with Entra ID")
-        except Exception as e:
-            print(f"⚠️  Failed to initialize Azure OpenAI with Entra ID: {e}")
-    elif AZURE_OPENAI_API_KEY:
-        try:
-            client = AzureOpenAI(azure_endpoint=AZURE_OPENAI_ENDPOINT,
-                                 api_key=AZURE_OPENAI_API_KEY,
-                                 api_version=AZURE_OPENAI_API_VERSION or "2024-02-01",
-                                 http_client=http_client)
-            print("✅ Azure OpenAI client initialized with API key")
-        except Exception as e:
-            print(f"⚠️  Failed to initialize Azure OpenAI with API key: {e}")
-    else:
-        print("⚠️  AZURE_OPENAI_API_KEY is required when not using Entra ID - NLQ features disabled")
-else:
-    print("⚠️  AZURE_OPENAI_ENDPOINT not configured - NLQ features disabled")
+import time
+from typing import Callable, Optional
+from config import AZURE_OPENAI_DEPLOYMENT_NAME, SQL_DATE_REWRITE_ENABLED
+from translation_cache import get_translation_cache, translation_cache_key, year_template_key
+from summary_cache import get_summary_cache, summary_cache_key
+from sql_intents import match_sql_intent
+from sql_rewrite import add_year_guard_tokens, rewrite_date_tokens
+from sql_validator import YEAR_GUARDED_TABLES, validate_sql
+from llm_client import get_llm_client, get_async_llm_client
+
+# SQL generation and summaries share the process-wide client pool, with per-purpose timeouts
+client = get_llm_client('sql')
+summary_client = get_llm_client('summary')
 
 
 def extract_year_from_nlq(nlq: str) -> int:
@@ -51,53 +25,21 @@ def extract_year_from_nlq(nlq: str) -> int:
 def validate_sql_security(sql: str, nlq: str) -> tuple[bool, str]:
     """
     CRITICAL SECURITY: Validate SQL for safety and compliance
-    Returns (is_valid, error_message)
+    Returns (is_valid, error_message); see sql_validator.validate_sql for the checks
     """
-    sql_upper = sql.upper().strip()
-
-    # 1. ENFORCE SELECT-ONLY QUERIES
-    if not sql_upper.startswith('SELECT'):
-        return False, "SECURITY ERROR: Only SELECT queries are allowed"
-
-    # 2. BLOCK DANGEROUS SQL OPERATIONS
-    dangerous_keywords = [
-        'INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 'TRUNCATE',
-        'EXEC', 'EXECUTE'
-    ]
-    for keyword in dangerous_keywords:
-        if keyword in sql_upper:
-            return False, f"SECURITY ERROR: {keyword} operations are not allowed"
-
-    # 3. ENFORCE WHITELISTED TABLES ONLY
-    allowed_tables = ['FINANCIAL_TRANSACTIONS', 'FINANCIAL_REPORTS', 'MEDICAL_RECORDS', 'MEDICAL_REPORTS']
-    sql_has_table = False
-    for table in allowed_tables:
-        if table in sql_upper:
-            sql_has_table = True
-            break
-
-    if not sql_has_table:
-        return False, f"SECURITY ERROR: Query must use whitelisted tables: {allowed_tables}"
+    verdict = validate_sql(sql)
+    return verdict.is_valid, verdict.error or "Valid"
 
-    # 4. ENSURE YEAR CONSTRAINTS for FINANCIAL_TRANSACTIONS and MEDICAL_RECORDS
-    if 'FINANCIAL_TRANSACTIONS' in sql_upper or 'MEDICAL_RECORDS' in sql_upper:
-        extracted_year = extract_year_from_nlq(nlq)
 
-        # Check if query has any date/year filtering
-        has_year_filter = any(
-            pattern in sql_upper for pattern in
-            ['YEAR(', f'= {extracted_year}', f'TRANSACTION_DATE', f'VISIT_DATE'])
+# enforce_deterministic_results never renders more than this many rows
+DETERMINISTIC_PREVIEW_ROWS = 5
 
-        # If no year filter, we'll add one automatically in the nlq_to_sql function
-        # This ensures security while allowing flexible queries
 
-    return True, "Valid"
-
-
-def enforce_deterministic_results(results: list, nlq: str) -> str:
+def enforce_deterministic_results(results: list, nlq: str, total_rows: int | None = None) -> str:
     """
     DETERMINISM FIX: Return exact numeric results without LLM modification
     For structured queries, return precise numerical values directly
+    total_rows is the full result size when `results` is only a preview of it
     """
     if not results or len(results) == 0:
         return "No results found"
@@ -122,8 +64,11 @@ def enforce_deterministic_results(results: list, nlq: str) -> str:
                 return f"{value:.2f}"
         return str(value)
 
+    if total_rows is None:
+        total_rows = len(results)
+
     # For non-aggregation queries, return formatted results directly
-    if len(results) <= 5:  # Small result sets
+    if total_rows <= DETERMINISTIC_PREVIEW_ROWS:  # Small result sets
         formatted_results = []
         for row in results:
             formatted_row = " | ".join(
@@ -132,17 +77,12 @@ def enforce_deterministic_results(results: list, nlq: str) -> str:
         return "\n".join(formatted_results)
 
     # Large result sets - return summary
-    return f"Found {len(results)} results. First few: {results[:3]}"
+    return f"Found {total_rows} results. First few: {results[:3]}"
 
 
-def nlq_to_sql(nlq: str) -> str:
-    """
-    Converts natural language query to Snowflake SQL using Azure OpenAI.
-    """
-    if client is None:
-        raise ValueError("Azure OpenAI client not configured. Please set AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY environment variables.")
-    
-    prompt = f"""
+def _build_sql_prompt(nlq: str) -> str:
+    """Prompt used by nlq_to_sql to translate a question into Snowflake SQL"""
+    return f"""
     You are a SQL expert for Snowflake. Convert this natural language query to a valid Snowflake SQL query.
     
     Data sources available:
@@ -189,105 +129,202 @@ def nlq_to_sql(nlq: str) -> str:
     Query: {nlq}
     Return only the SQL query, no explanations, and do not include markdown formatting (e.g., no ```sql
     """
-    response = client.chat.completions.create(
+
+
+# Identifies the prompt template and model a cached translation was generated with
+SQL_PROMPT_FINGERPRINT = hashlib.sha256(
+    f"{AZURE_OPENAI_DEPLOYMENT_NAME}|{_build_sql_prompt('{nlq}')}".encode()).hexdigest()[:16]
+
+
+_CLIENT_NOT_CONFIGURED = "Azure OpenAI client not configured. Please set AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY environment variables."
+
+
+def _sql_request(nlq: str) -> dict:
+    return dict(
         model=AZURE_OPENAI_DEPLOYMENT_NAME,
         messages=[{
             "role": "system",
             "content": "You are a helpful SQL generator for Snowflake."
         }, {
             "role": "user",
-            "content": prompt
+            "content": _build_sql_prompt(nlq)
         }],
         max_tokens=2000,
         temperature=0.0)
+
+
+def _clean_sql(response) -> str:
     # Extract and clean the SQL query, removing any leading/trailing whitespace or markdown
     sql = (response.choices[0].message.content or "").strip()
     # Remove any residual backticks or code block markers with proper replace syntax
     sql = sql.replace("```sql", "").replace("```", "").strip()
+    return sql
 
-    # AUTO-INJECT YEAR CONSTRAINTS for FINANCIAL_TRANSACTIONS and MEDICAL_RECORDS if missing
-    sql_upper = sql.upper()
-    if 'FINANCIAL_TRANSACTIONS' in sql_upper or 'MEDICAL_RECORDS' in sql_upper:
-        extracted_year = extract_year_from_nlq(nlq)
-        has_year_filter = any(
-            pattern in sql_upper for pattern in
-            ['YEAR(', f'= {extracted_year}', f'TRANSACTION_DATE', f'VISIT_DATE'])
-
-        if not has_year_filter:
-            # Determine the correct date column based on table
-            date_column = 'transaction_date' if 'FINANCIAL_TRANSACTIONS' in sql_upper else 'visit_date'
-            
-            # Inject year constraint automatically for security
-            if 'WHERE' in sql_upper:
-                # Add to existing WHERE clause
-                sql = sql.replace(
-                    ' WHERE ',
-                    f' WHERE YEAR({date_column}) = {extracted_year} AND ',
-                    1)
-                sql = sql.replace(
-                    ' where ',
-                    f' WHERE YEAR({date_column}) = {extracted_year} AND ',
-                    1)
-            else:
-                # Add WHERE clause before GROUP BY, ORDER BY, or at end
-                if 'GROUP BY' in sql_upper:
-                    sql = sql.replace(
-                        ' GROUP BY',
-                        f' WHERE YEAR({date_column}) = {extracted_year} GROUP BY',
-                        1)
-                    sql = sql.replace(
-                        ' group by',
-                        f' WHERE YEAR({date_column}) = {extracted_year} GROUP BY',
-                        1)
-                elif 'ORDER BY' in sql_upper:
-                    sql = sql.replace(
-                        ' ORDER BY',
-                        f' WHERE YEAR({date_column}) = {extracted_year} ORDER BY',
-                        1)
-                    sql = sql.replace(
-                        ' order by',
-                        f' WHERE YEAR({date_column}) = {extracted_year} ORDER BY',
-                        1)
-                else:
-                    sql = sql.rstrip(
-                        ';'
-                    ) + f' WHERE YEAR({date_column}) = {extracted_year}'
 
+def _generate_sql(nlq: str) -> str:
+    """Asks Azure OpenAI for the SQL translation of nlq and strips any markdown"""
+    if client is None:
+        raise ValueError(_CLIENT_NOT_CONFIGURED)
+    return _clean_sql(client.chat.completions.create(**_sql_request(nlq)))
+
+
+async def _generate_sql_async(nlq: str) -> str:
+    """Async counterpart of _generate_sql()"""
+    async_client = get_async_llm_client('sql')
+    if async_client is None:
+        raise ValueError(_CLIENT_NOT_CONFIGURED)
+    return _clean_sql(await async_client.chat.completions.create(**_sql_request(nlq)))
+
+
+def _finalize_sql(sql: str, year: int) -> str:
+    """
+    Validates a generated statement, rewrites its date filters into prunable ranges and
+    adds a filter on year to tables read without one, all on the validator's tokens
+    """
     # CRITICAL SECURITY VALIDATION
-    is_valid, error_message = validate_sql_security(sql, nlq)
-    if not is_valid:
-        raise ValueError(f"SQL Security Validation Failed: {error_message}")
+    verdict = validate_sql(sql)
+    if not verdict.is_valid:
+        raise ValueError(f"SQL Security Validation Failed: {verdict.error}")
+
+    tokens = verdict.tokens
+    if SQL_DATE_REWRITE_ENABLED:
+        tokens = rewrite_date_tokens(tokens)
+    # AUTO-INJECT YEAR CONSTRAINTS for FINANCIAL_TRANSACTIONS and MEDICAL_RECORDS if missing
+    if verdict.unguarded_tables:
+        for table in verdict.unguarded_tables:
+            tokens = add_year_guard_tokens(tokens, table, YEAR_GUARDED_TABLES[table], year)
+    return ''.join(tokens)
+
+
+def intent_sql(intent, year: int) -> str:
+    """The statement nlq_to_sql generates for a canned intent asked about year"""
+    return _finalize_sql(intent.sql(year), year)
+
+
+def _translate(nlq: str):
+    """
+    The nlq_to_sql pipeline as a generator shared by the sync and async entry points: it
+    yields once when it needs the LLM, is sent the generated SQL, and returns the final SQL.
+    """
+    year = extract_year_from_nlq(nlq)
+    intent = match_sql_intent(nlq)
+    if intent is not None:
+        # Canned question shape: bypass the LLM and both caches
+        sql = intent_sql(intent, year)
+        print(f"⚡ Matched SQL intent '{intent.name}' for: {nlq}")
+        return sql
+
+    cache = get_translation_cache()
+    cache_key = translation_cache_key(nlq, year, SQL_PROMPT_FINGERPRINT)
+    template_key = year_template_key(nlq, year, SQL_PROMPT_FINGERPRINT)
+    llm_ms = 0.0
+    source = "cache"
+    sql = cache.get(cache_key)
+    if sql is None and template_key is not None:
+        template = cache.get_template(template_key, year)
+        if template is not None:
+            sql, llm_ms = template
+            source = "template"
+    if sql is None:
+        started = time.perf_counter()
+        sql = yield
+        llm_ms = (time.perf_counter() - started) * 1000
+        cache.record_llm_call(llm_ms)
+        source = "llm"
+    elif source == "template":
+        print(f"♻️  NLQ year template applied for {year}: {nlq}")
+    else:
+        print(f"♻️  NLQ translation cache hit for: {nlq}")
+
+    raw_sql = sql
+    sql = _finalize_sql(sql, year)
+
+    if source != "cache":
+        cache.put(cache_key, nlq, raw_sql, llm_ms)
+    if source == "llm" and template_key is not None:
+        cache.learn_template(template_key, raw_sql, year, llm_ms)
 
     return sql
 
 
-def summarize_unstructured(content: str, summary_prompt: str) -> str:
+def nlq_to_sql(nlq: str) -> str:
     """
-    Summarizes unstructured text with short, focused, digestible insights.
+    Converts natural language query to Snowflake SQL using Azure OpenAI.
+    Canned question shapes are answered by the rule-based intent matcher. Other translations are served from the persistent translation cache, or from a confirmed
+    year-parameterized template, when available; year injection and security validation always run.
     """
-    if client is None:
-        return "Azure OpenAI not configured - unable to summarize content."
-    
-    response = client.chat.completions.create(
+    steps = _translate(nlq)
+    try:
+        steps.send(None)
+        steps.send(_generate_sql(nlq))
+    except StopIteration as done:
+        return done.value
+
+
+def _advance(steps, value) -> tuple[bool, object]:
+    """Resumes the _translate() generator with value: (True, final SQL) once it returns, else (False, None)"""
+    try:
+        steps.send(value)
+    except StopIteration as done:
+        return True, done.value
+    return False, None
+
+
+async def nlq_to_sql_async(nlq: str) -> str:
+    """
+    nlq_to_sql() with the LLM call awaited on the async client; the translation cache reads
+    and writes around it run on a worker thread, off the event loop
+    """
+    steps = _translate(nlq)
+    done, sql = await asyncio.to_thread(_advance, steps, None)
+    if not done:
+        _, sql = await asyncio.to_thread(_advance, steps, await _generate_sql_async(nlq))
+    return sql
+
+
+def _summary_messages(content: str, summary_prompt: str) -> list:
+    return [{
+        "role":
+        "system",
+        "content":
+        "You are a concise financial analyst. Provide only the 3-4 most important insights. Keep each point short and digestible. Use simple bullet points. Be extremely concise - each point should be maximum 15 words."
+    }, {
+        "role":
+        "user",
+        "content":
+        f"Question: {summary_prompt}\n\nData: {content}\n\nGive me ONLY the 3-4 most critical insights. Each point must be very short (max 15 words). Focus on the most important numbers and trends only. Be extremely concise and presentable."
+    }]
+
+
+SUMMARY_TEMPERATURE = 0.2
+SUMMARY_MAX_TOKENS = 1500
+
+# Identifies the model and message template; cached summaries from another version never match
+SUMMARY_PROMPT_FINGERPRINT = hashlib.sha256(
+    f"{AZURE_OPENAI_DEPLOYMENT_NAME}|{SUMMARY_TEMPERATURE}|{SUMMARY_MAX_TOKENS}|"
+    f"{_summary_messages('{content}', '{prompt}')}".encode()).hexdigest()[:16]
+
+
+def _summary_request(content: str, summary_prompt: str) -> dict:
+    return dict(
         model=AZURE_OPENAI_DEPLOYMENT_NAME,
-        messages=[{
-            "role":
-            "system",
-            "content":
-            "You are a concise financial analyst. Provide only the 3-4 most important insights. Keep each point short and digestible. Use simple bullet points. Be extremely concise - each point should be maximum 15 words."
-        }, {
-            "role":
-            "user",
-            "content":
-            f"Question: {summary_prompt}\n\nData: {content}\n\nGive me ONLY the 3-4 most critical insights. Each point must be very short (max 15 words). Focus on the most important numbers and trends only. Be extremely concise and presentable."
-        }],
-        max_tokens=1500,
-        temperature=0.2)
+        messages=_summary_messages(content, summary_prompt),
+        max_tokens=SUMMARY_MAX_TOKENS,
+        temperature=SUMMARY_TEMPERATURE)
 
-    result = (response.choices[0].message.content or "").strip()
 
-    # Ensure concise formatting
-    lines = result.split('\n')
+def _cached_summary(content: str, summary_prompt: str):
+    """Returns (summary cache key, cached summary or None)"""
+    key = summary_cache_key(content, summary_prompt, SUMMARY_PROMPT_FINGERPRINT)
+    summary = get_summary_cache().get(key)
+    if summary is not None:
+        print(f"♻️  Summary cache hit for: {summary_prompt}")
+    return key, summary
+
+
+def format_summary(result: str) -> str:
+    """Trims a summary completion to at most 4 '- ' bullet points"""
+    lines = result.strip().split('\n')
     formatted_lines = []
     count = 0
 
@@ -300,3 +337,83 @@ def summarize_unstructured(content: str, summary_prompt: str) -> str:
             count += 1
 
     return '\n'.join(formatted_lines)
+
+
+def summarize_unstructured(content: str, summary_prompt: str,
+                           on_llm_call: Optional[Callable[[float], None]] = None) -> str:
+    """
+    Summarizes unstructured text with short, focused, digestible insights.
+    Summaries are served from the persistent summary cache while the content is unchanged;
+    on_llm_call gets the milliseconds of the LLM call when one actually ran.
+    """
+    key, summary = _cached_summary(content, summary_prompt)
+    if summary is not None:
+        return summary
+    if summary_client is None:
+        return "Azure OpenAI not configured - unable to summarize content."
+
+    started = time.perf_counter()
+    response = summary_client.chat.completions.create(**_summary_request(content, summary_prompt))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if on_llm_call is not None:
+        on_llm_call(elapsed_ms)
+
+    # Ensure concise formatting
+    summary = format_summary(response.choices[0].message.content or "")
+    if summary:
+        get_summary_cache().put(key, summary, elapsed_ms)
+    return summary
+
+
+async def summarize_unstructured_async(content: str, summary_prompt: str,
+                                       on_llm_call: Optional[Callable[[float], None]] = None) -> str:
+    """Async counterpart of summarize_unstructured(); the summary cache is read and written on a worker thread"""
+    key, summary = await asyncio.to_thread(_cached_summary, content, summary_prompt)
+    if summary is not None:
+        return summary
+    async_client = get_async_llm_client('summary')
+    if async_client is None:
+        return "Azure OpenAI not configured - unable to summarize content."
+
+    started = time.perf_counter()
+    response = await async_client.chat.completions.create(**_summary_request(content, summary_prompt))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if on_llm_call is not None:
+        on_llm_call(elapsed_ms)
+    summary = format_summary(response.choices[0].message.content or "")
+    if summary:
+        await asyncio.to_thread(get_summary_cache().put, key, summary, elapsed_ms)
+    return summary
+
+
+def stream_summarize_unstructured(content: str, summary_prompt: str,
+                                  on_llm_call: Optional[Callable[[float], None]] = None):
+    """
+    Streaming variant of summarize_unstructured: yields completion tokens as they arrive
+    and returns the formatted summary, so callers use `summary = yield from ...`.
+    A cached summary is yielded as a single token.
+    """
+    key, summary = _cached_summary(content, summary_prompt)
+    if summary is not None:
+        yield summary
+        return summary
+    if summary_client is None:
+        message = "Azure OpenAI not configured - unable to summarize content."
+        yield message
+        return message
+
+    started = time.perf_counter()
+    stream = summary_client.chat.completions.create(**_summary_request(content, summary_prompt), stream=True)
+    tokens = []
+    for chunk in stream:
+        # Azure sends a leading chunk with prompt filter results and no choices
+        if chunk.choices and chunk.choices[0].delta.content:
+            tokens.append(chunk.choices[0].delta.content)
+            yield tokens[-1]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if on_llm_call is not None:
+        on_llm_call(elapsed_ms)
+    summary = format_summary(''.join(tokens))
+    if summary:
+        get_summary_cache().put(key, summary, elapsed_ms)
+    return summary
@@ -0,0 +1,166 @@
+"""
+Typed result of the NLQ pipeline.
+
+process_nlq used to return one string - deterministic rows rendered as text with a
+"(Source: ...)" suffix - that the API then split apart again, losing column names and
+types. A QueryResult keeps what the pipeline knows instead: how the query was answered
+(kind), the route or source table, the SQL, column metadata and the rows as the cursor
+returned them, next to the rendered text and the summary. str() still gives the legacy
+message string for logs and the 'message' field of the API payload.
+"""
+
+import datetime
+import decimal
+import time
+from typing import NamedTuple, Optional
+
+# Kinds of result, and what each one carries
+#   route      - answered outside the warehouse (GenAI Suite, Power BI); route holds its name
+#   structured - SQL rows: sql, columns, rows, total_rows and their deterministic text, plus the
+#                result_id of the full rows in the result store when there are more than shown, and
+#                as_of when the rows came from the materialized aggregates or the table replica rather
+#                than the warehouse
+#   analysis   - LLM analysis of a PDF document, in summary
+#   summary    - LLM summary of unstructured reports, in summary
+#   notice     - nothing to show (no rows, no reports, a report read that failed), in text
+#   error      - the pipeline failed; text holds the error
+KINDS = ('route', 'structured', 'analysis', 'summary', 'notice', 'error')
+
+# Snowflake cursor type codes (snowflake.connector.constants.FIELD_TYPES) by logical type
+_SNOWFLAKE_TYPES = {0: 'number', 1: 'number', 2: 'text', 3: 'date', 4: 'timestamp', 5: 'variant',
+                    6: 'timestamp', 7: 'timestamp', 8: 'timestamp', 9: 'variant', 10: 'variant',
+                    11: 'binary', 12: 'time', 13: 'boolean'}
+
+
+class Column(NamedTuple):
+    name: str
+    type: str
+    # Declared precision and scale of NUMBER columns; None when the cursor does not report them
+    precision: Optional[int] = None
+    scale: Optional[int] = None
+
+
+def _value_type(value) -> str:
+    """Logical type of a fetched value, for cursors that don't report one (the local backend)"""
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return 'number'
+    if isinstance(value, datetime.datetime):
+        return 'timestamp'
+    if isinstance(value, datetime.date):
+        return 'date'
+    if isinstance(value, datetime.time):
+        return 'time'
+    if isinstance(value, (bytes, bytearray)):
+        return 'binary'
+    if isinstance(value, str):
+        return 'text'
+    return 'variant'
+
+
+def describe_columns(description, rows=()) -> tuple:
+    """Columns of a DB-API cursor description; types without a type code are taken from rows"""
+    columns = []
+    for index, field in enumerate(description or ()):
+        name, type_code = field[0], field[1]
+        column_type = _SNOWFLAKE_TYPES.get(type_code) if type_code is not None else None
+        if column_type is None:
+            sample = next((row[index] for row in rows if row[index] is not None), None)
+            column_type = _value_type(sample) if sample is not None else 'text'
+        precision = scale = None
+        if column_type == 'number' and len(field) > 5:
+            precision, scale = field[4], field[5]
+        columns.append(Column(name, column_type, precision, scale))
+    return tuple(columns)
+
+
+def json_value(value):
+    """A fetched value as a JSON-native value"""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return value
+
+
+def record_keys(columns) -> list:
+    """Unique keys for the columns of a row dict (unnamed and repeated columns get their position)"""
+    names = []
+    for index, column in enumerate(columns):
+        name = column.name or f"column_{index}"
+        names.append(name if name not in names else f"{name}_{index}")
+    return names
+
+
+class LocalAnswer(NamedTuple):
+    """
+    Rows answered without the warehouse (materialized aggregates, table replica), shaped like
+    fetch_sql_spooled()'s (columns, first rows, total rows, result id), plus when they were current
+    """
+    columns: tuple
+    rows: list
+    total_rows: int
+    result_id: Optional[str]
+    as_of: float
+
+
+class QueryResult:
+    """What process_nlq found for one query; see KINDS for the fields each kind sets"""
+
+    __slots__ = ('kind', 'source', 'route', 'sql', 'columns', 'rows', 'total_rows', 'text', 'summary',
+                 'result_id', 'as_of')
+
+    def __init__(self, kind: str, source: Optional[str] = None, *, route: Optional[str] = None,
+                 sql: Optional[str] = None, columns: tuple = (), rows=(), total_rows: int = 0,
+                 text: Optional[str] = None, summary: Optional[str] = None,
+                 result_id: Optional[str] = None, as_of: Optional[float] = None):
+        self.kind = kind
+        self.source = source
+        self.route = route
+        self.sql = sql
+        self.columns = columns
+        self.rows = rows
+        self.total_rows = total_rows
+        self.text = text
+        self.summary = summary
+        self.result_id = result_id
+        self.as_of = as_of
+
+    @property
+    def message(self) -> str:
+        """The string process_nlq used to return for this result"""
+        if self.kind == 'route':
+            return self.route
+        if self.kind == 'analysis':
+            return f"Analysis (Source: {self.source}): {self.summary}"
+        if self.kind == 'summary':
+            return f"Summary (Source: {self.source}): {self.summary}"
+        if self.kind == 'error':
+            return f"Error: {self.text} (Source: {self.source or 'N/A'})"
+        return f"{self.text} (Source: {self.source})"
+
+    def __str__(self) -> str:
+        return self.message
+
+    def __repr__(self) -> str:
+        return f"QueryResult({self.kind!r}, {self.source!r}, rows={len(self.rows)}, total_rows={self.total_rows})"
+
+    def column_info(self) -> list:
+        """Column names and logical types, JSON-ready"""
+        return [{'name': column.name, 'type': column.type} for column in self.columns]
+
+    def freshness(self) -> dict:
+        """as_of (UTC, ISO 8601) and staleness_seconds of locally answered rows; empty for warehouse rows"""
+        if self.as_of is None:
+            return {}
+        as_of = datetime.datetime.fromtimestamp(self.as_of, datetime.timezone.utc)
+        return {'as_of': as_of.isoformat(timespec='seconds'),
+                'staleness_seconds': round(max(0.0, time.time() - self.as_of), 1)}
+
+    def records(self) -> list:
+        """Rows as dicts keyed by column name, with JSON-native values"""
+        names = record_keys(self.columns)
+        return [{name: json_value(value) for name, value in zip(names, row)} for row in self.rows]
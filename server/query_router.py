@@ -0,0 +1,219 @@
+"""
+Single-pass query router for process_nlq.
+
+All indicator lists used for routing are compiled once, at import, into one regular
+expression. Each keyword keeps the original substring semantics (`keyword in nlq_lower`):
+the pattern is a lookahead over a keyword trie tried at every position, preferring the
+longest keyword, and every keyword maps to the features of all keywords that are its
+prefixes, so overlapping matches ("medical report" / "medical" / "report") are all
+reported from one scan.
+Routing decisions are then read from declarative, ordered rule tables.
+"""
+
+import re
+from typing import Optional
+
+# Feature name -> indicator keywords (lower-case substrings)
+INDICATORS = {
+    # Accounts payable: approval workflows and vendor names (companies sending invoices TO us)
+    'ap_strong': [
+        "approve invoice", "approve the invoice", "pending approval",
+        "awaiting approval", "reject invoice", "reject the invoice",
+        "accounts payable", "ap automation", "vendor invoice",
+        "invoice processing", "invoice automation", "ap dashboard"
+    ],
+    'ap_vendor': [
+        "tech solutions", "global tech", "office supplies co",
+        "cloud services inc", "consulting partners"
+    ],
+    # Generic invoice indicators (could be AP or AR, need more context)
+    'invoice': ["invoice", "invoices", "which invoices", "show invoices", "invoice status"],
+    # Accounts receivable: AR terms and customer names (companies we sent invoices TO)
+    'ar_strong': [
+        "accounts receivable", "ar automation", "customer invoice",
+        "receivable", "receivables", "collection", "customer payment",
+        "ar dashboard", "invoice sent to", "invoice to"
+    ],
+    'ar_customer': ["manufacturing plus", "techcorp", "global retailers", "service dynamics"],
+    'status_action': [
+        "change status", "update status", "mark as", "set status",
+        "change the status", "update the status", "mark it as", "set it to"
+    ],
+    # Power BI dashboards
+    'financial_dashboard': [
+        "financial dashboard", "finance dashboard", "financial analytics",
+        "finance report", "financial report", "show financial", "open financial"
+    ],
+    'medical_dashboard': [
+        "medical dashboard", "medical analytics", "medical report",
+        "show medical", "open medical", "healthcare dashboard"
+    ],
+    'power_bi': ["power bi", "powerbi"],
+    # Snowflake query types
+    'pdf': [
+        "annual report", "pdf", "document", "invoice", "q4 invoice",
+        "uploaded", "file", "files", "annual medical summary", "medical report content",
+        "show me the medical report", "content of medical report"
+    ],
+    'structured': [
+        "total", "sum", "maximum", "minimum", "max", "min", "count",
+        "which month", "what month", "expense", "revenue", "amount",
+        "transaction", "calculate", "find", "show me", "financials",
+        "performance", "sold", "services", "products", "consulting",
+        "patient", "diagnosis", "treatment", "cost", "medical", "visit",
+        "diagnosis trends", "patient cost", "treatment cost", "medical cost"
+    ],
+    'unstructured': [
+        "summary", "report", "update", "highlight", "highlights", "overview",
+        "annual", "ytd", "medical report", "medical summary"
+    ],
+    'q1': ["q1"],
+    'q2': ["q2"],
+    'q3': ["q3"],
+    'q4': ["q4"],
+    'medical': [
+        "patient", "diagnosis", "treatment", "medical", "visit",
+        "medical cost", "treatment cost", "patient cost", "diagnosis trends",
+        "medical record", "medical report", "medical summary"
+    ],
+    'financial': ["financial", "finance", "revenue", "expense", "investment"],
+    'consolidation': [
+        "all", "overall", "full year", "annual", "ytd", "entire",
+        "consolidated", "highlights", "overview", "reports", "year"
+    ],
+    # Medical PDF requests that target the annual summary document
+    'annual_or_summary': ["annual", "summary"],
+}
+
+QUARTER_KEYS = ('q1', 'q2', 'q3', 'q4')
+
+# Ordered routing rules: (route, features, log message). The first rule with any feature present wins.
+# AP is checked first (approval workflows are AP-specific); AR covers status changes without AP
+# context; generic invoice queries default to AP; generic Power BI requests default to financial.
+ROUTE_RULES = [
+    ('genai_invoice_suite', frozenset({'ap_strong', 'ap_vendor'}),
+     "Detected GenAI Suite AP (Accounts Payable) request"),
+    ('genai_ar_suite', frozenset({'ar_strong', 'ar_customer', 'status_action'}),
+     "Detected GenAI Suite AR (Accounts Receivable) request"),
+    ('genai_invoice_suite', frozenset({'invoice'}),
+     "Detected GenAI Suite AP (Accounts Payable) request"),
+    ('powerbi_financial_dashboard', frozenset({'financial_dashboard'}),
+     "Detected Financial Power BI dashboard request"),
+    ('powerbi_medical_dashboard', frozenset({'medical_dashboard'}),
+     "Detected Medical Power BI dashboard request"),
+    ('powerbi_financial_dashboard', frozenset({'power_bi'}),
+     "Detected generic Power BI dashboard request (defaulting to financial)"),
+]
+
+# Ordered query-type rules for Snowflake-backed queries; structured is the default.
+# PDF has highest priority, and unstructured (summary/quarter) is checked BEFORE structured
+# so "financials summary Q1" routes to unstructured.
+QUERY_TYPE_RULES = [
+    ('pdf', frozenset({'pdf'})),
+    ('unstructured', frozenset({'unstructured', *QUARTER_KEYS})),
+]
+DEFAULT_QUERY_TYPE = 'structured'
+
+
+def _trie_pattern(keywords) -> str:
+    """
+    Regex source for a keyword trie. Children are tried before a node's own end, so at any
+    position the longest keyword wins, and keywords sharing a prefix cost one comparison per
+    character instead of one per keyword as in a flat alternation.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+def _compile(indicators: dict):
+    keyword_features = {}
+    for feature, keywords in indicators.items():
+        for keyword in keywords:
+            keyword_features.setdefault(keyword, set()).add(feature)
+    # A keyword matched at a position implies every keyword that is a prefix of it
+    closed = {
+        keyword: frozenset().union(*(features for other, features in keyword_features.items()
+                                     if keyword.startswith(other)))
+        for keyword in keyword_features
+    }
+    return re.compile(f'(?=({_trie_pattern(keyword_features)}))'), closed
+
+
+_PATTERN, _KEYWORD_FEATURES = _compile(INDICATORS)
+
+
+def match_features(nlq: str) -> frozenset:
+    """Every indicator feature present in nlq, from a single scan"""
+    features = set()
+    for match in _PATTERN.finditer(nlq.lower()):
+        features |= _KEYWORD_FEATURES[match.group(1)]
+    return frozenset(features)
+
+
+class RouteDecision:
+    """Routing outcome for one query, computed once and shared by every branch of process_nlq"""
+
+    __slots__ = ('features', 'route', 'route_message', 'query_type')
+
+    def __init__(self, features: frozenset):
+        self.features = features
+        self.route: Optional[str] = None
+        self.route_message: Optional[str] = None
+        for route, rule_features, message in ROUTE_RULES:
+            if features & rule_features:
+                self.route = route
+                self.route_message = message
+                break
+        self.query_type = next((query_type for query_type, rule_features in QUERY_TYPE_RULES
+                                if features & rule_features), DEFAULT_QUERY_TYPE)
+
+    @property
+    def is_medical(self) -> bool:
+        return 'medical' in self.features
+
+    @property
+    def quarter(self) -> Optional[str]:
+        """First quarter mentioned, in q1..q4 order"""
+        return next((q for q in QUARTER_KEYS if q in self.features), None)
+
+    @property
+    def wants_consolidation(self) -> bool:
+        """Consolidation keywords present AND no specific quarter mentioned"""
+        return 'consolidation' in self.features and self.quarter is None
+
+    @property
+    def wants_annual_summary(self) -> bool:
+        return 'annual_or_summary' in self.features
+
+    @property
+    def source_table(self) -> str:
+        return "medical_records" if self.is_medical else "financial_transactions"
+
+    @property
+    def report_source(self) -> str:
+        return "medical_reports" if self.is_medical else "financial_reports"
+
+    @property
+    def report_sources(self) -> tuple:
+        """Report tables a consolidated request reads: both when it names both domains"""
+        if self.is_medical and 'financial' in self.features:
+            return ("financial_reports", "medical_reports")
+        return (self.report_source,)
+
+
+def route_query(nlq: str) -> RouteDecision:
+    """Scans nlq once and returns its routing decision"""
+    return RouteDecision(match_features(nlq))
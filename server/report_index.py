@@ -0,0 +1,248 @@
+"""
+Local full-text index of FINANCIAL_REPORTS / MEDICAL_REPORTS content.
+
+Report lookups by text (medical quarter reports, the annual medical summary) used to run
+ILIKE '%...%' scans over every report's content in the warehouse. This module keeps an
+inverted index of that content in a SQLite FTS5 file (WAL mode, shared by every gunicorn
+worker, memory-mapped with PRAGMA mmap_size so lookups read straight from the page cache)
+and resolves a lookup to report ids locally; Snowflake is then only asked for those rows.
+
+The index syncs incrementally: a cheap listing of (report_id, report_date) is compared
+with the indexed reports, and content is only fetched for reports that are new or whose
+report_date changed; reports gone from the warehouse are dropped. A table is resynced
+when its last sync is older than REPORT_INDEX_SYNC_INTERVAL.
+
+Terms match whole words, with the last word of each term matched as a prefix, so
+'ANNUAL' finds "ANNUAL MEDICAL SUMMARY" but not "SEMIANNUAL". Lookups return None when
+the index is unavailable, and callers fall back to the ILIKE SQL.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from config import (REPORT_INDEX_ENABLED, REPORT_INDEX_PATH, REPORT_INDEX_SYNC_INTERVAL,
+                    REPORT_INDEX_MMAP_BYTES)
+from snowflake_connector import execute_sql
+
+REPORT_TABLES = ('financial_reports', 'medical_reports')
+
+# Reports fetched per IN (...) statement during a sync
+_FETCH_BATCH_SIZE = 200
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def report_ids_predicate(report_ids: Iterable[str]) -> str:
+    """WHERE clause selecting the given reports by report_data:report_id"""
+    return f"report_data:report_id::string IN ({', '.join(_quote(report_id) for report_id in report_ids)})"
+
+
+def _match_term(term: str) -> Optional[str]:
+    """FTS5 query for term: its words as a phrase, the last one matched as a prefix"""
+    words = _WORD_PATTERN.findall(term.lower())
+    if not words:
+        return None
+    return '"' + ' '.join(words) + '" *'
+
+
+class ReportIndex:
+    """FTS5 index of report content keyed by (table, report_id), with sync and lookup counters"""
+
+    def __init__(self, path: str = REPORT_INDEX_PATH, sync_interval: float = REPORT_INDEX_SYNC_INTERVAL,
+                 enabled: bool = REPORT_INDEX_ENABLED):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stats = {'lookups': 0, 'fallbacks': 0, 'syncs': 0, 'reports_fetched': 0,
+                       'reports_removed': 0, 'sync_ms': 0.0, 'lookup_ms': 0.0, 'errors': 0}
+        if self.enabled:
+            try:
+                self._init_schema()
+            except sqlite3.Error as e:
+                # Also the path taken when the sqlite3 build lacks FTS5
+                print(f"⚠️  Report index disabled: {e}")
+                self.enabled = False
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets worker processes read while one writes
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.execute(f"PRAGMA mmap_size = {int(REPORT_INDEX_MMAP_BYTES)}")
+            self._local.db = db
+        return db
+
+    def _init_schema(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = self._db()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                report_id TEXT NOT NULL,
+                report_date TEXT,
+                file_name TEXT,
+                UNIQUE (table_name, report_id)
+            )
+        """)
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS report_terms USING fts5(content, tokenize = 'unicode61')")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                table_name TEXT PRIMARY KEY,
+                synced_at REAL NOT NULL
+            )
+        """)
+        db.commit()
+
+    def _bump(self, key: str, amount: float = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _is_fresh(self, table: str) -> bool:
+        row = self._db().execute("SELECT synced_at FROM sync_state WHERE table_name = ?", (table,)).fetchone()
+        return row is not None and time.time() - row[0] < self.sync_interval
+
+    def sync(self, table: str, force: bool = False):
+        """Brings the index for table up to date with the warehouse if it is stale (or force)"""
+        with self._sync_lock:
+            if not force and self._is_fresh(table):
+                return
+            started = time.perf_counter()
+            listing = execute_sql(f"""
+                SELECT report_data:report_id::string, report_data:report_date::string
+                FROM {table}
+                WHERE report_data:content::string IS NOT NULL
+            """, use_cache=False)
+            db = self._db()
+            indexed = dict(db.execute("SELECT report_id, report_date FROM reports WHERE table_name = ?",
+                                      (table,)).fetchall())
+            current = {str(report_id): report_date for report_id, report_date in listing if report_id is not None}
+            changed = [report_id for report_id, report_date in current.items() if indexed.get(report_id, ()) != report_date]
+            removed = [report_id for report_id in indexed if report_id not in current]
+
+            for start in range(0, len(changed), _FETCH_BATCH_SIZE):
+                batch = changed[start:start + _FETCH_BATCH_SIZE]
+                rows = execute_sql(f"""
+                    SELECT report_data:report_id::string, report_data:report_date::string,
+                           report_data:file_name::string, report_data:content::string
+                    FROM {table}
+                    WHERE {report_ids_predicate(batch)}
+                """, use_cache=False)
+                for report_id, report_date, file_name, content in rows:
+                    if content is not None:
+                        self._upsert(db, table, str(report_id), report_date, file_name, content)
+            for report_id in removed:
+                self._delete(db, table, report_id)
+            db.execute("INSERT OR REPLACE INTO sync_state (table_name, synced_at) VALUES (?, ?)",
+                       (table, time.time()))
+            db.commit()
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._stats['syncs'] += 1
+                self._stats['reports_fetched'] += len(changed)
+                self._stats['reports_removed'] += len(removed)
+                self._stats['sync_ms'] += elapsed_ms
+            if changed or removed:
+                print(f"🔎 Report index synced {table}: {len(changed)} new/changed, {len(removed)} removed "
+                      f"in {elapsed_ms:.0f}ms")
+
+    @staticmethod
+    def _delete(db: sqlite3.Connection, table: str, report_id: str):
+        row = db.execute("SELECT id FROM reports WHERE table_name = ? AND report_id = ?",
+                         (table, report_id)).fetchone()
+        if row is not None:
+            db.execute("DELETE FROM report_terms WHERE rowid = ?", row)
+            db.execute("DELETE FROM reports WHERE id = ?", row)
+
+    def _upsert(self, db: sqlite3.Connection, table: str, report_id: str, report_date, file_name, content: str):
+        self._delete(db, table, report_id)
+        row_id = db.execute("INSERT INTO reports (table_name, report_id, report_date, file_name) VALUES (?, ?, ?, ?)",
+                            (table, report_id, report_date, file_name)).lastrowid
+        db.execute("INSERT INTO report_terms (rowid, content) VALUES (?, ?)", (row_id, content))
+
+    def find(self, table: str, all_terms: Iterable[str] = (), any_terms: Iterable[str] = (),
+             file_name_like: Optional[str] = None) -> Optional[list]:
+        """
+        Ids of the reports in table whose content contains every one of all_terms and, if
+        any_terms or file_name_like are given, at least one of any_terms or a file name
+        matching the LIKE pattern; ordered by report_date. None when the index is unusable.
+        """
+        if not self.enabled or table not in REPORT_TABLES:
+            return None
+        started = time.perf_counter()
+        try:
+            self.sync(table)
+            conditions, params = ["r.table_name = ?"], [table]
+            for term in all_terms:
+                query = _match_term(term)
+                if query is not None:
+                    conditions.append("r.id IN (SELECT rowid FROM report_terms WHERE report_terms MATCH ?)")
+                    params.append(query)
+            alternatives = []
+            for term in any_terms:
+                query = _match_term(term)
+                if query is not None:
+                    alternatives.append("r.id IN (SELECT rowid FROM report_terms WHERE report_terms MATCH ?)")
+                    params.append(query)
+            if file_name_like is not None:
+                # SQLite LIKE is case-insensitive for ASCII, like Snowflake's ILIKE
+                alternatives.append("r.file_name LIKE ?")
+                params.append(file_name_like)
+            if alternatives:
+                conditions.append(f"({' OR '.join(alternatives)})")
+            rows = self._db().execute(f"""
+                SELECT r.report_id FROM reports r
+                WHERE {' AND '.join(conditions)}
+                ORDER BY r.report_date, r.report_id
+            """, params).fetchall()
+        except Exception as e:
+            print(f"⚠️  Report index lookup failed, falling back to a warehouse scan: {e}")
+            self._bump('errors')
+            self._bump('fallbacks')
+            return None
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._stats['lookup_ms'] += (time.perf_counter() - started) * 1000
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        """Lookup and sync counters for this process, plus the number of indexed reports"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_lookup_ms'] = round(stats.pop('lookup_ms') / stats['lookups'], 2) if stats['lookups'] else 0.0
+        stats['sync_ms'] = round(stats['sync_ms'], 1)
+        stats['enabled'] = self.enabled
+        if self.enabled:
+            try:
+                stats['reports'] = dict(self._db().execute(
+                    "SELECT table_name, COUNT(*) FROM reports GROUP BY table_name").fetchall())
+            except sqlite3.Error:
+                stats['reports'] = None
+        return stats
+
+
+_index: Optional[ReportIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_report_index() -> ReportIndex:
+    """Returns the process-wide report index, opening the SQLite file on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ReportIndex()
+    return _index
@@ -0,0 +1,155 @@
+"""
+In-process cache for Snowflake query results.
+
+Entries are keyed on normalized SQL text, expire after the TTL of the tables they read,
+and are evicted least-recently-used once the entry count or byte budget is exceeded.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from config import (SQL_CACHE_ENABLED, SQL_CACHE_MAX_ENTRIES, SQL_CACHE_MAX_BYTES,
+                    SQL_CACHE_TABLE_TTLS, SQL_CACHE_DEFAULT_TTL)
+
+# String literals and quoted identifiers are kept verbatim during normalization
+_SQL_TOKEN_PATTERN = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|([^'"]+|['"])""")
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_TABLE_PATTERN = re.compile(r'\b(' + '|'.join(SQL_CACHE_TABLE_TTLS) + r')\b', re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace, drops a trailing semicolon and upper-cases everything outside quotes"""
+    parts = []
+    for literal, code in _SQL_TOKEN_PATTERN.findall(sql.strip().rstrip(';').strip()):
+        if literal:
+            parts.append(literal)
+        else:
+            parts.append(_WHITESPACE_PATTERN.sub(' ', code).upper())
+    return ''.join(parts).strip()
+
+
+def referenced_tables(sql: str) -> frozenset:
+    """Whitelisted tables a statement reads from"""
+    return frozenset(match.upper() for match in _TABLE_PATTERN.findall(sql))
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'size', 'tables', 'expires_at')
+
+    def __init__(self, value, size: int, tables: frozenset, expires_at: float):
+        self.value = value
+        self.size = size
+        self.tables = tables
+        self.expires_at = expires_at
+
+
+class SqlResultCache:
+    """Thread-safe LRU cache of query results bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int = SQL_CACHE_MAX_ENTRIES,
+                 max_bytes: int = SQL_CACHE_MAX_BYTES,
+                 table_ttls: Optional[dict] = None,
+                 default_ttl: float = SQL_CACHE_DEFAULT_TTL,
+                 enabled: bool = SQL_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.table_ttls = dict(SQL_CACHE_TABLE_TTLS if table_ttls is None else table_ttls)
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[tuple, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _ttl_for(self, tables: frozenset) -> float:
+        if not tables:
+            return self.default_ttl
+        return min(self.table_ttls.get(table, self.default_ttl) for table in tables)
+
+    def ttl_for(self, sql: str) -> float:
+        """Seconds a result of sql stays valid: the shortest TTL of the tables it reads"""
+        return self._ttl_for(referenced_tables(sql))
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, sql: str, variant: Any = None):
+        """Returns (hit, value); `variant` distinguishes different result shapes of the same SQL"""
+        if not self.enabled:
+            return False, None
+        key = (normalize_sql(sql), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry.value
+
+    def put(self, sql: str, value, size: int, variant: Any = None):
+        """Stores a result; results larger than the whole byte budget are not cached"""
+        if not self.enabled or size > self.max_bytes:
+            return
+        normalized = normalize_sql(sql)
+        tables = referenced_tables(normalized)
+        ttl = self._ttl_for(tables)
+        if ttl <= 0:
+            return
+        key = (normalized, variant)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(value, size, tables, time.monotonic() + ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, tables: Optional[Iterable[str]] = None) -> int:
+        """Drops entries reading any of `tables` (all entries when None); returns how many were removed"""
+        with self._lock:
+            if tables is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                wanted = {table.upper() for table in tables}
+                stale = [key for key, entry in self._entries.items() if entry.tables & wanted]
+                for key in stale:
+                    self._remove(key)
+                removed = len(stale)
+            self._stats['invalidations'] += removed
+            return removed
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+_cache = SqlResultCache()
+
+
+def get_sql_cache() -> SqlResultCache:
+    """Returns the process-wide SQL result cache"""
+    return _cache
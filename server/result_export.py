@@ -0,0 +1,155 @@
+"""
+Streaming export of structured results as CSV, NDJSON or Arrow IPC.
+
+An export consumes (columns, rows) batches - from the warehouse cursor
+(snowflake_connector.iter_sql_result) or from a spooled result (result_store) - and
+yields one encoded chunk per batch, so the response goes out with chunked transfer while
+only one batch of rows is ever in memory, however large the result.
+
+Arrow IPC (the streaming format, one record batch per chunk) needs pyarrow; without it
+the format is reported as unavailable.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import json
+from typing import Iterator
+
+from query_result import json_value, record_keys
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+def export_available(fmt: str) -> bool:
+    """Whether fmt is an export format this process can produce"""
+    return fmt in EXPORT_FORMATS and (fmt != 'arrow' or pyarrow is not None)
+
+
+def iter_export(batches: Iterator[tuple[tuple, list]], fmt: str) -> Iterator[bytes]:
+    """Encodes (columns, rows) batches as fmt, one chunk per batch"""
+    if fmt == 'csv':
+        return _iter_csv(batches)
+    if fmt == 'ndjson':
+        return _iter_ndjson(batches)
+    if fmt == 'arrow' and pyarrow is not None:
+        return _iter_arrow(batches)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def _iter_csv(batches) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = False
+    for columns, rows in batches:
+        if not header:
+            writer.writerow(column.name for column in columns)
+            header = True
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+# One encoder for every row: json.dumps(..., default=str) would build a new one per call
+_json_encoder = json.JSONEncoder(default=str)
+
+
+def _iter_ndjson(batches) -> Iterator[bytes]:
+    keys = None
+    encode = _json_encoder.encode
+    for columns, rows in batches:
+        if keys is None:
+            keys = record_keys(columns)
+        if rows:
+            lines = [encode(dict(zip(keys, map(json_value, row)))) for row in rows]
+            lines.append('')
+            yield '\n'.join(lines).encode()
+
+
+# Logical column types (query_result) as Arrow types; numbers follow the column's declared scale
+_ARROW_TYPES = {
+    'text': lambda: pyarrow.string(),
+    'variant': lambda: pyarrow.string(),
+    'date': lambda: pyarrow.date32(),
+    'timestamp': lambda: pyarrow.timestamp('us'),
+    'time': lambda: pyarrow.time64('us'),
+    'boolean': lambda: pyarrow.bool_(),
+    'binary': lambda: pyarrow.binary(),
+}
+
+# Spooled results hold dates and times as ISO text (json_value); these parse them back
+_ISO_PARSERS = {'date': datetime.date.fromisoformat, 'timestamp': datetime.datetime.fromisoformat,
+                'time': datetime.time.fromisoformat}
+
+
+def _arrow_type(column):
+    if column.type != 'number':
+        return _ARROW_TYPES.get(column.type, pyarrow.string)()
+    if column.scale == 0:
+        # NUMBER(38, 0) values can overflow int64; only columns declared narrow enough use it
+        if column.precision is not None and column.precision > 18:
+            return pyarrow.decimal128(min(column.precision, 38), 0)
+        return pyarrow.int64()
+    # Scaled NUMBERs, and numbers of cursors that declare no scale (SQLite), may hold fractions
+    return pyarrow.float64()
+
+
+def _arrow_schema(columns):
+    return pyarrow.schema([pyarrow.field(column.name or f"column_{index}", _arrow_type(column))
+                           for index, column in enumerate(columns)])
+
+
+def _arrow_converter(column, arrow_type):
+    """Value -> the Python value pyarrow expects for arrow_type, or None when values pass as they are"""
+    if pyarrow.types.is_string(arrow_type):
+        return lambda value: value if isinstance(value, str) else str(value)
+    if pyarrow.types.is_floating(arrow_type):
+        return float
+    if pyarrow.types.is_integer(arrow_type):
+        return int
+    if pyarrow.types.is_decimal(arrow_type):
+        return lambda value: value if isinstance(value, decimal.Decimal) else decimal.Decimal(int(value))
+    parse = _ISO_PARSERS.get(column.type)
+    if parse is not None:
+        return lambda value: parse(value) if isinstance(value, str) else value
+    return None
+
+
+def _arrow_values(values, convert) -> list:
+    if convert is None:
+        return values
+    return [None if value is None else convert(value) for value in values]
+
+
+def _iter_arrow(batches) -> Iterator[bytes]:
+    sink = io.BytesIO()
+    writer = None
+    schema = None
+    converters = None
+    for columns, rows in batches:
+        if writer is None:
+            schema = _arrow_schema(columns)
+            converters = [_arrow_converter(column, field.type) for column, field in zip(columns, schema)]
+            writer = pyarrow.ipc.new_stream(sink, schema)
+        if rows:
+            arrays = [pyarrow.array(_arrow_values([row[index] for row in rows], converters[index]), type=field.type)
+                      for index, field in enumerate(schema)]
+            writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
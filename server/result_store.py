@@ -0,0 +1,369 @@
+"""
+Server-side cursors over large structured results.
+
+A structured answer renders the first few rows ("Found N results. First few: ..."). When a
+result has more rows than RESULT_STORE_THRESHOLD, the rows are spooled, while the cursor
+that produced the answer is read, into a SQLite file shared by every worker (WAL mode),
+one table per result, and the answer carries the result's id. /api/results/<id> then pages
+and sorts those rows from disk without querying the warehouse again.
+
+Spooling keeps memory flat: rows are buffered only until the threshold is passed and then
+written batch by batch, up to RESULT_STORE_MAX_ROWS. A result expires RESULT_STORE_TTL
+seconds after it was last read; expired results, and the oldest ones beyond
+RESULT_STORE_MAX_RESULTS, are dropped whenever a new result is spooled. A repeated
+statement only reuses a spooled result created within the SQL cache TTL of its tables,
+however often it is read, so the store never serves rows the cache would have refreshed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+from config import (RESULT_STORE_ENABLED, RESULT_STORE_PATH, RESULT_STORE_THRESHOLD, RESULT_STORE_TTL,
+                    RESULT_STORE_MAX_ROWS, RESULT_STORE_MAX_RESULTS)
+from query_result import Column, json_value
+from result_cache import get_sql_cache, normalize_sql, referenced_tables
+
+
+def _table(result_id: str) -> str:
+    # Ids are generated here (uuid4 hex), never taken from a request unchecked; see _valid_id
+    return f"rows_{result_id}"
+
+
+def _valid_id(result_id: str) -> bool:
+    return len(result_id) == 32 and all(c in '0123456789abcdef' for c in result_id)
+
+
+class ResultSpill:
+    """
+    Receives the batches of one cursor. Rows stay in memory until the result passes the
+    threshold; from then on every batch goes straight to the result's table.
+    """
+
+    def __init__(self, store: "ResultStore", sql: str):
+        self.store = store
+        self.sql = sql
+        self.threshold = store.threshold
+        self.result_id: Optional[str] = None
+        self.stored_rows = 0
+        self._pending = []
+        self._width = None
+
+    def add(self, batch: list) -> bool:
+        """Takes one batch of row tuples; returns False once no more rows will be stored"""
+        if not batch:
+            return True
+        if self._width is None:
+            self._width = len(batch[0])
+        if self.result_id is None:
+            self._pending.extend(batch)
+            if len(self._pending) <= self.threshold:
+                return True
+            self.result_id = self.store._create(self.sql, self._width)
+            if self.result_id is None:
+                self._pending = []
+                return False
+            batch, self._pending = self._pending, []
+        room = self.store.max_rows - self.stored_rows
+        if room <= 0:
+            return False
+        self.stored_rows += self.store._append(self.result_id, batch[:room], self.stored_rows)
+        return self.stored_rows < self.store.max_rows
+
+    def close(self, columns: tuple, total_rows: int) -> Optional[str]:
+        """Publishes the spooled result; returns its id, or None when it stayed under the threshold"""
+        self._pending = []
+        if self.result_id is None:
+            return None
+        if not self.store._publish(self.result_id, columns, total_rows, self.stored_rows):
+            return None
+        print(f"📦 Spooled {self.stored_rows} of {total_rows} rows as result {self.result_id}")
+        return self.result_id
+
+    def discard(self):
+        """Drops whatever was spooled (the query failed part way)"""
+        self._pending = []
+        if self.result_id is not None:
+            self.store._drop(self.result_id)
+            self.result_id = None
+
+
+class ResultStore:
+    """SQLite-backed store of spooled results with per-process counters"""
+
+    def __init__(self, path: str = RESULT_STORE_PATH, threshold: int = RESULT_STORE_THRESHOLD,
+                 ttl: float = RESULT_STORE_TTL, max_rows: int = RESULT_STORE_MAX_ROWS,
+                 max_results: int = RESULT_STORE_MAX_RESULTS, enabled: bool = RESULT_STORE_ENABLED):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.max_results = max_results
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'spooled': 0, 'spooled_rows': 0, 'reused': 0, 'pages': 0, 'page_rows': 0,
+                       'misses': 0, 'evicted': 0, 'errors': 0}
+        if self.enabled:
+            try:
+                self._init_schema()
+            except sqlite3.Error as e:
+                print(f"⚠️  Result store disabled: {e}")
+                self.enabled = False
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets worker processes read while one writes
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.db = db
+        return db
+
+    def _init_schema(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = self._db()
+        # Pages of dropped results go back to the file on incremental_vacuum (only settable while empty)
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                result_id TEXT PRIMARY KEY,
+                sql_key TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                columns TEXT,
+                total_rows INTEGER,
+                stored_rows INTEGER,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                ready INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS results_sql_key ON results (sql_key, ready)")
+        db.commit()
+
+    def _bump(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def spill(self, sql: str) -> ResultSpill:
+        """A sink for the rows of sql (see ResultSpill)"""
+        return ResultSpill(self, sql)
+
+    def find(self, sql: str, since: Optional[float] = None) -> Optional[str]:
+        """
+        Id of a spooled result of the same statement that is still as fresh as a cached result
+        of it would be (spooled within the SQL cache TTL of its tables) and, with since, was
+        spooled no earlier than that; None otherwise. Reuse does not extend the result's life.
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        oldest = now - get_sql_cache().ttl_for(sql)
+        if since is not None:
+            oldest = max(oldest, since)
+        try:
+            row = self._db().execute("""
+                SELECT result_id FROM results
+                WHERE sql_key = ? AND ready = 1 AND expires_at > ? AND created_at >= ?
+                ORDER BY created_at DESC LIMIT 1
+            """, (normalize_sql(sql), now, oldest)).fetchone()
+            if row is None:
+                return None
+        except sqlite3.Error as e:
+            print(f"⚠️  Result store read failed: {e}")
+            self._bump('errors')
+            return None
+        self._bump('reused')
+        return row[0]
+
+    def _create(self, sql: str, width: int) -> Optional[str]:
+        if not self.enabled:
+            return None
+        result_id = uuid.uuid4().hex
+        try:
+            self.evict()
+            db = self._db()
+            now = time.time()
+            # Registered before it is filled, so an abandoned spill still expires
+            db.execute("INSERT INTO results (result_id, sql_key, sql, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                       (result_id, normalize_sql(sql), sql, now, now + self.ttl))
+            column_defs = ', '.join(f"c{i}" for i in range(width))
+            db.execute(f"CREATE TABLE {_table(result_id)} (row_number INTEGER PRIMARY KEY, {column_defs})")
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Result store write failed: {e}")
+            self._bump('errors')
+            return None
+        return result_id
+
+    def _append(self, result_id: str, rows: list, offset: int) -> int:
+        width = len(rows[0]) if rows else 0
+        placeholders = ', '.join('?' * (width + 1))
+        try:
+            db = self._db()
+            db.executemany(f"INSERT INTO {_table(result_id)} VALUES ({placeholders})",
+                           ((offset + i + 1, *map(json_value, row)) for i, row in enumerate(rows)))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Result store write failed: {e}")
+            self._bump('errors')
+            return 0
+        return len(rows)
+
+    def _publish(self, result_id: str, columns: tuple, total_rows: int, stored_rows: int) -> bool:
+        try:
+            db = self._db()
+            db.execute("""
+                UPDATE results SET columns = ?, total_rows = ?, stored_rows = ?, expires_at = ?, ready = 1
+                WHERE result_id = ?
+            """, (json.dumps([list(column) for column in columns]), total_rows, stored_rows,
+                  time.time() + self.ttl, result_id))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Result store write failed: {e}")
+            self._bump('errors')
+            return False
+        with self._lock:
+            self._stats['spooled'] += 1
+            self._stats['spooled_rows'] += stored_rows
+        return True
+
+    def _drop(self, result_id: str):
+        try:
+            db = self._db()
+            db.execute(f"DROP TABLE IF EXISTS {_table(result_id)}")
+            db.execute("DELETE FROM results WHERE result_id = ?", (result_id,))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Result store cleanup failed: {e}")
+            self._bump('errors')
+
+    def describe(self, result_id: str) -> Optional[dict]:
+        """sql, columns, total_rows and stored_rows of a spooled result; None when it does not exist or has expired"""
+        if not (self.enabled and _valid_id(result_id)):
+            return None
+        row = self._db().execute("""
+            SELECT sql, columns, total_rows, stored_rows FROM results
+            WHERE result_id = ? AND ready = 1 AND expires_at > ?
+        """, (result_id, time.time())).fetchone()
+        if row is None:
+            self._bump('misses')
+            return None
+        sql, columns, total_rows, stored_rows = row
+        return {'sql': sql, 'columns': tuple(Column(*column) for column in json.loads(columns)),
+                'total_rows': total_rows, 'stored_rows': stored_rows}
+
+    def _touch(self, result_id: str):
+        db = self._db()
+        db.execute("UPDATE results SET expires_at = ? WHERE result_id = ?", (time.time() + self.ttl, result_id))
+        db.commit()
+
+    def page(self, result_id: str, offset: int, limit: int, sort: Optional[str] = None,
+             descending: bool = False) -> Optional[dict]:
+        """
+        Rows offset..offset+limit of a spooled result, optionally ordered by the column named
+        sort; None when the result does not exist or has expired. Raises ValueError for an
+        unknown sort column.
+        """
+        result = self.describe(result_id)
+        if result is None:
+            return None
+        db = self._db()
+        table = _table(result_id)
+        if sort is None:
+            # row_number is the rowid, so a page is a range read however deep it is
+            rows = db.execute(f"SELECT * FROM {table} WHERE row_number > ? ORDER BY row_number LIMIT ?",
+                              (offset, limit)).fetchall()
+        else:
+            names = [column.name for column in result['columns']]
+            if sort not in names:
+                raise ValueError(f"Unknown sort column: {sort}")
+            column = f"c{names.index(sort)}"
+            # Indexed on first use, so later pages in this order don't sort the whole result again
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column}, row_number)")
+            direction = 'DESC' if descending else 'ASC'
+            rows = db.execute(f"SELECT * FROM {table} ORDER BY {column} {direction}, row_number {direction} "
+                              f"LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        self._touch(result_id)
+        with self._lock:
+            self._stats['pages'] += 1
+            self._stats['page_rows'] += len(rows)
+        result['rows'] = [row[1:] for row in rows]
+        return result
+
+    def iter_rows(self, result_id: str, batch_size: int):
+        """Yields the stored rows of a result in order, batch_size rows at a time"""
+        table = _table(result_id)
+        last = 0
+        while True:
+            rows = self._db().execute(f"SELECT * FROM {table} WHERE row_number > ? ORDER BY row_number LIMIT ?",
+                                      (last, batch_size)).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            yield [row[1:] for row in rows]
+        self._touch(result_id)
+
+    def evict(self) -> int:
+        """Drops expired results and the oldest ones beyond max_results; returns how many were dropped"""
+        if not self.enabled:
+            return 0
+        db = self._db()
+        expired = [row[0] for row in db.execute("SELECT result_id FROM results WHERE expires_at <= ?",
+                                                 (time.time(),))]
+        expired += [row[0] for row in db.execute("""
+            SELECT result_id FROM results WHERE expires_at > ? ORDER BY created_at DESC LIMIT -1 OFFSET ?
+        """, (time.time(), max(0, self.max_results - 1)))]
+        for result_id in expired:
+            self._drop(result_id)
+        if expired:
+            db.execute("PRAGMA incremental_vacuum")
+            self._bump('evicted', len(expired))
+            print(f"🧹 Evicted {len(expired)} spooled results")
+        return len(expired)
+
+    def clear(self, tables: Optional[Iterable[str]] = None) -> int:
+        """Drops the spooled results reading any of tables (all of them when None); returns how many"""
+        if not self.enabled:
+            return 0
+        wanted = None if tables is None else {table.upper() for table in tables}
+        result_ids = [result_id for result_id, sql in self._db().execute("SELECT result_id, sql FROM results")
+                      if wanted is None or referenced_tables(sql) & wanted]
+        for result_id in result_ids:
+            self._drop(result_id)
+        self._db().execute("PRAGMA incremental_vacuum")
+        return len(result_ids)
+
+    def stats(self) -> dict:
+        """Spooled results and pages served by this process, plus the shared result count and file size"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['threshold'] = self.threshold
+        if self.enabled:
+            try:
+                stats['results'] = self._db().execute(
+                    "SELECT COUNT(*) FROM results WHERE ready = 1 AND expires_at > ?", (time.time(),)).fetchone()[0]
+                stats['file_bytes'] = os.path.getsize(self.path)
+            except (sqlite3.Error, OSError):
+                stats['results'] = None
+        return stats
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Returns the process-wide result store, opening the SQLite file on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultStore()
+    return _store
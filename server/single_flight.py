@@ -0,0 +1,211 @@
+"""
+Coalescing of identical concurrent work ("single flight").
+
+When many users ask the same dashboard question at once, every request used to run its
+own nlq_to_sql, Snowflake query and summary LLM call. A SingleFlight group lets the first
+caller for a key (the leader) do the work while callers arriving with the same key before
+it finishes wait for, and share, its result or exception. Nothing is kept once the call
+completes: this only merges calls that overlap in time; the caches handle the rest.
+
+Threads (Flask / gunicorn) coalesce through do() and do_stream(). A leader interrupted
+before it finishes - a streaming client that disconnected - hands the work over: one of
+its followers claims the key again and runs it. A follower that waited
+SINGLE_FLIGHT_WAIT_TIMEOUT seconds runs the work itself, uncoalesced. Coroutines coalesce
+through do_async(), where the work runs in its own task so a cancelled caller does not
+cancel it for the others. Each stage has its own group and counters, reported by
+get_single_flight_stats().
+"""
+
+import asyncio
+import threading
+from typing import Optional
+
+from config import SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_WAIT_TIMEOUT
+
+# Pipeline stages with their own coalescing group
+STAGES = ('sql_generation', 'warehouse', 'summarization')
+
+
+class _Call:
+    """One in-flight call: followers block on `done` and then read result or error"""
+
+    __slots__ = ('done', 'result', 'error', 'abandoned')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # The leader stopped without a result; a follower has to run the work
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key; counts calls, executions and coalesced waits"""
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT_ENABLED,
+                 wait_timeout: float = SINGLE_FLIGHT_WAIT_TIMEOUT):
+        self.name = name
+        self.enabled = enabled
+        self.wait_timeout = wait_timeout
+        self._calls: dict = {}
+        self._tasks: dict = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'executed': 0, 'coalesced': 0, 'errors': 0, 'peak_waiters': 0,
+                       'takeovers': 0, 'wait_timeouts': 0}
+        self._waiters: dict = {}
+
+    def claim(self, key, takeover: bool = False) -> tuple[_Call, bool]:
+        """
+        Returns (call, True) if the caller should run the work for key, else (in-flight call, False);
+        takeover is a follower of an abandoned call claiming again, already counted as a call
+        """
+        with self._lock:
+            if not takeover:
+                self._stats['calls'] += 1
+            call = self._calls.get(key) if self.enabled else None
+            if call is not None:
+                self._stats['coalesced'] += not takeover
+                waiters = self._waiters[key] = self._waiters.get(key, 0) + 1
+                self._stats['peak_waiters'] = max(self._stats['peak_waiters'], waiters)
+                return call, False
+            call = _Call()
+            if self.enabled:
+                self._calls[key] = call
+            self._stats['executed'] += 1
+            return call, True
+
+    def finish(self, key, call: _Call, result=None, error: Optional[BaseException] = None):
+        """Publishes the leader's result (or exception) to the followers of key"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+                self._waiters.pop(key, None)
+            if error is not None:
+                self._stats['errors'] += 1
+        if error is not None and not isinstance(error, Exception):
+            # The leader was interrupted (e.g. a closed stream); a follower runs the work instead
+            call.abandoned = True
+            error = None
+        call.result, call.error = result, error
+        call.done.set()
+
+    def follow(self, key, call: _Call) -> tuple[_Call, bool]:
+        """
+        Waits for the leader of call. Returns (call, False) once it finished, or (call, True)
+        when the caller has to run the work: a new claim of key if the leader was abandoned,
+        or a call of its own, outside the group, if the wait timed out
+        """
+        while True:
+            if not call.done.wait(self.wait_timeout):
+                with self._lock:
+                    self._stats['wait_timeouts'] += 1
+                    self._stats['executed'] += 1
+                print(f"⚠️  Coalesced {self.name} call still running after {self.wait_timeout:.0f}s; running it again")
+                return _Call(), True
+            if not call.abandoned:
+                return call, False
+            with self._lock:
+                self._stats['takeovers'] += 1
+            call, leader = self.claim(key, takeover=True)
+            if leader:
+                return call, True
+
+    @staticmethod
+    def outcome(call: _Call):
+        """The result of a finished call, or raises its exception"""
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs), or waits for the identical call already running for key"""
+        call, leader = self.claim(key)
+        if not leader:
+            call, leader = self.follow(key, call)
+            if not leader:
+                return self.outcome(call)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def do_stream(self, key, fn, *args, **kwargs):
+        """
+        do() for a generator function that yields text tokens and returns the full text
+        (used as `text = yield from group.do_stream(...)`). Followers get the leader's
+        complete text as a single token once it finishes, or stream it themselves when it
+        was abandoned or is taking too long.
+        """
+        call, leader = self.claim(key)
+        if not leader:
+            call, leader = self.follow(key, call)
+            if not leader:
+                result = self.outcome(call)
+                if result:
+                    yield result
+                return result
+        try:
+            result = yield from fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Awaits fn(*args, **kwargs), or the identical call already running for key on this loop"""
+        if not self.enabled:
+            with self._lock:
+                self._stats['calls'] += 1
+                self._stats['executed'] += 1
+            return await fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            self._stats['calls'] += 1
+            task = self._tasks.get(flight_key)
+            if task is None:
+                task = loop.create_task(fn(*args, **kwargs))
+                self._tasks[flight_key] = task
+                task.add_done_callback(lambda done: self._task_done(flight_key, done))
+                self._stats['executed'] += 1
+            else:
+                self._stats['coalesced'] += 1
+                waiters = self._waiters[flight_key] = self._waiters.get(flight_key, 0) + 1
+                self._stats['peak_waiters'] = max(self._stats['peak_waiters'], waiters)
+        # shield: a caller that goes away must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def _task_done(self, flight_key, task: asyncio.Task):
+        with self._lock:
+            if self._tasks.get(flight_key) is task:
+                del self._tasks[flight_key]
+                self._waiters.pop(flight_key, None)
+            # Retrieving the exception also keeps asyncio from logging it when every caller left
+            if not task.cancelled() and task.exception() is not None:
+                self._stats['errors'] += 1
+
+    def stats(self) -> dict:
+        """Calls made, calls actually executed and calls served by another caller's execution"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls) + len(self._tasks)
+        stats['coalesce_rate'] = round(stats['coalesced'] / stats['calls'], 4) if stats['calls'] else 0.0
+        stats['enabled'] = self.enabled
+        return stats
+
+
+_groups = {stage: SingleFlight(stage) for stage in STAGES}
+
+
+def get_single_flight(stage: str) -> SingleFlight:
+    """Returns the process-wide coalescing group for a pipeline stage (see STAGES)"""
+    return _groups[stage]
+
+
+def get_single_flight_stats() -> dict:
+    """Coalescing counters of every pipeline stage"""
+    return {stage: group.stats() for stage, group in _groups.items()}
@@ -0,0 +1,294 @@
+"""
+asyncio-friendly Snowflake execution on top of snowflake_connector.
+
+Queries are submitted with the connector's execute_async(), which returns as soon as
+Snowflake has accepted the statement and assigned it a query id. Completion is then
+awaited by polling the query status with backoff, so no thread is parked on the
+warehouse runtime: worker threads are only borrowed for the short submit, poll and
+fetch calls. A per-event-loop semaphore caps how many statements run concurrently,
+and cancelling the awaiting task (e.g. on client disconnect) cancels the query in
+Snowflake as well.
+"""
+
+import asyncio
+import re
+import weakref
+from typing import Optional
+
+from config import (SNOWFLAKE_ASYNC_MAX_CONCURRENCY, SNOWFLAKE_ASYNC_POLL_INTERVAL,
+                    SNOWFLAKE_ASYNC_MAX_POLL_INTERVAL, SNOWFLAKE_FETCH_BATCH_SIZE,
+                    SNOWFLAKE_FETCH_MAX_BYTES)
+from result_cache import get_sql_cache
+from result_store import get_result_store
+from snowflake_connector import (get_pool, _iter_cursor_batches, _capped_batches, _read_preview,
+                                 _estimate_row_bytes)
+
+# Snowflake query ids are UUIDs; anything else is never interpolated into SQL
+_QUERY_ID_PATTERN = re.compile(r'^[0-9a-fA-F-]{36}$')
+
+# asyncio.Semaphore binds to the loop it is first used on, so keep one per loop
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, SNOWFLAKE_ASYNC_MAX_CONCURRENCY))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def _cancel_query(conn, query_id: str):
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT SYSTEM$CANCEL_QUERY('{query_id}')")
+    finally:
+        cur.close()
+
+
+def _when_done(future: asyncio.Future, cleanup, *args):
+    """Runs cleanup(future, *args) on a worker thread once future completes; for work a cancelled caller left running"""
+    future.add_done_callback(lambda done: done.get_loop().run_in_executor(None, cleanup, done, *args))
+
+
+def _release_acquired(acquiring: asyncio.Future):
+    """Hands back the connection a cancelled submit_sql() was still acquiring"""
+    if not acquiring.cancelled() and acquiring.exception() is None:
+        get_pool().release(acquiring.result())
+
+
+def _abandon_submission(submitting: asyncio.Future, pooled):
+    """Cancels the statement a cancelled submit_sql() was still submitting, then releases its connection"""
+    query_id = None
+    if not submitting.cancelled() and submitting.exception() is None:
+        query_id = submitting.result()
+    try:
+        if query_id and _QUERY_ID_PATTERN.match(query_id):
+            _cancel_query(pooled.conn, query_id)
+            print(f"🛑 Cancelled Snowflake query {query_id}")
+    except Exception as e:
+        print(f"⚠️  Failed to cancel Snowflake query {query_id}: {e}")
+    get_pool().release(pooled)
+
+
+class AsyncQuery:
+    """Handle for a statement submitted to Snowflake with execute_async()"""
+
+    def __init__(self, pooled, query_id: str):
+        self._pooled = pooled
+        self.query_id = query_id
+        self._released = False
+
+    @property
+    def _conn(self):
+        return self._pooled.conn
+
+    async def is_running(self) -> bool:
+        """Polls Snowflake once; raises if the query has failed"""
+        def _poll():
+            status = self._conn.get_query_status_throw_if_error(self.query_id)
+            return self._conn.is_still_running(status)
+        return await asyncio.to_thread(_poll)
+
+    async def wait(self, poll_interval: float = SNOWFLAKE_ASYNC_POLL_INTERVAL,
+                   timeout: Optional[float] = None):
+        """Waits for completion, polling with exponential backoff up to SNOWFLAKE_ASYNC_MAX_POLL_INTERVAL"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        interval = poll_interval
+        while await self.is_running():
+            if deadline is not None and loop.time() >= deadline:
+                raise TimeoutError(f"Snowflake query {self.query_id} did not finish within {timeout}s")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, SNOWFLAKE_ASYNC_MAX_POLL_INTERVAL)
+
+    async def fetch(self, max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> list:
+        """Fetches the finished query's rows, honoring the same caps as iter_sql_batches()"""
+        def _fetch():
+            cur = self._conn.cursor()
+            try:
+                cur.get_results_from_sfqid(self.query_id)
+                rows = []
+                for batch in _capped_batches(_iter_cursor_batches(cur, SNOWFLAKE_FETCH_BATCH_SIZE),
+                                             max_rows, max_bytes):
+                    rows.extend(batch)
+                return rows
+            finally:
+                cur.close()
+        return await asyncio.to_thread(_fetch)
+
+    async def fetch_preview(self, max_rows: int, max_bytes: Optional[int] = None,
+                            sink=None) -> tuple[tuple, list, int]:
+        """Fetches (columns, first rows, total row count) like fetch_sql_result()"""
+        def _fetch():
+            cur = self._conn.cursor()
+            try:
+                cur.get_results_from_sfqid(self.query_id)
+                return _read_preview(cur, max_rows, max_bytes, sink)
+            finally:
+                cur.close()
+        return await asyncio.to_thread(_fetch)
+
+    async def cancel(self):
+        """Cancels the query in Snowflake; errors are logged, not raised"""
+        try:
+            await asyncio.to_thread(_cancel_query, self._conn, self.query_id)
+            print(f"🛑 Cancelled Snowflake query {self.query_id}")
+        except Exception as e:
+            print(f"⚠️  Failed to cancel Snowflake query {self.query_id}: {e}")
+
+    async def release(self, discard: bool = False):
+        """Returns the underlying connection to the pool"""
+        if not self._released:
+            self._released = True
+            await asyncio.to_thread(get_pool().release, self._pooled, discard)
+
+
+async def submit_sql(sql: str) -> AsyncQuery:
+    """
+    Submits SQL without waiting for it to run and returns its AsyncQuery handle.
+    The caller owns the handle and must release() it. The worker threads acquiring the
+    connection and submitting the statement finish even when the caller is cancelled, so
+    those steps are shielded and clean up after themselves once they return.
+    """
+    pool = get_pool()
+    acquiring = asyncio.ensure_future(asyncio.to_thread(pool.acquire))
+    try:
+        pooled = await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        _when_done(acquiring, _release_acquired)
+        raise
+
+    def _submit():
+        cur = pooled.conn.cursor()
+        try:
+            cur.execute_async(sql)
+            return cur.sfqid
+        finally:
+            cur.close()
+    submitting = asyncio.ensure_future(asyncio.to_thread(_submit))
+    try:
+        query_id = await asyncio.shield(submitting)
+    except asyncio.CancelledError:
+        _when_done(submitting, _abandon_submission, pooled)
+        raise
+    except BaseException as e:
+        await asyncio.to_thread(pool.release, pooled)
+        if isinstance(e, Exception):
+            raise RuntimeError(f"Snowflake execution error: {e}")
+        raise
+
+    if not query_id or not _QUERY_ID_PATTERN.match(query_id):
+        await asyncio.to_thread(pool.release, pooled)
+        raise RuntimeError(f"Snowflake execution error: unexpected query id {query_id!r}")
+    print(f"⏳ Submitted Snowflake query {query_id}")
+    return AsyncQuery(pooled, query_id)
+
+
+async def _run_query(sql: str, read, timeout: Optional[float]):
+    """Submits sql, waits for it and returns await read(query), cancelling it in Snowflake if abandoned"""
+    async with _get_semaphore():
+        query = await submit_sql(sql)
+        try:
+            await query.wait(timeout=timeout)
+            return await read(query)
+        except (asyncio.CancelledError, TimeoutError):
+            await asyncio.shield(query.cancel())
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Snowflake execution error: {e}")
+        finally:
+            await asyncio.shield(query.release())
+
+
+async def execute_sql_async(sql: str, max_rows: Optional[int] = None,
+                            max_bytes: Optional[int] = None,
+                            timeout: Optional[float] = None,
+                            use_cache: bool = True) -> list:
+    """
+    Async counterpart of execute_sql(). At most SNOWFLAKE_ASYNC_MAX_CONCURRENCY statements
+    run at once per event loop. If the awaiting task is cancelled or times out, the query
+    is cancelled in Snowflake too. Complete (uncapped) results share the SQL result cache
+    with execute_sql().
+    """
+    cacheable = use_cache and max_rows is None and max_bytes is None
+    cache = get_sql_cache()
+    if cacheable:
+        hit, cached = cache.get(sql)
+        if hit:
+            return list(cached)
+
+    rows = await _run_query(sql, lambda query: query.fetch(max_rows=max_rows, max_bytes=max_bytes), timeout)
+    if cacheable:
+        cache.put(sql, tuple(rows), sum(_estimate_row_bytes(row) for row in rows))
+    return rows
+
+
+async def fetch_sql_preview_async(sql: str, max_rows: int,
+                                  max_bytes: Optional[int] = SNOWFLAKE_FETCH_MAX_BYTES,
+                                  timeout: Optional[float] = None,
+                                  use_cache: bool = True) -> tuple[list, int]:
+    """Async counterpart of fetch_sql_preview(), sharing its cache entries"""
+    _, rows, total_rows = await fetch_sql_result_async(sql, max_rows, max_bytes, timeout, use_cache)
+    return rows, total_rows
+
+
+async def fetch_sql_result_async(sql: str, max_rows: int,
+                                 max_bytes: Optional[int] = SNOWFLAKE_FETCH_MAX_BYTES,
+                                 timeout: Optional[float] = None,
+                                 use_cache: bool = True, sink=None) -> tuple[tuple, list, int]:
+    """Async counterpart of fetch_sql_result(), sharing its cache entries"""
+    cache = get_sql_cache()
+    cache_variant = ('preview', max_rows, max_bytes)
+    if use_cache:
+        hit, cached = cache.get(sql, cache_variant)
+        if hit and (sink is None or cached[2] <= sink.threshold):
+            columns, rows, total_rows = cached
+            return columns, list(rows), total_rows
+
+    columns, rows, total_rows = await _run_query(sql, lambda query: query.fetch_preview(max_rows, max_bytes, sink),
+                                                 timeout)
+    if use_cache:
+        cache.put(sql, (columns, tuple(rows), total_rows), sum(_estimate_row_bytes(row) for row in rows),
+                  cache_variant)
+    return columns, rows, total_rows
+
+
+async def fetch_sql_spooled_async(sql: str, max_rows: int,
+                                  timeout: Optional[float] = None) -> tuple[tuple, list, int, Optional[str]]:
+    """Async counterpart of fetch_sql_spooled(), sharing its spooled results"""
+    store = get_result_store()
+    result_id = await asyncio.to_thread(store.find, sql) if store.enabled else None
+    if result_id is not None or not store.enabled:
+        return (*await fetch_sql_result_async(sql, max_rows, timeout=timeout), result_id)
+    spill = store.spill(sql)
+    try:
+        columns, rows, total_rows = await fetch_sql_result_async(sql, max_rows, timeout=timeout, sink=spill)
+    except BaseException:
+        await asyncio.shield(asyncio.to_thread(spill.discard))
+        raise
+    return columns, rows, total_rows, await asyncio.to_thread(spill.close, columns, total_rows)
+
+
+async def execute_many_async(statements: list[str], max_rows: Optional[int] = None,
+                             max_bytes: Optional[int] = None) -> list:
+    """
+    Runs several statements concurrently and returns their rows in input order.
+    If any statement fails, the others are cancelled and the first error is raised.
+    """
+    tasks = [asyncio.ensure_future(execute_sql_async(sql, max_rows=max_rows, max_bytes=max_bytes))
+             for sql in statements]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def execute_many(statements: list[str], max_rows: Optional[int] = None,
+                 max_bytes: Optional[int] = None) -> list:
+    """Blocking wrapper around execute_many_async() for synchronous (Flask) callers"""
+    return asyncio.run(execute_many_async(statements, max_rows=max_rows, max_bytes=max_bytes))
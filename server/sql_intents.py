@@ -0,0 +1,106 @@
+"""
+Rule-based fast path for the canned question shapes enumerated in the nlq_to_sql prompt.
+
+Each intent is compiled at import into token sets. A question matches an intent when,
+after dropping filler words and the year, every remaining word belongs to the intent's
+vocabulary and each of its required word groups is present. The vocabulary check keeps
+the matcher conservative: "total revenue from consulting in 2025" contains words outside
+the total-revenue vocabulary, so it falls through to the services intent or the LLM.
+"""
+
+import re
+import threading
+from typing import Optional
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Words that carry no meaning for intent selection
+FILLER_WORDS = frozenset({
+    'what', 'whats', 'was', 'is', 'are', 'were', 'the', 'a', 'an', 'me', 'show', 'give',
+    'get', 'tell', 'list', 'display', 'our', 'my', 'in', 'for', 'of', 'during', 'year',
+    'how', 'much', 'did', 'do', 'please', 's', 'this', 'calculate', 'find',
+})
+
+
+class SqlIntent:
+    """A canned question shape and the SQL it maps to ({year} is bound at match time)"""
+
+    __slots__ = ('name', 'required', 'vocabulary', 'sql_template')
+
+    def __init__(self, name: str, required: list, optional: set, sql_template: str):
+        self.name = name
+        self.required = tuple(frozenset(group) for group in required)
+        self.vocabulary = frozenset(optional).union(*self.required)
+        self.sql_template = sql_template
+
+    def matches(self, words: frozenset) -> bool:
+        return bool(words) and words <= self.vocabulary and all(words & group for group in self.required)
+
+    def sql(self, year: int) -> str:
+        return self.sql_template.format(year=year)
+
+
+_REVENUE = {'revenue', 'revenues'}
+_TOTAL = {'total', 'overall', 'sum', 'amount'}
+
+# Ordered from most to least specific; the first match wins
+SQL_INTENTS = [
+    SqlIntent('revenue_growth', [{'growth', 'grow', 'grew', 'trend', 'trends'}, _REVENUE],
+              {'by', 'over', 'years', 'yearly', 'annual'},
+              "SELECT YEAR(transaction_date) as year, SUM(amount) as revenue FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 GROUP BY YEAR(transaction_date) ORDER BY year"),
+    SqlIntent('revenue_by_category', [{'category', 'categories'}],
+              _REVENUE | {'by', 'per', 'breakdown', 'total', 'totals'},
+              "SELECT category, SUM(amount) as total FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 GROUP BY category ORDER BY total DESC, category"),
+    SqlIntent('services_revenue', [{'service', 'services', 'consulting'}],
+              _REVENUE | _TOTAL | {'from', 'sold', 'sales', 'generated', 'earned'},
+              "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 AND YEAR(transaction_date) = {year} AND (description ILIKE '%service%' OR description ILIKE '%consulting%')"),
+    SqlIntent('products_revenue', [{'product', 'products'}],
+              _REVENUE | _TOTAL | {'from', 'sold', 'sales', 'generated', 'earned'},
+              "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 AND YEAR(transaction_date) = {year} AND (description ILIKE '%product%' OR category ILIKE '%product%')"),
+    SqlIntent('investment_total', [{'investment', 'investments'}],
+              _TOTAL,
+              "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE category = 'Investment' AND YEAR(transaction_date) = {year}"),
+    SqlIntent('total_expenses', [{'expense', 'expenses', 'spending', 'spent'}],
+              _TOTAL,
+              "SELECT SUM(ABS(amount)) FROM FINANCIAL_TRANSACTIONS WHERE amount < 0 AND YEAR(transaction_date) = {year}"),
+    SqlIntent('total_revenue', [_REVENUE],
+              _TOTAL | {'generated', 'earned'},
+              "SELECT SUM(amount) FROM FINANCIAL_TRANSACTIONS WHERE amount > 0 AND YEAR(transaction_date) = {year}"),
+    SqlIntent('monthly_medical_costs', [{'monthly', 'month', 'months'}, {'cost', 'costs'}],
+              {'by', 'per', 'medical', 'treatment', 'total'},
+              "SELECT MONTH(visit_date) as month, SUM(treatment_cost) as monthly_cost FROM MEDICAL_RECORDS WHERE YEAR(visit_date) = {year} GROUP BY MONTH(visit_date) ORDER BY month"),
+    SqlIntent('patient_cost_summary', [{'patient', 'patients'}, {'cost', 'costs'}],
+              {'summary', 'total', 'per', 'by', 'treatment', 'medical'},
+              "SELECT patient_id, SUM(treatment_cost) as total_cost FROM MEDICAL_RECORDS WHERE YEAR(visit_date) = {year} GROUP BY patient_id ORDER BY total_cost DESC"),
+    SqlIntent('diagnosis_trends', [{'diagnosis', 'diagnoses'}],
+              {'trend', 'trends', 'count', 'counts', 'by', 'most', 'common'},
+              "SELECT diagnosis, COUNT(*) as count FROM MEDICAL_RECORDS WHERE YEAR(visit_date) = {year} GROUP BY diagnosis ORDER BY count DESC, diagnosis"),
+]
+
+_stats_lock = threading.Lock()
+_stats = {'matched': 0, 'unmatched': 0, 'by_intent': {}}
+
+
+def question_words(nlq: str) -> frozenset:
+    """Meaningful lower-case words of a question (filler words and numbers removed)"""
+    return frozenset(_WORD_PATTERN.findall(nlq.lower())) - FILLER_WORDS
+
+
+def match_sql_intent(nlq: str) -> Optional[SqlIntent]:
+    """Returns the canned intent for nlq, or None when the LLM should translate it"""
+    words = question_words(nlq)
+    intent = next((candidate for candidate in SQL_INTENTS if candidate.matches(words)), None)
+    with _stats_lock:
+        if intent is None:
+            _stats['unmatched'] += 1
+        else:
+            _stats['matched'] += 1
+            _stats['by_intent'][intent.name] = _stats['by_intent'].get(intent.name, 0) + 1
+    return intent
+
+
+def get_intent_stats() -> dict:
+    """How many questions were answered by the fast path, overall and per intent"""
+    with _stats_lock:
+        return {'matched': _stats['matched'], 'unmatched': _stats['unmatched'],
+                'by_intent': dict(_stats['by_intent'])}
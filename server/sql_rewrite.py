@@ -0,0 +1,514 @@
+"""
+Rewrites date-part filters into range predicates that Snowflake can prune on.
+
+Snowflake skips micro-partitions whose min/max metadata for a column cannot satisfy a
+predicate on that column, but not when the column is wrapped in a function:
+YEAR(transaction_date) = 2025 scans every partition of the table. rewrite_date_predicates()
+turns such filters into half-open ranges on the raw column:
+
+    YEAR(d) = 2025                     ->  d >= '2025-01-01' AND d < '2026-01-01'
+    YEAR(d) = 2025 AND MONTH(d) = 3    ->  d >= '2025-03-01' AND d < '2025-04-01'
+    YEAR(d) = 2025 AND QUARTER(d) = 2  ->  d >= '2025-04-01' AND d < '2025-07-01'
+    YEAR(d) IN (2023, 2024), YEAR(d) BETWEEN ..., YEAR(d) >= 2024, ...
+
+Each SELECT's WHERE clause (including subqueries and CTEs) is parsed into a boolean
+expression tree of AND / OR / NOT / parenthesized groups over predicate leaves, so a
+rewrite only replaces a whole comparison and keeps its place in the expression. Date-part
+functions elsewhere (SELECT lists, GROUP BY MONTH(d), HAVING) are left as they are.
+add_year_guard() uses the same tree to add the year filter nlq_to_sql injects.
+"""
+
+import re
+from typing import Optional
+
+_TOKEN_PATTERN = re.compile(r"""
+    '(?:[^']|'')*'            # string literal
+  | "(?:[^"]|"")*"            # quoted identifier
+  | ::|<=|>=|<>|!=            # multi-character operators
+  | [A-Za-z_][A-Za-z0-9_$]*   # identifier / keyword
+  | \d+(?:\.\d+)?             # number
+  | \s+                       # whitespace
+  | .                         # any other single character
+""", re.VERBOSE | re.DOTALL)
+
+# Depth-0 keywords that end a WHERE clause
+_WHERE_TERMINATORS = frozenset({'GROUP', 'HAVING', 'QUALIFY', 'WINDOW', 'ORDER', 'LIMIT', 'OFFSET',
+                                'FETCH', 'UNION', 'EXCEPT', 'INTERSECT', 'MINUS'})
+_SET_OPERATORS = frozenset({'UNION', 'EXCEPT', 'INTERSECT', 'MINUS'})
+_DATE_PARTS = frozenset({'YEAR', 'MONTH', 'QUARTER'})
+_FLIPPED = {'=': '=', '<>': '<>', '!=': '!=', '<': '>', '>': '<', '<=': '>=', '>=': '<='}
+
+
+def tokenize(sql: str) -> list:
+    return _TOKEN_PATTERN.findall(sql)
+
+
+def _significant(tokens: list) -> list:
+    return [i for i, token in enumerate(tokens) if token.strip()]
+
+
+def _matching_close(tokens: list, open_index: int) -> int:
+    depth = 0
+    for i in range(open_index, len(tokens)):
+        if tokens[i] == '(':
+            depth += 1
+        elif tokens[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _opens_query(tokens: list, open_index: int) -> bool:
+    for i in range(open_index + 1, len(tokens)):
+        if tokens[i].strip():
+            return tokens[i].upper() in ('SELECT', 'WITH')
+    return False
+
+
+# --- Boolean expression tree ---
+
+class Predicate:
+    """A leaf comparison, kept as its original tokens"""
+
+    __slots__ = ('tokens',)
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+
+    def render(self) -> str:
+        return ''.join(self.tokens).strip()
+
+
+class BoolOp:
+    __slots__ = ('op', 'operands')
+
+    def __init__(self, op: str, operands: list):
+        self.op = op
+        self.operands = operands
+
+    def render(self) -> str:
+        return f" {self.op} ".join(operand.render() for operand in self.operands)
+
+
+class Not:
+    __slots__ = ('operand',)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def render(self) -> str:
+        return f"NOT {self.operand.render()}"
+
+
+class Group:
+    __slots__ = ('inner',)
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def render(self) -> str:
+        return f"({self.inner.render()})"
+
+
+def _split_top(tokens: list, keyword: str) -> list:
+    """Splits tokens at depth-0 occurrences of keyword (skipping BETWEEN ... AND and CASE ... END)"""
+    parts, start, depth, case_depth, pending_between = [], 0, 0, 0, 0
+    for i, token in enumerate(tokens):
+        upper = token.upper()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            if upper == 'CASE':
+                case_depth += 1
+            elif upper == 'END' and case_depth:
+                case_depth -= 1
+            elif upper == 'BETWEEN' and not case_depth:
+                pending_between += 1
+            elif upper == keyword and not case_depth:
+                if keyword == 'AND' and pending_between:
+                    pending_between -= 1
+                    continue
+                parts.append(tokens[start:i])
+                start = i + 1
+    parts.append(tokens[start:])
+    return parts
+
+
+def parse_condition(tokens: list):
+    """Parses the tokens of a WHERE condition into a Predicate / BoolOp / Not / Group tree"""
+    for keyword in ('OR', 'AND'):
+        parts = _split_top(tokens, keyword)
+        if len(parts) > 1:
+            return BoolOp(keyword, [parse_condition(part) for part in parts])
+    significant = _significant(tokens)
+    if significant:
+        first, last = significant[0], significant[-1]
+        if tokens[first].upper() == 'NOT':
+            return Not(parse_condition(tokens[first + 1:]))
+        if (tokens[first] == '(' and _matching_close(tokens, first) == last
+                and not _opens_query(tokens, first)):
+            return Group(parse_condition(tokens[first + 1:last]))
+    return Predicate(tokens)
+
+
+# --- Date-part predicate rewriting ---
+
+def _literal_int(token: str) -> Optional[int]:
+    text = token[1:-1] if len(token) >= 2 and token[0] == token[-1] == "'" else token
+    return int(text) if text.isdigit() else None
+
+
+def _match_date_part(predicate: Predicate):
+    """(part, column, operator, values) for YEAR/MONTH/QUARTER(column) <op> literal(s), else None"""
+    tokens = [predicate.tokens[i] for i in _significant(predicate.tokens)]
+    if len(tokens) < 6:
+        return None
+    flipped = False
+    if tokens[0].upper() not in _DATE_PARTS and len(tokens) >= 6 and tokens[1] in _FLIPPED:
+        # literal <op> YEAR(column)
+        tokens = tokens[2:] + [_FLIPPED[tokens[1]], tokens[0]]
+        flipped = True
+    part = tokens[0].upper()
+    if part not in _DATE_PARTS or tokens[1] != '(':
+        return None
+    try:
+        close = tokens.index(')')
+    except ValueError:
+        return None
+    column = tokens[2:close]
+    # Only plain (optionally qualified) column references can be pruned on
+    if not column or any(not (re.fullmatch(r'[A-Za-z_][A-Za-z0-9_$]*|"[^"]*"', token) or token == '.')
+                         for token in column):
+        return None
+    column = ''.join(column)
+    rest = tokens[close + 1:]
+    if len(rest) == 2 and rest[0] in _FLIPPED:
+        value = _literal_int(rest[1])
+        return (part, column, rest[0], [value]) if value is not None else None
+    if flipped:
+        return None
+    if len(rest) >= 4 and rest[0].upper() == 'IN' and rest[1] == '(' and rest[-1] == ')':
+        values = [_literal_int(token) for token in rest[2:-1:2]]
+        if all(value is not None for value in values) and all(token == ',' for token in rest[3:-1:2]):
+            return part, column, 'IN', values
+        return None
+    if len(rest) == 4 and rest[0].upper() == 'BETWEEN' and rest[2].upper() == 'AND':
+        low, high = _literal_int(rest[1]), _literal_int(rest[3])
+        if low is not None and high is not None:
+            return part, column, 'BETWEEN', [low, high]
+    return None
+
+
+def _date(year: int, month: int = 1) -> str:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return f"'{year:04d}-{month:02d}-01'"
+
+
+def _range(column: str, start: Optional[str], end: Optional[str]):
+    """column >= start AND column < end (either bound may be open)"""
+    bounds = []
+    if start is not None:
+        bounds.append(Predicate([f"{column} >= {start}"]))
+    if end is not None:
+        bounds.append(Predicate([f"{column} < {end}"]))
+    return bounds[0] if len(bounds) == 1 else BoolOp('AND', bounds)
+
+
+def _year_range(column: str, op: str, values: list):
+    """Range predicate equivalent to YEAR(column) <op> values, or None if not expressible"""
+    if any(not 1 <= value < 9999 for value in values):
+        return None
+    if op == '=':
+        return _range(column, _date(values[0]), _date(values[0] + 1))
+    if op in ('>=', '>'):
+        return _range(column, _date(values[0] + (op == '>')), None)
+    if op in ('<', '<='):
+        return _range(column, None, _date(values[0] + (op == '<=')))
+    if op in ('<>', '!='):
+        return BoolOp('OR', [_range(column, None, _date(values[0])),
+                             _range(column, _date(values[0] + 1), None)])
+    if op == 'BETWEEN':
+        low, high = values
+        return _range(column, _date(low), _date(high + 1)) if low <= high else None
+    if op == 'IN':
+        # Consecutive years share one range
+        runs = []
+        for year in sorted(set(values)):
+            if runs and runs[-1][1] == year - 1:
+                runs[-1][1] = year
+            else:
+                runs.append([year, year])
+        ranges = [_range(column, _date(low), _date(high + 1)) for low, high in runs]
+        return ranges[0] if len(ranges) == 1 else BoolOp('OR', [Group(r) for r in ranges])
+    return None
+
+
+def _wrap(node, parent_op: Optional[str]):
+    """Parenthesizes a replacement unless it merges cleanly into its parent operator"""
+    if isinstance(node, BoolOp) and node.op != parent_op:
+        return Group(node)
+    return node
+
+
+class _Rewriter:
+    def __init__(self):
+        self.changed = False
+
+    def node(self, node, parent_op: Optional[str] = None):
+        if isinstance(node, BoolOp):
+            operands = [self.node(operand, node.op) for operand in node.operands]
+            if node.op == 'AND':
+                operands = self._combine_periods(operands)
+            # Flatten replacements that are themselves conjunctions/disjunctions of the same kind
+            flat = []
+            for operand in operands:
+                flat.extend(operand.operands if isinstance(operand, BoolOp) and operand.op == node.op
+                            else [operand])
+            return BoolOp(node.op, flat)
+        if isinstance(node, Not):
+            return Not(_wrap(self.node(node.operand), None))
+        if isinstance(node, Group):
+            return Group(self.node(node.inner))
+        replacement = self._leaf(node)
+        return _wrap(replacement, parent_op) if replacement is not node else node
+
+    def _leaf(self, predicate: Predicate):
+        tokens, changed = rewrite_subqueries(predicate.tokens)
+        if changed:
+            self.changed = True
+            predicate = Predicate(tokens)
+        match = _match_date_part(predicate)
+        if match is None or match[0] != 'YEAR':
+            return predicate
+        replacement = _year_range(match[1], match[2], match[3])
+        if replacement is None:
+            return predicate
+        self.changed = True
+        return replacement
+
+    def _combine_periods(self, operands: list) -> list:
+        """YEAR(c) = y AND MONTH(c) = m (or QUARTER(c) = q) -> one month (quarter) range on c"""
+        matches = [_match_date_part(operand) if isinstance(operand, Predicate) else None
+                   for operand in operands]
+        result, used = list(operands), set()
+        for i, match in enumerate(matches):
+            if match is None or match[0] == 'YEAR' or match[2] != '=':
+                continue
+            part, column, _, (value,) = match
+            months = 1 if part == 'MONTH' else 3
+            if not 1 <= value <= 12 // months:
+                continue
+            for j, other in enumerate(operands):
+                # The YEAR leaf was already replaced by a year range; find it by its bounds
+                year = _year_of_range(other, column)
+                if year is not None and j not in used:
+                    start_month = (value - 1) * months + 1
+                    result[j] = _range(column, _date(year, start_month), _date(year, start_month + months))
+                    result[i] = None
+                    used.add(j)
+                    self.changed = True
+                    break
+        return [operand for operand in result if operand is not None]
+
+
+def _year_of_range(node, column: str) -> Optional[int]:
+    """The year y if node is exactly column >= 'y-01-01' AND column < 'y+1-01-01'"""
+    if isinstance(node, Group):
+        node = node.inner
+    if not (isinstance(node, BoolOp) and node.op == 'AND' and len(node.operands) == 2):
+        return None
+    low, high = (operand.render() if isinstance(operand, Predicate) else '' for operand in node.operands)
+    match = re.fullmatch(re.escape(column) + r" >= '(\d{4})-01-01'", low)
+    if match and high == f"{column} < {_date(int(match.group(1)) + 1)}":
+        return int(match.group(1))
+    return None
+
+
+def _where_spans(tokens: list) -> list:
+    """(start, end) token spans of every depth-0 WHERE condition in a statement"""
+    spans, depth, start = [], 0, None
+    for i, token in enumerate(tokens):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            upper = token.upper()
+            if upper == 'WHERE':
+                start = i + 1
+            elif start is not None and (upper in _WHERE_TERMINATORS or token == ';'):
+                spans.append((start, i))
+                start = None
+    if start is not None:
+        spans.append((start, len(tokens)))
+    return spans
+
+
+def rewrite_subqueries(tokens: list) -> tuple[list, bool]:
+    """Rewrites every parenthesized SELECT / WITH query within tokens"""
+    result, changed, i = [], False, 0
+    while i < len(tokens):
+        if tokens[i] == '(' and _opens_query(tokens, i):
+            close = _matching_close(tokens, i)
+            inner, inner_changed = _rewrite_statement(tokens[i + 1:close])
+            result.extend(['('] + inner + [')'])
+            changed |= inner_changed
+            i = close + 1
+        else:
+            result.append(tokens[i])
+            i += 1
+    return result, changed
+
+
+def _rewrite_statement(tokens: list) -> tuple[list, bool]:
+    result, changed, position = [], False, 0
+    for start, end in _where_spans(tokens):
+        outside, outside_changed = rewrite_subqueries(tokens[position:start])
+        result.extend(outside)
+        changed |= outside_changed
+
+        span = tokens[start:end]
+        significant = _significant(span)
+        rewriter = _Rewriter()
+        # A WHERE clause is a conjunction: a range replacing a lone predicate needs no parentheses
+        tree = rewriter.node(parse_condition(span), 'AND') if significant else None
+        if rewriter.changed:
+            leading = ''.join(span[:significant[0]])
+            trailing = ''.join(span[significant[-1] + 1:])
+            result.extend(tokenize(f"{leading}{tree.render()}{trailing}"))
+            changed = True
+        else:
+            result.extend(span)
+        position = end
+    outside, outside_changed = rewrite_subqueries(tokens[position:])
+    result.extend(outside)
+    return result, changed or outside_changed
+
+
+def rewrite_date_tokens(tokens: list) -> list:
+    """rewrite_date_predicates() over an already tokenized statement; returns the new tokens"""
+    try:
+        rewritten, changed = _rewrite_statement(tokens)
+    except ValueError:
+        return tokens
+    return rewritten if changed else tokens
+
+
+def rewrite_date_predicates(sql: str) -> str:
+    """
+    Returns sql with YEAR()/MONTH()/QUARTER() filters in WHERE clauses rewritten into range
+    predicates on the underlying date columns; sql is returned unchanged if nothing applies
+    or it cannot be parsed.
+    """
+    tokens = tokenize(sql)
+    rewritten = rewrite_date_tokens(tokens)
+    return ''.join(rewritten) if rewritten is not tokens else sql
+
+
+# --- Year guard injection ---
+
+def _from_references(tokens: list, table: str) -> bool:
+    """Whether the depth-0 FROM clause of a statement names table directly"""
+    depth, in_from = 0, False
+    for token in tokens:
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            upper = token.upper()
+            if upper == 'FROM':
+                in_from = True
+            elif upper == 'WHERE' or upper in _WHERE_TERMINATORS:
+                in_from = False
+            elif in_from and upper == table.upper():
+                return True
+    return False
+
+
+def _add_condition(tokens: list, condition) -> list:
+    """Adds condition to the statement's depth-0 WHERE clause, creating one if needed"""
+    spans = _where_spans(tokens)
+    if spans:
+        start, end = spans[0]
+        span = tokens[start:end]
+        significant = _significant(span)
+        existing = parse_condition(span)
+        if isinstance(existing, BoolOp) and existing.op == 'OR':
+            existing = Group(existing)
+        combined = BoolOp('AND', [condition, existing])
+        trailing = ''.join(span[significant[-1] + 1:]) if significant else ' '
+        return tokens[:start] + tokenize(f" {combined.render()}{trailing}") + tokens[end:]
+
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token.upper() in _WHERE_TERMINATORS:
+            return tokens[:i] + tokenize(f"WHERE {condition.render()} ") + tokens[i:]
+    while tokens and (not tokens[-1].strip() or tokens[-1] == ';'):
+        tokens = tokens[:-1]
+    return tokens + tokenize(f" WHERE {condition.render()}")
+
+
+def _set_branches(tokens: list) -> list:
+    """Splits a statement into the SELECTs its depth-0 set operators combine, each keeping the operator after it"""
+    branches, start, depth = [], 0, 0
+    for i, token in enumerate(tokens):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token.upper() in _SET_OPERATORS:
+            branches.append(tokens[start:i + 1])
+            start = i + 1
+    branches.append(tokens[start:])
+    return branches
+
+
+def _add_guard(tokens: list, table: str, condition) -> tuple[list, bool]:
+    """Adds condition to every SELECT, at any depth and in any set-operator branch, that selects FROM table directly"""
+    result, added, i = [], False, 0
+    while i < len(tokens):
+        if tokens[i] == '(' and _opens_query(tokens, i):
+            close = _matching_close(tokens, i)
+            inner, inner_added = _add_guard(tokens[i + 1:close], table, condition)
+            result.extend(['('] + inner + [')'])
+            added |= inner_added
+            i = close + 1
+        else:
+            result.append(tokens[i])
+            i += 1
+    guarded = []
+    for branch in _set_branches(result):
+        if _from_references(branch, table):
+            branch = _add_condition(branch, condition)
+            added = True
+        guarded.extend(branch)
+    return guarded, added
+
+
+def add_year_guard_tokens(tokens: list, table: str, column: str, year: int) -> list:
+    """add_year_guard() over an already tokenized statement; returns the new tokens"""
+    condition = _year_range(column, '=', [year])
+    while tokens and not tokens[0].strip():
+        tokens = tokens[1:]
+    guarded, added = _add_guard(tokens, table, condition)
+    if added:
+        return guarded
+    return [token for branch in _set_branches(guarded) for token in _add_condition(branch, condition)]
+
+
+def add_year_guard(sql: str, table: str, column: str, year: int) -> str:
+    """
+    Restricts every SELECT reading table to rows whose column falls in year, as a range
+    predicate ANDed onto its WHERE clause (around any existing OR); each branch of a UNION,
+    EXCEPT, INTERSECT or MINUS is guarded on its own. Falls back to the outermost statement's
+    branches when no SELECT names table in its FROM clause.
+    """
+    return ''.join(add_year_guard_tokens(tokenize(sql.strip()), table, column, year))
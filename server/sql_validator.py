@@ -0,0 +1,160 @@
+"""
+Single-pass validation of generated SQL.
+
+validate_sql() tokenizes a statement once (the sql_rewrite tokenizer, so string literals
+and quoted identifiers are single tokens) and walks the tokens once, checking the
+statement type, that no keyword outside a plain query appears as a word, that every
+table read in a FROM / JOIN clause is whitelisted - unqualified or qualified with the
+configured database and schema, and never through a table function other than FLATTEN,
+since IDENTIFIER('...'), RESULT_SCAN(...) or INFORMATION_SCHEMA functions name what they
+read in their arguments - and which year-guarded tables are read without any reference to
+their date column. Keywords are matched as whole tokens, so
+columns such as created_at or last_update and ILIKE '%update%' patterns pass.
+
+The SqlVerdict it returns keeps the tokens, so the date rewrite and the year guard in
+nlq_to_sql work on them without tokenizing the statement again.
+"""
+
+from typing import NamedTuple
+
+from config import SNOWFLAKE_DATABASE, SNOWFLAKE_SCHEMA
+from sql_rewrite import tokenize
+
+ALLOWED_STATEMENTS = frozenset({'SELECT', 'WITH'})
+ALLOWED_TABLES = frozenset({'FINANCIAL_TRANSACTIONS', 'FINANCIAL_REPORTS', 'MEDICAL_RECORDS', 'MEDICAL_REPORTS'})
+# Table functions allowed in a FROM / JOIN clause; FLATTEN unnests a column of a table read already
+ALLOWED_TABLE_FUNCTIONS = frozenset({'FLATTEN'})
+DANGEROUS_KEYWORDS = frozenset({'INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 'TRUNCATE',
+                                'EXEC', 'EXECUTE', 'MERGE', 'GRANT', 'REVOKE'})
+# Tables that must be restricted to a year, and the date column the restriction goes on
+YEAR_GUARDED_TABLES = {'FINANCIAL_TRANSACTIONS': 'transaction_date', 'MEDICAL_RECORDS': 'visit_date'}
+
+# Words that end a FROM list at their depth
+_FROM_LIST_END = frozenset({'WHERE', 'GROUP', 'HAVING', 'QUALIFY', 'WINDOW', 'ORDER', 'LIMIT', 'OFFSET',
+                            'FETCH', 'UNION', 'EXCEPT', 'INTERSECT', 'MINUS', 'ON', 'USING', 'SELECT'})
+# Words that may precede a parenthesis without making it a function call
+_NON_CALL_WORDS = frozenset({'IN', 'AS', 'FROM', 'JOIN', 'ON', 'AND', 'OR', 'NOT', 'EXISTS', 'WHERE',
+                             'SELECT', 'ALL', 'ANY', 'SOME', 'USING', 'WHEN', 'THEN', 'ELSE', 'BY',
+                             'HAVING', 'QUALIFY', 'CASE', 'IS', 'BETWEEN', 'LATERAL', 'TABLE', 'WITH',
+                             'UNION', 'EXCEPT', 'INTERSECT', 'MINUS', 'DISTINCT', 'RETURN'})
+# Words between FROM and the relation they introduce
+_RELATION_PREFIXES = frozenset({'LATERAL', 'TABLE', 'ONLY'})
+# Qualifiers a relation may carry: database.schema.name or schema.name
+_QUALIFIERS = (SNOWFLAKE_DATABASE.upper(), SNOWFLAKE_SCHEMA.upper())
+
+
+class SqlVerdict(NamedTuple):
+    is_valid: bool
+    error: str
+    statement_type: str
+    tables: frozenset
+    # YEAR_GUARDED_TABLES read by the statement that it never filters or groups by date
+    unguarded_tables: tuple
+    tokens: list
+
+
+def _is_word(token: str) -> bool:
+    return token[0].isalpha() or token[0] == '_'
+
+
+def _name(token: str) -> str:
+    return token[1:-1].replace('""', '"').upper() if token[0] == '"' else token.upper()
+
+
+def _reject(error: str, statement_type: str, tokens: list) -> SqlVerdict:
+    return SqlVerdict(False, f"SECURITY ERROR: {error}", statement_type, frozenset(), (), tokens)
+
+
+def validate_sql(sql: str) -> SqlVerdict:
+    """Checks statement type, keywords, tables and year guards of sql in one pass over its tokens"""
+    tokens = tokenize(sql.strip())
+    significant = [token for token in tokens if token.strip()]
+    statement_type = significant[0].upper() if significant else ''
+    if statement_type not in ALLOWED_STATEMENTS:
+        return _reject("Only SELECT queries are allowed", statement_type, tokens)
+
+    tables, cte_names, words = set(), set(), set()
+    # One entry per open parenthesis: 'call' for function arguments, 'query' or 'group' otherwise
+    parens = []
+    from_lists = set()  # depths with an open FROM list
+    expect_relation = False
+    qualifiers = []  # database / schema qualifiers of the relation being read
+    ended = False
+    for k, token in enumerate(significant):
+        following = significant[k + 1] if k + 1 < len(significant) else ''
+        if ended:
+            return _reject("Multiple statements are not allowed", statement_type, tokens)
+        if token == ';':
+            ended = True
+            continue
+        depth = len(parens)
+
+        if token == '(':
+            previous = significant[k - 1] if k else ''
+            if following.upper() in ('SELECT', 'WITH'):
+                parens.append('query')
+                expect_relation = False
+            elif previous and _is_word(previous) and previous.upper() not in _NON_CALL_WORDS:
+                parens.append('call')
+                expect_relation = False
+            else:
+                # A parenthesized join keeps expecting a relation inside
+                parens.append('group')
+            continue
+        if token == ')':
+            from_lists.discard(depth)
+            if parens:
+                parens.pop()
+            continue
+        if token == ',':
+            if depth in from_lists:
+                expect_relation = True
+            continue
+        if token == '.':
+            continue
+        if not (_is_word(token) or token[0] == '"'):
+            continue
+
+        upper = _name(token)
+        if token[0] != '"' and upper in DANGEROUS_KEYWORDS:
+            return _reject(f"{upper} operations are not allowed", statement_type, tokens)
+        if expect_relation:
+            if upper in _RELATION_PREFIXES:
+                continue
+            if following == '.':
+                qualifiers.append(upper)
+                continue
+            expect_relation = False
+            if qualifiers and tuple(qualifiers) != _QUALIFIERS[-len(qualifiers):]:
+                return _reject(f"{'.'.join(qualifiers + [upper])} is outside {'.'.join(_QUALIFIERS)}",
+                               statement_type, tokens)
+            qualifiers = []
+            if following == '(':
+                if upper not in ALLOWED_TABLE_FUNCTIONS:
+                    return _reject(f"Table function {upper} is not allowed", statement_type, tokens)
+                continue
+            tables.add(upper)
+            from_lists.add(depth)
+            continue
+        if upper in ('FROM', 'JOIN') and token[0] != '"':
+            # FROM inside a call is EXTRACT(YEAR FROM d) / TRIM(x FROM y), not a relation
+            if upper == 'JOIN' or not parens or parens[-1] != 'call':
+                expect_relation = True
+                from_lists.add(depth)
+            continue
+        if upper in _FROM_LIST_END:
+            from_lists.discard(depth)
+        if following.upper() == 'AS' and k + 2 < len(significant) and significant[k + 2] == '(':
+            cte_names.add(upper)
+        words.add(upper)
+
+    tables -= cte_names
+    if not tables:
+        return _reject(f"Query must use whitelisted tables: {sorted(ALLOWED_TABLES)}", statement_type, tokens)
+    disallowed = sorted(tables - ALLOWED_TABLES)
+    if disallowed:
+        return _reject(f"Table {disallowed[0]} is not whitelisted: {sorted(ALLOWED_TABLES)}",
+                       statement_type, tokens)
+    unguarded = tuple(table for table, column in YEAR_GUARDED_TABLES.items()
+                      if table in tables and column.upper() not in words)
+    return SqlVerdict(True, '', statement_type, frozenset(tables), unguarded, tokens)
@@ -0,0 +1,239 @@
+"""
+Map-reduce summarization for content too large for one completion.
+
+Consolidated report questions used to join every report into one prompt, which grew with
+the number of reports and eventually overflowed the context window. condense_documents()
+splits the documents into chunks of at most SUMMARY_CHUNK_TOKENS, extracts each chunk's key
+facts with a fixed prompt (map, at most SUMMARY_MAP_CONCURRENCY completions at a time),
+and repeats on the extracts until they fit in one chunk (reduce). The caller then writes
+the final 3-4 bullets from the condensed text with summarize_unstructured, as before.
+
+Chunk extracts go through the summary cache under a prompt that does not depend on the
+question, so a report's extracts are reused by every consolidated request that includes
+it, and an unchanged set of reports condenses without any LLM call.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from config import AZURE_OPENAI_DEPLOYMENT_NAME, SUMMARY_CHUNK_TOKENS, SUMMARY_MAP_CONCURRENCY
+from llm_client import get_llm_client, get_async_llm_client
+from summary_cache import get_summary_cache, summary_cache_key
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+|\n")
+
+EXTRACT_PROMPT = "Extract the key facts from this report section"
+EXTRACT_MAX_TOKENS = 500
+EXTRACT_TEMPERATURE = 0.0
+
+
+def _extract_messages(chunk: str) -> list:
+    return [{
+        "role": "system",
+        "content": "You condense one section of a financial or medical report for a later consolidated summary. "
+                   "List every total, amount, percentage, count and trend it states, with its period. "
+                   "Use short bullet points, keep the original figures, and add no commentary."
+    }, {
+        "role": "user",
+        "content": f"{EXTRACT_PROMPT}:\n\n{chunk}"
+    }]
+
+
+# Identifies the model and extraction template; cached extracts from another version never match
+EXTRACT_PROMPT_FINGERPRINT = hashlib.sha256(
+    f"{AZURE_OPENAI_DEPLOYMENT_NAME}|{EXTRACT_TEMPERATURE}|{EXTRACT_MAX_TOKENS}|"
+    f"{_extract_messages('{chunk}')}".encode()).hexdigest()[:16]
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, else the ~4 characters per token rule of thumb"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def split_into_chunks(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> list:
+    """
+    Splits text into chunks of at most max_tokens, breaking at paragraph, then sentence or
+    line boundaries, and only cutting mid-sentence when a single sentence is over budget.
+    """
+    chunks, current, current_tokens = [], [], 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+
+    for paragraph in _PARAGRAPH_PATTERN.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph)
+        if tokens > max_tokens:
+            flush()
+            pieces = _split_oversized(paragraph, max_tokens)
+            chunks.extend(pieces[:-1])
+            current, current_tokens = [pieces[-1]], estimate_tokens(pieces[-1])
+            continue
+        if current_tokens + tokens > max_tokens:
+            flush()
+        current.append(paragraph)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+def _split_oversized(paragraph: str, max_tokens: int) -> list:
+    pieces, current = [], ""
+    for sentence in _SENTENCE_PATTERN.split(paragraph):
+        while estimate_tokens(sentence) > max_tokens:
+            # No boundary to break at: cut at the character estimate of the budget
+            cut = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        candidate = f"{current} {sentence}".strip()
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _extract_request(chunk: str) -> dict:
+    return dict(
+        model=AZURE_OPENAI_DEPLOYMENT_NAME,
+        messages=_extract_messages(chunk),
+        max_tokens=EXTRACT_MAX_TOKENS,
+        temperature=EXTRACT_TEMPERATURE)
+
+
+def _cache_key(chunk: str):
+    return summary_cache_key(chunk, EXTRACT_PROMPT, EXTRACT_PROMPT_FINGERPRINT)
+
+
+def extract_chunk(chunk: str) -> str:
+    """Map step: the key facts of one chunk, from the summary cache when seen before"""
+    key = _cache_key(chunk)
+    cache = get_summary_cache()
+    extract = cache.get(key)
+    if extract is not None:
+        return extract
+    client = get_llm_client('summary')
+    if client is None:
+        raise RuntimeError("Azure OpenAI not configured - unable to summarize content.")
+
+    started = time.perf_counter()
+    response = client.chat.completions.create(**_extract_request(chunk))
+    extract = (response.choices[0].message.content or "").strip()
+    if extract:
+        # Every chunk shares the extraction prompt, so newer chunks must not replace older ones
+        cache.put(key, extract, (time.perf_counter() - started) * 1000, replace_older=False)
+    return extract
+
+
+async def extract_chunk_async(chunk: str) -> str:
+    """Async counterpart of extract_chunk(); the summary cache is read and written on a worker thread"""
+    key = _cache_key(chunk)
+    cache = get_summary_cache()
+    extract = await asyncio.to_thread(cache.get, key)
+    if extract is not None:
+        return extract
+    client = get_async_llm_client('summary')
+    if client is None:
+        raise RuntimeError("Azure OpenAI not configured - unable to summarize content.")
+
+    started = time.perf_counter()
+    response = await client.chat.completions.create(**_extract_request(chunk))
+    extract = (response.choices[0].message.content or "").strip()
+    if extract:
+        await asyncio.to_thread(cache.put, key, extract, (time.perf_counter() - started) * 1000,
+                                replace_older=False)
+    return extract
+
+
+def _chunk_documents(documents: list, max_tokens: int) -> list:
+    # Chunks never span documents, so each report's extracts are reusable on their own
+    return [chunk for document in documents for chunk in split_into_chunks(document, max_tokens)]
+
+
+def _fits(documents: list, max_tokens: int) -> bool:
+    return estimate_tokens("\n\n".join(documents)) <= max_tokens
+
+
+# Shared by every request, so SUMMARY_MAP_CONCURRENCY bounds map completions process-wide
+_map_pool = ThreadPoolExecutor(max_workers=max(1, SUMMARY_MAP_CONCURRENCY), thread_name_prefix='summary-map')
+
+
+def condense_documents(documents: list, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> str:
+    """
+    Returns text of at most about max_tokens to summarize in place of the joined documents:
+    the documents themselves when they already fit, otherwise their chunk extracts,
+    extracted again level by level until they fit.
+    """
+    documents = [document for document in documents if document and document.strip()]
+    level = 0
+    while not _fits(documents, max_tokens):
+        chunks = _chunk_documents(documents, max_tokens)
+        started = time.perf_counter()
+        extracts = list(_map_pool.map(extract_chunk, chunks))
+        level += 1
+        print(f"🧩 Map-reduce level {level}: {len(documents)} documents -> {len(chunks)} chunk extracts "
+              f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+        if len(chunks) == 1 or estimate_tokens("\n\n".join(extracts)) >= estimate_tokens("\n\n".join(documents)):
+            # Extraction stopped shrinking the text; summarize what there is
+            return "\n\n".join(extracts)[:max_tokens * 4]
+        documents = extracts
+    return "\n\n".join(documents)
+
+
+# asyncio.Semaphore binds to the loop it is first used on, so keep one per loop
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, SUMMARY_MAP_CONCURRENCY))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def condense_documents_async(documents: list, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> str:
+    """Async counterpart of condense_documents(), bounded per event loop"""
+    semaphore = _get_semaphore()
+
+    async def extract(chunk: str) -> str:
+        async with semaphore:
+            return await extract_chunk_async(chunk)
+
+    documents = [document for document in documents if document and document.strip()]
+    level = 0
+    while not _fits(documents, max_tokens):
+        chunks = _chunk_documents(documents, max_tokens)
+        started = time.perf_counter()
+        extracts = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+        level += 1
+        print(f"🧩 Map-reduce level {level}: {len(documents)} documents -> {len(chunks)} chunk extracts "
+              f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+        if len(chunks) == 1 or estimate_tokens("\n\n".join(extracts)) >= estimate_tokens("\n\n".join(documents)):
+            return "\n\n".join(extracts)[:max_tokens * 4]
+        documents = list(extracts)
+    return "\n\n".join(documents)
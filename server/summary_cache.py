@@ -0,0 +1,190 @@
+"""
+Persistent cache of unstructured-content summaries.
+
+The FINANCIAL_REPORTS / MEDICAL_REPORTS rows behind a summary change about once a
+quarter, so summarize_unstructured results are stored in a SQLite file (WAL mode, shared
+by every gunicorn worker) keyed by the hash of the summarized content, the normalized
+prompt and a fingerprint of the model, temperature and message template.
+
+Entries never go stale silently: when the source rows change, the content hash changes
+and the lookup misses, and storing the new summary deletes those generated from older
+content for the same prompt. The file is bounded to SUMMARY_CACHE_MAX_ENTRIES, evicting
+the least recently used summaries.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from config import SUMMARY_CACHE_ENABLED, SUMMARY_CACHE_PATH, SUMMARY_CACHE_MAX_ENTRIES
+from translation_cache import normalize_nlq
+
+
+class SummaryKey(NamedTuple):
+    cache_key: str
+    prompt_key: str
+    content_hash: str
+
+
+def summary_cache_key(content: str, summary_prompt: str, prompt_fingerprint: str) -> SummaryKey:
+    """Cache key for summarizing content with summary_prompt under the given model/prompt fingerprint"""
+    content_hash = hashlib.sha256(content.encode()).hexdigest()
+    prompt_key = hashlib.sha256(f"{prompt_fingerprint}|{normalize_nlq(summary_prompt)}".encode()).hexdigest()
+    cache_key = hashlib.sha256(f"{prompt_key}|{content_hash}".encode()).hexdigest()
+    return SummaryKey(cache_key, prompt_key, content_hash)
+
+
+class SummaryCache:
+    """SQLite-backed LRU summary store with per-process hit/miss and saved-latency counters"""
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+                 enabled: bool = SUMMARY_CACHE_ENABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'saved_llm_ms': 0.0, 'llm_ms': 0.0, 'errors': 0,
+                       'invalidated': 0, 'evicted': 0}
+        if self.enabled:
+            try:
+                self._init_schema()
+            except sqlite3.Error as e:
+                print(f"⚠️  Summary cache disabled: {e}")
+                self.enabled = False
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets worker processes read while one writes
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.db = db
+        return db
+
+    def _init_schema(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = self._db()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                cache_key TEXT PRIMARY KEY,
+                prompt_key TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                llm_ms REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS summaries_prompt_key ON summaries (prompt_key)")
+        db.execute("CREATE INDEX IF NOT EXISTS summaries_last_used_at ON summaries (last_used_at)")
+        db.commit()
+
+    def _bump(self, key: str, amount: float = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def get(self, key: SummaryKey) -> Optional[str]:
+        """Returns the cached summary for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            db = self._db()
+            row = db.execute("SELECT summary, llm_ms FROM summaries WHERE cache_key = ?",
+                             (key.cache_key,)).fetchone()
+            if row is None:
+                self._bump('misses')
+                return None
+            db.execute("UPDATE summaries SET hit_count = hit_count + 1, last_used_at = ? WHERE cache_key = ?",
+                       (time.time(), key.cache_key))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Summary cache read failed: {e}")
+            self._bump('errors')
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+            self._stats['saved_llm_ms'] += row[1]
+        return row[0]
+
+    def put(self, key: SummaryKey, summary: str, llm_ms: float, replace_older: bool = True):
+        """
+        Stores a summary with the LLM latency it took, evicting the least recently used
+        entries beyond max_entries. With replace_older, summaries of other content for the
+        same prompt are deleted, as that content has been superseded.
+        """
+        self._bump('llm_ms', llm_ms)
+        if not self.enabled:
+            return
+        try:
+            db = self._db()
+            now = time.time()
+            invalidated = 0
+            if replace_older:
+                invalidated = db.execute("DELETE FROM summaries WHERE prompt_key = ? AND content_hash != ?",
+                                         (key.prompt_key, key.content_hash)).rowcount
+            db.execute("""
+                INSERT OR REPLACE INTO summaries
+                    (cache_key, prompt_key, content_hash, summary, llm_ms, created_at, last_used_at, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            """, (key.cache_key, key.prompt_key, key.content_hash, summary, llm_ms, now, now))
+            evicted = db.execute("""
+                DELETE FROM summaries WHERE cache_key IN (
+                    SELECT cache_key FROM summaries ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (max(1, self.max_entries),)).rowcount
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Summary cache write failed: {e}")
+            self._bump('errors')
+            return
+        with self._lock:
+            self._stats['invalidated'] += invalidated
+            self._stats['evicted'] += evicted
+        if invalidated:
+            print(f"🧹 Summary cache: replaced {invalidated} summaries of changed content")
+
+    def clear(self) -> int:
+        """Deletes every stored summary; returns how many were removed"""
+        if not self.enabled:
+            return 0
+        db = self._db()
+        removed = db.execute("DELETE FROM summaries").rowcount
+        db.commit()
+        return removed
+
+    def stats(self) -> dict:
+        """Hit rate and LLM latency saved by this process, plus the shared entry count"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['saved_llm_ms'] = round(stats['saved_llm_ms'], 1)
+        stats['llm_ms'] = round(stats['llm_ms'], 1)
+        stats['enabled'] = self.enabled
+        stats['max_entries'] = self.max_entries
+        if self.enabled:
+            try:
+                stats['entries'] = self._db().execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            except sqlite3.Error:
+                stats['entries'] = None
+        return stats
+
+
+_cache: Optional[SummaryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """Returns the process-wide summary cache, opening the SQLite file on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SummaryCache()
+    return _cache
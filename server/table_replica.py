@@ -0,0 +1,348 @@
+"""
+Local replica of FINANCIAL_TRANSACTIONS and MEDICAL_RECORDS for interactive queries.
+
+Structured statements that only read these two tables can run locally instead of making a
+warehouse round trip. The replica is a SQLite file (WAL mode, shared by every gunicorn
+worker, memory-mapped with PRAGMA mmap_size) holding a copy of each table, stored in the
+order of the date column the year filters range over, with that column indexed. Statements
+from nlq_to_sql run on it through local_backend's Snowflake-to-SQLite translation, the
+same engine as SQL_BACKEND=local.
+
+A daemon thread syncs each table every REPLICA_SYNC_INTERVAL seconds, incrementally:
+  - FINANCIAL_TRANSACTIONS pulls the rows whose transaction_id is past the highest one held
+  - MEDICAL_RECORDS has no id, so the rows of the latest visit_date held are replaced by
+    everything from that date on
+Before pulling, the row count below the watermark is compared with the warehouse's. Rows
+deleted or backfilled below it, a changed column list, and every REPLICA_RELOAD_INTERVAL
+(for rows edited in place) trigger a full reload instead.
+
+REPLICA_MAX_STALENESS is the freshness SLA. A statement runs locally only while every table
+it reads synced at most that long ago, and its answer carries the sync time as as_of.
+Anything else falls back to Snowflake: other tables, a stale or failed sync, or SQL the
+translation does not support.
+"""
+
+import datetime
+import decimal
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config import (REPLICA_ENABLED, REPLICA_PATH, REPLICA_SYNC_INTERVAL, REPLICA_MAX_STALENESS,
+                    REPLICA_MMAP_BYTES, REPLICA_RELOAD_INTERVAL, SNOWFLAKE_FETCH_MAX_BYTES)
+from local_backend import translate_snowflake_sql
+from query_result import LocalAnswer
+from result_store import get_result_store
+from snowflake_connector import execute_sql, iter_sql_result, _read_preview
+from sql_validator import YEAR_GUARDED_TABLES, validate_sql
+
+# Replicated table -> (watermark column, whether rows at the watermark itself are pulled again)
+REPLICATED_TABLES = {
+    'FINANCIAL_TRANSACTIONS': ('transaction_id', False),
+    'MEDICAL_RECORDS': ('visit_date', True),
+}
+
+# Logical column types (query_result) as SQLite column affinities; numbers are settled from the first batch
+_AFFINITIES = {'number': 'REAL', 'text': 'TEXT', 'date': 'TEXT', 'timestamp': 'TEXT', 'time': 'TEXT',
+               'boolean': 'INTEGER', 'binary': 'BLOB'}
+
+
+def _local_value(value):
+    """A warehouse value as a SQLite value; dates become ISO text, which sorts and compares like a date"""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() and value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _literal(value) -> str:
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _ReloadNeeded(Exception):
+    """The local copy of a table cannot be brought up to date incrementally"""
+
+
+class TableReplica:
+    """SQLite copy of the structured tables with sync and query counters"""
+
+    def __init__(self, path: str = REPLICA_PATH, sync_interval: float = REPLICA_SYNC_INTERVAL,
+                 max_staleness: float = REPLICA_MAX_STALENESS, reload_interval: float = REPLICA_RELOAD_INTERVAL,
+                 enabled: bool = REPLICA_ENABLED):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.max_staleness = max_staleness
+        self.reload_interval = reload_interval
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'queries': 0, 'query_ms': 0.0, 'fallbacks': 0, 'stale': 0, 'not_replicated': 0,
+                       'syncs': 0, 'reloads': 0, 'rows_pulled': 0, 'sync_ms': 0.0, 'errors': 0}
+        if self.enabled:
+            try:
+                self._init_schema()
+            except sqlite3.Error as e:
+                print(f"⚠️  Table replica disabled: {e}")
+                self.enabled = False
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets every worker query while one syncs
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # isolation_level=None: the sync opens its own BEGIN IMMEDIATE, so workers sync one at a time
+            db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.execute(f"PRAGMA mmap_size = {int(REPLICA_MMAP_BYTES)}")
+            self._local.db = db
+        return db
+
+    def _init_schema(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._db().execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                table_name TEXT PRIMARY KEY,
+                synced_at REAL NOT NULL,
+                reloaded_at REAL NOT NULL,
+                row_count INTEGER NOT NULL
+            )
+        """)
+
+    def _bump(self, key: str, amount: float = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _sync_state(self) -> dict:
+        """table -> (synced_at, reloaded_at, row_count)"""
+        return {row[0]: row[1:] for row in self._db().execute(
+            "SELECT table_name, synced_at, reloaded_at, row_count FROM sync_state")}
+
+    def sync(self, table: str, force: bool = False) -> str:
+        """
+        Brings the local copy of table up to date with the warehouse if its last sync is older
+        than REPLICA_SYNC_INTERVAL (or force); returns 'fresh', 'synced' or 'reloaded'
+        """
+        with self._sync_lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have synced while this one waited for the write lock
+                state = self._sync_state().get(table)
+                started_at = time.time()
+                if not force and state is not None and started_at - state[0] < self.sync_interval:
+                    db.execute("ROLLBACK")
+                    return 'fresh'
+                started = time.perf_counter()
+                reload = state is None or started_at - state[1] >= self.reload_interval
+                if not reload:
+                    try:
+                        pulled = self._pull_new_rows(db, table)
+                    except _ReloadNeeded as e:
+                        print(f"♻️  Reloading replica of {table}: {e}")
+                        reload = True
+                if reload:
+                    pulled = self._reload(db, table)
+                row_count = db.execute(f"SELECT COUNT(*) FROM {table.lower()}").fetchone()[0]
+                db.execute("INSERT OR REPLACE INTO sync_state (table_name, synced_at, reloaded_at, row_count) "
+                           "VALUES (?, ?, ?, ?)", (table, started_at, started_at if reload else state[1], row_count))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats['syncs'] += 1
+            self._stats['reloads'] += reload
+            self._stats['rows_pulled'] += pulled
+            self._stats['sync_ms'] += elapsed_ms
+        if pulled or reload:
+            print(f"🔄 Replica {'reloaded' if reload else 'synced'} {table}: {pulled} rows pulled, "
+                  f"{row_count} held, in {elapsed_ms:.0f}ms")
+        return 'reloaded' if reload else 'synced'
+
+    def _pull_new_rows(self, db: sqlite3.Connection, table: str) -> int:
+        column, inclusive = REPLICATED_TABLES[table]
+        local_table = table.lower()
+        watermark = db.execute(f"SELECT MAX({_quote(column)}) FROM {local_table}").fetchone()[0]
+        if watermark is None:
+            raise _ReloadNeeded("no rows held")
+        # Rows below the watermark must still be the warehouse's; deletes and backfills there need a reload
+        remote = execute_sql(f"SELECT COUNT(*) FROM {table} WHERE {column} < {_literal(watermark)}",
+                             use_cache=False)[0][0]
+        held = db.execute(f"SELECT COUNT(*) FROM {local_table} WHERE {_quote(column)} < ?", (watermark,)).fetchone()[0]
+        if remote != held:
+            raise _ReloadNeeded(f"{held} rows held below {column} {watermark}, the warehouse has {remote}")
+        if inclusive:
+            db.execute(f"DELETE FROM {local_table} WHERE {_quote(column)} >= ?", (watermark,))
+        operator = '>=' if inclusive else '>'
+        return self._copy(db, table, f"SELECT * FROM {table} WHERE {column} {operator} {_literal(watermark)}",
+                          create=False)
+
+    def _reload(self, db: sqlite3.Connection, table: str) -> int:
+        # Held in date order, so the date ranges nlq_to_sql filters on read contiguous pages through the index
+        pulled = self._copy(db, table, f"SELECT * FROM {table} ORDER BY {YEAR_GUARDED_TABLES[table]}", create=True)
+        local_table = table.lower()
+        for column in {REPLICATED_TABLES[table][0], YEAR_GUARDED_TABLES[table]}:
+            db.execute(f"CREATE INDEX IF NOT EXISTS {local_table}_{column} ON {local_table} ({_quote(column)})")
+        db.execute("ANALYZE")
+        return pulled
+
+    def _copy(self, db: sqlite3.Connection, table: str, sql: str, create: bool) -> int:
+        """Inserts the rows of sql into the local table, recreating it from the result's columns if create"""
+        local_table = table.lower()
+        insert = None
+        pulled = 0
+        for columns, batch in iter_sql_result(sql):
+            if insert is None:
+                names = [column.name.lower() for column in columns]
+                if create:
+                    db.execute(f"DROP TABLE IF EXISTS {local_table}")
+                    definitions = []
+                    for index, column in enumerate(columns):
+                        affinity = _AFFINITIES.get(column.type)
+                        if column.type == 'number' and all(isinstance(row[index], int) for row in batch
+                                                           if row[index] is not None):
+                            affinity = 'INTEGER'
+                        definitions.append(f"{_quote(names[index])} {affinity or ''}".rstrip())
+                    db.execute(f"CREATE TABLE {local_table} ({', '.join(definitions)})")
+                else:
+                    held = [row[1].lower() for row in db.execute(f"PRAGMA table_info({local_table})")]
+                    if held != names:
+                        raise _ReloadNeeded(f"columns changed from {held} to {names}")
+                insert = f"INSERT INTO {local_table} VALUES ({', '.join('?' * len(names))})"
+            db.executemany(insert, ([_local_value(value) for value in row] for row in batch))
+            pulled += len(batch)
+        return pulled
+
+    def sync_all(self) -> dict:
+        """One sync pass over the replicated tables; table -> outcome, or 'error'"""
+        outcome = {}
+        for table in REPLICATED_TABLES:
+            try:
+                outcome[table] = self.sync(table)
+            except Exception as e:
+                print(f"⚠️  Replica sync of {table} failed: {e}")
+                self._bump('errors')
+                outcome[table] = 'error'
+        return outcome
+
+    def _ensure_syncer(self):
+        # Threads do not survive a fork, so a worker that inherited this object starts its own
+        if not self._stopped and (self._thread is None or not self._thread.is_alive()):
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._sync_loop, name='replica-sync', daemon=True)
+                    self._thread.start()
+
+    def _sync_loop(self):
+        while not self._stopped:
+            self.sync_all()
+            self._wakeup.wait(self.sync_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Starts the background syncer, which brings the replica up to date right away"""
+        if self.enabled:
+            self._ensure_syncer()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def answer(self, sql: str, max_rows: int) -> Optional[LocalAnswer]:
+        """
+        Runs sql on the replica when it only reads replicated tables that are within the
+        freshness SLA, shaped like fetch_sql_spooled(); None means ask the warehouse
+        """
+        if not self.enabled:
+            return None
+        self._ensure_syncer()
+        verdict = validate_sql(sql)
+        if not verdict.is_valid or not verdict.tables <= REPLICATED_TABLES.keys():
+            self._bump('not_replicated')
+            return None
+        started = time.perf_counter()
+        store = get_result_store()
+        spill = None
+        try:
+            state = self._sync_state()
+            as_of = min(state[table][0] if table in state else 0.0 for table in verdict.tables)
+            if time.time() - as_of > self.max_staleness:
+                self._bump('stale')
+                return None
+            # A spool from before the replica's last sync may be missing rows it now has
+            result_id = store.find(sql, since=as_of) if store.enabled else None
+            spill = store.spill(sql) if store.enabled and result_id is None else None
+            cur = self._db().cursor()
+            try:
+                cur.execute(translate_snowflake_sql(sql))
+                columns, rows, total_rows = _read_preview(cur, max_rows, SNOWFLAKE_FETCH_MAX_BYTES, spill)
+            finally:
+                cur.close()
+        except Exception as e:
+            if spill is not None:
+                spill.discard()
+            print(f"⚠️  Replica query failed, falling back to the warehouse: {e}")
+            self._bump('errors')
+            self._bump('fallbacks')
+            return None
+        if spill is not None:
+            result_id = spill.close(columns, total_rows)
+        with self._lock:
+            self._stats['queries'] += 1
+            self._stats['query_ms'] += (time.perf_counter() - started) * 1000
+        return LocalAnswer(columns, rows, total_rows, result_id, as_of)
+
+    def stats(self) -> dict:
+        """Query and sync counters for this process, plus each table's rows held and staleness"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_query_ms'] = round(stats.pop('query_ms') / stats['queries'], 2) if stats['queries'] else 0.0
+        stats['sync_ms'] = round(stats['sync_ms'], 1)
+        stats['enabled'] = self.enabled
+        stats['max_staleness'] = self.max_staleness
+        if self.enabled:
+            try:
+                now = time.time()
+                stats['tables'] = {table: {'rows': row_count, 'staleness_seconds': round(now - synced_at, 1)}
+                                   for table, (synced_at, _, row_count) in self._sync_state().items()}
+                stats['file_bytes'] = os.path.getsize(self.path)
+            except (sqlite3.Error, OSError):
+                stats['tables'] = None
+        return stats
+
+
+_replica: Optional[TableReplica] = None
+_replica_lock = threading.Lock()
+
+
+def get_table_replica() -> TableReplica:
+    """Returns the process-wide table replica, opening the SQLite file on first use"""
+    global _replica
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = TableReplica()
+    return _replica
@@ -0,0 +1,16 @@
+from aggregate_store import _by_value_desc
+from nlq_processor import intent_sql
+from sql_intents import SQL_INTENTS
+
+
+def test_ties_are_ordered_by_group_key_like_the_intent_sql():
+    diagnosis_trends = next(intent for intent in SQL_INTENTS if intent.name == 'diagnosis_trends')
+    assert 'ORDER BY count DESC, diagnosis' in diagnosis_trends.sql(2024)
+    rows = [('Migraine', 7), ('Asthma', 9), ('Influenza', 7), ('Fracture', 9)]
+    assert _by_value_desc(rows) == [('Asthma', 9), ('Fracture', 9), ('Influenza', 7), ('Migraine', 7)]
+
+
+def test_intent_sql_guards_unfiltered_tables_with_the_given_year():
+    revenue_by_category = next(intent for intent in SQL_INTENTS if intent.name == 'revenue_by_category')
+    sql = intent_sql(revenue_by_category, 2023)
+    assert "transaction_date >= '2023-01-01' AND transaction_date < '2024-01-01'" in sql
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import nlq_processor
+
+
+class _Cache:
+    def __init__(self, summary=None):
+        self.summary = summary
+
+    def get(self, key):
+        return self.summary
+
+    def put(self, *args):
+        pass
+
+
+def _client(text):
+    def create(stream=False, **kwargs):
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _drain(generator):
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        return stop.value
+
+
+def test_summary_cache_hits_record_no_latency(monkeypatch):
+    monkeypatch.setattr(nlq_processor, 'get_summary_cache', lambda: _Cache("- cached"))
+    monkeypatch.setattr(nlq_processor, 'summary_client', _client("- fresh"))
+    calls = []
+
+    assert nlq_processor.summarize_unstructured("content", "prompt", on_llm_call=calls.append) == "- cached"
+    assert _drain(nlq_processor.stream_summarize_unstructured("content", "prompt", on_llm_call=calls.append)) == "- cached"
+    assert calls == []
+
+
+def test_summary_llm_calls_record_latency(monkeypatch):
+    monkeypatch.setattr(nlq_processor, 'get_summary_cache', lambda: _Cache())
+    monkeypatch.setattr(nlq_processor, 'summary_client', _client("- fresh"))
+    calls = []
+
+    assert nlq_processor.summarize_unstructured("content", "prompt", on_llm_call=calls.append) == "- fresh"
+    assert _drain(nlq_processor.stream_summarize_unstructured("content", "prompt", on_llm_call=calls.append)) == "- fresh"
+    assert len(calls) == 2 and all(ms >= 0 for ms in calls)
+
+
+def test_streamed_summary_yields_the_not_configured_message(monkeypatch):
+    monkeypatch.setattr(nlq_processor, 'get_summary_cache', lambda: _Cache())
+    monkeypatch.setattr(nlq_processor, 'summary_client', None)
+
+    generator = nlq_processor.stream_summarize_unstructured("content", "prompt")
+    assert next(generator) == "Azure OpenAI not configured - unable to summarize content."
+    assert _drain(generator) == "Azure OpenAI not configured - unable to summarize content."
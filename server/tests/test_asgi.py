@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import asgi
+import snowflake_async
+
+
+class _Query:
+    query_id = '00000000-0000-0000-0000-000000000000'
+
+    def __init__(self, events):
+        self.events = events
+
+    async def wait(self, timeout=None):
+        self.events.append('running')
+        await asyncio.Event().wait()
+
+    async def cancel(self):
+        self.events.append('cancelled')
+
+    async def release(self, discard=False):
+        self.events.append('released')
+
+
+def test_client_disconnect_cancels_the_snowflake_query(monkeypatch):
+    events, sent = [], []
+
+    async def submit_sql(sql):
+        return _Query(events)
+    monkeypatch.setattr(snowflake_async, 'submit_sql', submit_sql)
+
+    async def process_nlq_async(nlq):
+        return await snowflake_async.execute_sql_async("SELECT 1", use_cache=False)
+    monkeypatch.setattr(asgi, 'process_nlq_async', process_nlq_async)
+
+    async def scenario():
+        messages = [{'type': 'http.request', 'body': json.dumps({'query': 'total revenue'}).encode()}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            while 'running' not in events:
+                await asyncio.sleep(0.001)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.wait_for(asgi.process_nlq_endpoint(receive, send), 5)
+
+    asyncio.run(scenario())
+    assert events == ['running', 'cancelled', 'released']
+    assert sent == []
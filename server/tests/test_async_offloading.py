@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import nlq_processor
+import summarizer
+
+
+class _Cache:
+    """Records the thread of every call; the loop thread must never touch it"""
+
+    def __init__(self):
+        self.threads = []
+
+    def _record(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+
+    def get(self, *args):
+        self._record()
+        return None
+
+    get_template = record_llm_call = put = learn_template = _record
+
+
+def _client(text):
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _on_loop(coroutine_function, *args):
+    async def run():
+        return threading.get_ident(), await coroutine_function(*args)
+    return asyncio.run(run())
+
+
+def test_translation_cache_is_used_off_the_event_loop(monkeypatch):
+    cache = _Cache()
+    monkeypatch.setattr(nlq_processor, 'get_translation_cache', lambda: cache)
+
+    async def generate(nlq):
+        return "SELECT category FROM financial_reports"
+    monkeypatch.setattr(nlq_processor, '_generate_sql_async', generate)
+
+    loop_thread, sql = _on_loop(nlq_processor.nlq_to_sql_async, "list the report categories of 2024")
+    assert sql == "SELECT category FROM financial_reports"
+    assert cache.threads and loop_thread not in cache.threads
+
+
+def test_summary_caches_are_used_off_the_event_loop(monkeypatch):
+    cache = _Cache()
+    monkeypatch.setattr(nlq_processor, 'get_summary_cache', lambda: cache)
+    monkeypatch.setattr(summarizer, 'get_summary_cache', lambda: cache)
+    monkeypatch.setattr(nlq_processor, 'get_async_llm_client', lambda purpose: _client('- revenue grew'))
+    monkeypatch.setattr(summarizer, 'get_async_llm_client', lambda purpose: _client('extract'))
+
+    loop_thread, summary = _on_loop(nlq_processor.summarize_unstructured_async, 'report text', 'summarize')
+    assert summary == '- revenue grew'
+    loop_thread, extract = _on_loop(summarizer.extract_chunk_async, 'chunk text')
+    assert extract == 'extract'
+    assert len(cache.threads) == 4 and loop_thread not in cache.threads
@@ -0,0 +1,21 @@
+from main import _Io, _nlq_pipeline
+from query_router import route_query
+
+
+def test_consolidated_request_naming_both_domains_reads_both_report_sets():
+    assert route_query("consolidated financial and medical highlights for 2024").report_sources == (
+        'financial_reports', 'medical_reports')
+    assert route_query("consolidated financial highlights for 2024").report_sources == ('financial_reports',)
+    assert route_query("consolidated medical highlights for 2024").report_sources == ('medical_reports',)
+
+
+def test_both_report_sets_are_one_concurrent_execute_step():
+    pipeline = _nlq_pipeline("consolidated financial and medical highlights for 2024")
+    step = next(item for item in pipeline if isinstance(item, _Io))
+    assert step.kind == 'execute'
+    statements = step.args[0]
+    assert len(statements) == 2
+    assert 'FROM financial_reports' in statements[0] and 'FROM medical_reports' in statements[1]
+
+    step = pipeline.send([[('Q1 revenue grew',)], [('Visits were stable',)]])
+    assert step.kind == 'condense' and step.args[0] == ['Q1 revenue grew', 'Visits were stable']
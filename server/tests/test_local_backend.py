@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+import local_backend
+from local_backend import ensure_seeded, seed_database, translate_snowflake_sql
+
+
+def _value(sql):
+    db = sqlite3.connect(':memory:')
+    try:
+        return db.execute(translate_snowflake_sql(sql)).fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_cast_type_arguments_are_dropped():
+    assert translate_snowflake_sql("SELECT amount::number(10,2) FROM t") == "SELECT CAST(amount AS REAL) FROM t"
+    assert _value("SELECT '12.5'::number(10, 2)") == 12.5
+
+
+@pytest.mark.parametrize('part, expected', [
+    ('year', '2024-01-01'), ('quarter', '2024-07-01'), ('month', '2024-08-01'),
+    ('week', '2024-08-12'), ('day', '2024-08-15'),
+])
+def test_date_trunc(part, expected):
+    assert _value(f"SELECT DATE_TRUNC('{part}', TO_DATE('2024-08-15'))") == expected
+
+
+def test_date_trunc_of_an_unsupported_part_is_rejected():
+    with pytest.raises(sqlite3.NotSupportedError, match='DATE_TRUNC'):
+        translate_snowflake_sql("SELECT DATE_TRUNC('hour', visit_date) FROM medical_records")
+
+
+def test_database_of_another_scale_is_kept_unless_reseeding(tmp_path, monkeypatch):
+    path = str(tmp_path / 'warehouse.sqlite3')
+    seed_database(path, transactions=10, medical_records=5, seed=1)
+    monkeypatch.setattr(local_backend, 'seed_database', lambda *args: pytest.fail('re-seeded'))
+    ensure_seeded(path, reseed=False)
+
+    reseeded = []
+    monkeypatch.setattr(local_backend, 'seed_database', reseeded.append)
+    ensure_seeded(path, reseed=True)
+    assert reseeded == [path]
@@ -0,0 +1,69 @@
+import datetime
+import decimal
+
+import pytest
+
+from query_result import Column
+from result_export import iter_export
+from result_store import ResultStore
+
+pyarrow = pytest.importorskip('pyarrow')
+
+
+def _stored_result(tmp_path, columns, rows):
+    store = ResultStore(path=str(tmp_path / 'results.sqlite3'), threshold=1)
+    spill = store.spill("SELECT * FROM FINANCIAL_TRANSACTIONS")
+    spill.add(rows)
+    result_id = spill.close(columns, len(rows))
+    assert result_id is not None
+    return store, result_id
+
+
+def _export_arrow(store, result_id):
+    columns = store.describe(result_id)['columns']
+    batches = ((columns, rows) for rows in store.iter_rows(result_id, 2))
+    return pyarrow.ipc.open_stream(b''.join(iter_export(batches, 'arrow'))).read_all()
+
+
+def test_arrow_export_of_a_stored_result_keeps_dates_and_fractions(tmp_path):
+    columns = (Column('TRANSACTION_ID', 'number', 38, 0), Column('TRANSACTION_DATE', 'date'),
+               Column('AMOUNT', 'number', 12, 2), Column('POSTED_AT', 'timestamp'))
+    rows = [(1, datetime.date(2024, 1, 5), decimal.Decimal('2'), datetime.datetime(2024, 1, 5, 9, 30)),
+            (2, datetime.date(2024, 2, 6), decimal.Decimal('2.5'), datetime.datetime(2024, 2, 6, 10, 0)),
+            (3, datetime.date(2024, 3, 7), decimal.Decimal('2.75'), None)]
+    store, result_id = _stored_result(tmp_path, columns, rows)
+
+    table = _export_arrow(store, result_id)
+
+    assert table.schema.field('TRANSACTION_DATE').type == pyarrow.date32()
+    assert table.column('TRANSACTION_DATE').to_pylist() == [row[1] for row in rows]
+    assert table.column('AMOUNT').to_pylist() == [2.0, 2.5, 2.75]
+    assert table.column('POSTED_AT').to_pylist() == [rows[0][3], rows[1][3], None]
+    assert [int(value) for value in table.column('TRANSACTION_ID').to_pylist()] == [1, 2, 3]
+
+
+def test_arrow_number_type_does_not_depend_on_the_first_batch(tmp_path):
+    # A cursor without declared scales (SQLite) whose first batch only holds whole numbers
+    columns = (Column('total', 'number'),)
+    store, result_id = _stored_result(tmp_path, columns, [(2,), (3,), (2.5,), (2.75,)])
+
+    table = _export_arrow(store, result_id)
+
+    assert table.column('total').to_pylist() == [2.0, 3.0, 2.5, 2.75]
+
+
+def test_export_without_an_llm_client_is_unavailable_not_a_bad_request(monkeypatch):
+    import app
+    import nlq_processor
+
+    def not_configured(nlq):
+        raise ValueError(nlq_processor._CLIENT_NOT_CONFIGURED)
+
+    def invalid(nlq):
+        raise ValueError("Generated SQL failed validation")
+
+    client = app.app.test_client()
+    monkeypatch.setattr(app, 'nlq_to_sql', not_configured)
+    assert client.post('/api/export', json={'query': "list the reports"}).status_code == 503
+    monkeypatch.setattr(app, 'nlq_to_sql', invalid)
+    assert client.post('/api/export', json={'query': "list the reports"}).status_code == 400
@@ -0,0 +1,42 @@
+import time
+
+from query_result import Column
+from result_store import ResultStore
+
+SQL = "SELECT patient_id, SUM(treatment_cost) FROM MEDICAL_RECORDS GROUP BY patient_id"
+COLUMNS = (Column('PATIENT_ID', 'number', 38, 0), Column('TOTAL', 'number', 12, 2))
+
+
+def _spool(store, sql=SQL):
+    spill = store.spill(sql)
+    spill.add([(patient, patient * 1.5) for patient in range(10)])
+    return spill.close(COLUMNS, 10)
+
+
+def test_reads_do_not_keep_a_spooled_result_reusable(tmp_path, monkeypatch):
+    store = ResultStore(path=str(tmp_path / 'results.sqlite3'), threshold=1, ttl=10 ** 7)
+    result_id = _spool(store)
+    assert store.find(SQL) == result_id
+
+    # Still pageable through its handle, but older than the SQL cache TTL of MEDICAL_RECORDS
+    later = time.time() + 10 ** 6
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert store.page(result_id, 0, 5) is not None
+    assert store.find(SQL) is None
+
+
+def test_find_since_skips_results_spooled_earlier(tmp_path):
+    store = ResultStore(path=str(tmp_path / 'results.sqlite3'), threshold=1)
+    result_id = _spool(store)
+    assert store.find(SQL, since=time.time() - 60) == result_id
+    assert store.find(SQL, since=time.time() + 60) is None
+
+
+def test_clear_by_table(tmp_path):
+    store = ResultStore(path=str(tmp_path / 'results.sqlite3'), threshold=1)
+    _spool(store)
+    other = _spool(store, "SELECT * FROM FINANCIAL_TRANSACTIONS")
+    assert store.clear(['medical_records']) == 1
+    assert store.find(SQL) is None
+    assert store.describe(other) is not None
+    assert store.clear() == 1
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from single_flight import SingleFlight
+
+
+def _tokens(text, started=None, release=None):
+    if started is not None:
+        started.set()
+        release.wait(5)
+    yield text
+    return text
+
+
+def test_follower_takes_over_a_stream_its_leader_abandoned():
+    group = SingleFlight('test', enabled=True, wait_timeout=5)
+    started, release = threading.Event(), threading.Event()
+    leader = group.do_stream('key', _tokens, 'summary', started, release)
+    follower_result = []
+    follower = threading.Thread(target=lambda: follower_result.append(list(group.do_stream('key', _tokens, 'summary'))))
+
+    first_token = threading.Thread(target=next, args=(leader,))
+    first_token.start()
+    started.wait(5)
+    follower.start()
+    while group.stats()['coalesced'] == 0:
+        time.sleep(0.001)
+    release.set()
+    first_token.join(5)
+    # The leader's client disconnects before the generator finishes
+    leader.close()
+    follower.join(5)
+
+    assert follower_result == [['summary']]
+    assert group.stats()['takeovers'] == 1
+    assert group.stats()['errors'] == 1
+
+
+def test_follower_stops_waiting_after_the_timeout():
+    group = SingleFlight('test', enabled=True, wait_timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=('key', lambda: release.wait(5) and 'leader'))
+    leader.start()
+    while group.stats()['executed'] == 0:
+        time.sleep(0.001)
+
+    assert group.do('key', lambda: 'follower') == 'follower'
+    assert group.stats()['wait_timeouts'] == 1
+    release.set()
+    leader.join(5)
+    assert group.stats()['in_flight'] == 0
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+
+import snowflake_async
+from snowflake_async import submit_sql
+
+QUERY_ID = str(uuid.uuid4())
+
+
+class _Cursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self.sfqid = None
+
+    def execute_async(self, sql):
+        self._connection.submitting.set()
+        self._connection.proceed.wait(5)
+        self.sfqid = QUERY_ID
+
+    def execute(self, sql):
+        self._connection.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self):
+        self.submitting, self.proceed = threading.Event(), threading.Event()
+        self.executed = []
+
+    def cursor(self):
+        return _Cursor(self)
+
+
+class _Pooled:
+    def __init__(self):
+        self.conn = _Connection()
+
+
+class _Pool:
+    def __init__(self):
+        self.acquiring, self.proceed = threading.Event(), threading.Event()
+        self.released = []
+        self.done = threading.Event()
+
+    def acquire(self):
+        self.acquiring.set()
+        self.proceed.wait(5)
+        return _Pooled()
+
+    def release(self, pooled, discard=False):
+        self.released.append(pooled)
+        self.done.set()
+
+
+async def _cancel_when(event):
+    task = asyncio.ensure_future(submit_sql("SELECT 1"))
+    await asyncio.to_thread(event.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_connection_acquired_after_cancellation_is_released(monkeypatch):
+    pool = _Pool()
+    monkeypatch.setattr(snowflake_async, 'get_pool', lambda: pool)
+
+    async def scenario():
+        await _cancel_when(pool.acquiring)
+        assert pool.released == []
+        pool.proceed.set()
+        await asyncio.to_thread(pool.done.wait, 5)
+
+    asyncio.run(scenario())
+    assert len(pool.released) == 1
+
+
+def test_statement_submitted_after_cancellation_is_cancelled_and_released(monkeypatch):
+    pool = _Pool()
+    pool.proceed.set()
+    pooled = _Pooled()
+    pool.acquire = lambda: pooled
+    monkeypatch.setattr(snowflake_async, 'get_pool', lambda: pool)
+
+    async def scenario():
+        await _cancel_when(pooled.conn.submitting)
+        pooled.conn.proceed.set()
+        await asyncio.to_thread(pool.done.wait, 5)
+
+    asyncio.run(scenario())
+    assert pool.released == [pooled]
+    assert pooled.conn.executed == [f"SELECT SYSTEM$CANCEL_QUERY('{QUERY_ID}')"]
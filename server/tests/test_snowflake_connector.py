@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+
+import pytest
+
+import snowflake_connector
+from snowflake_connector import dedicated_connection, iter_sql_result
+
+
+class _Connection:
+    def __init__(self, opened):
+        self._db = sqlite3.connect(':memory:', check_same_thread=False)
+        self.closed = False
+        opened.append(self)
+
+    def cursor(self):
+        return self._db.cursor()
+
+    def close(self):
+        self.closed = True
+        self._db.close()
+
+
+def test_exports_read_outside_the_pool(monkeypatch):
+    opened = []
+    monkeypatch.setattr(snowflake_connector, '_connect_backend', lambda: _Connection(opened))
+    monkeypatch.setattr(snowflake_connector, 'get_pool', lambda: pytest.fail('export used a pooled connection'))
+
+    batches = iter_sql_result("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 2500) "
+                              "SELECT i FROM n", batch_size=1000)
+    columns, first = next(batches)
+    assert [column.name for column in columns] == ['i'] and len(first) == 1000
+    assert sum(len(batch) for _, batch in batches) == 1500
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_export_connections_are_capped(monkeypatch):
+    monkeypatch.setattr(snowflake_connector, '_connect_backend', lambda: _Connection([]))
+    monkeypatch.setattr(snowflake_connector, '_dedicated_slots', threading.BoundedSemaphore(1))
+
+    running = iter_sql_result("SELECT 1")
+    next(running)
+    with pytest.raises(TimeoutError):
+        with dedicated_connection(timeout=0.01):
+            pass
+    running.close()
+    assert next(iter_sql_result("SELECT 3"))[1] == [(3,)]
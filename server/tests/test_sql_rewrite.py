@@ -0,0 +1,30 @@
+from sql_rewrite import add_year_guard, rewrite_date_predicates
+
+GUARD = "transaction_date >= '2024-01-01' AND transaction_date < '2025-01-01'"
+
+
+def _guard(sql):
+    return add_year_guard(sql, 'FINANCIAL_TRANSACTIONS', 'transaction_date', 2024)
+
+
+def test_year_guard_covers_every_union_branch_reading_the_table():
+    sql = ("SELECT category FROM financial_transactions WHERE amount > 0 "
+           "UNION ALL SELECT category FROM financial_transactions ORDER BY 1")
+    assert _guard(sql) == (f"SELECT category FROM financial_transactions WHERE {GUARD} AND amount > 0 "
+                           f"UNION ALL SELECT category FROM financial_transactions WHERE {GUARD} ORDER BY 1")
+
+
+def test_year_guard_skips_branches_of_other_tables():
+    sql = "SELECT title FROM financial_reports UNION SELECT description FROM financial_transactions WHERE amount < 0 OR amount > 100"
+    assert _guard(sql) == ("SELECT title FROM financial_reports UNION SELECT description FROM financial_transactions "
+                           f"WHERE {GUARD} AND (amount < 0 OR amount > 100)")
+
+
+def test_year_guard_covers_parenthesized_branches():
+    sql = "(SELECT category FROM financial_transactions) EXCEPT (SELECT category FROM financial_transactions WHERE amount < 0)"
+    assert _guard(sql).count(GUARD) == 2
+
+
+def test_year_filters_become_ranges():
+    assert (rewrite_date_predicates("SELECT SUM(amount) FROM financial_transactions WHERE YEAR(transaction_date) = 2024")
+            == f"SELECT SUM(amount) FROM financial_transactions WHERE {GUARD}")
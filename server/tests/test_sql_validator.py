@@ -0,0 +1,32 @@
+import pytest
+
+from sql_validator import validate_sql
+
+YEAR = "transaction_date >= '2024-01-01'"
+
+
+@pytest.mark.parametrize('sql', [
+    f"SELECT * FROM financial_transactions, identifier('USERS') WHERE {YEAR}",
+    "SELECT * FROM TABLE(RESULT_SCAN(LAST_QUERY_ID()))",
+    "SELECT * FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY())",
+    f"SELECT * FROM financial_transactions t JOIN identifier('USERS') u ON t.category = u.name WHERE {YEAR}",
+    f"SELECT SUM(amount) FROM otherdb.public.financial_transactions WHERE {YEAR}",
+    f"SELECT SUM(amount) FROM otherschema.financial_transactions WHERE {YEAR}",
+])
+def test_rejects_tables_read_around_the_whitelist(sql):
+    verdict = validate_sql(sql)
+    assert not verdict.is_valid
+    assert verdict.error.startswith('SECURITY ERROR')
+
+
+@pytest.mark.parametrize('sql', [
+    f"SELECT SUM(amount) FROM financial_demo.public.financial_transactions WHERE {YEAR}",
+    f"SELECT SUM(amount) FROM public.financial_transactions WHERE {YEAR}",
+    f"SELECT f.value FROM financial_transactions t, LATERAL FLATTEN(input => t.tags) f WHERE {YEAR}",
+    f"SELECT f.value FROM financial_transactions t, TABLE(FLATTEN(t.tags)) f WHERE {YEAR}",
+    f"SELECT EXTRACT(YEAR FROM transaction_date) FROM financial_transactions WHERE {YEAR}",
+])
+def test_accepts_configured_qualifiers_and_flatten(sql):
+    verdict = validate_sql(sql)
+    assert verdict.is_valid, verdict.error
+    assert verdict.tables == {'FINANCIAL_TRANSACTIONS'}
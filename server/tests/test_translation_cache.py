@@ -0,0 +1,17 @@
+from translation_cache import TranslationCache
+
+
+def test_clear_removes_translations(tmp_path):
+    cache = TranslationCache(path=str(tmp_path / 'nlq.sqlite3'), ttl=3600, enabled=True)
+    cache.put('key', "list the reports", "SELECT * FROM financial_reports", 120.0)
+
+    assert cache.clear() == 1
+    assert cache.get('key') is None
+
+
+def test_clear_reports_sqlite_errors_instead_of_raising(tmp_path):
+    cache = TranslationCache(path=str(tmp_path / 'nlq.sqlite3'), ttl=3600, enabled=True)
+    cache._db().execute("DROP TABLE translations")
+
+    assert cache.clear() == 0
+    assert cache.stats()['errors'] == 1
@@ -0,0 +1,285 @@
+"""
+Persistent cache of NLQ -> SQL translations.
+
+nlq_to_sql runs at temperature 0, so the generated SQL for a given question is stable.
+Translations are stored in a SQLite file (WAL mode) so they survive restarts and are
+shared by every gunicorn worker. Only the raw model output is cached; year injection
+and security validation still run on every request.
+
+Questions that differ only by year ("total expenses 2023" vs "2024") share a
+year-parameterized template. A template is learned from the first translation, but only
+serves new years after a later LLM translation for a different year matched the bound
+template exactly, which confirms the SQL depends on the question only through its year.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config import (NLQ_CACHE_ENABLED, NLQ_CACHE_PATH, NLQ_CACHE_TTL,
+                    NLQ_TEMPLATE_ENABLED, NLQ_TEMPLATE_MIN_CONFIRMATIONS)
+from result_cache import normalize_sql
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_YEAR_PATTERN = re.compile(r"\b(20\d{2})\b")
+_DIGIT_PATTERN = re.compile(r"\d")
+
+YEAR_PLACEHOLDER = "__YEAR__"
+
+
+def normalize_nlq(nlq: str) -> str:
+    """Lower-cases, strips punctuation and collapses whitespace"""
+    text = _PUNCTUATION_PATTERN.sub(' ', nlq.lower())
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def translation_cache_key(nlq: str, year: int, prompt_fingerprint: str) -> str:
+    """Cache key for a question: normalized text, the year it resolves to and the prompt/model it was generated with"""
+    raw = f"{prompt_fingerprint}|{year}|{normalize_nlq(nlq)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def year_template_key(nlq: str, year: int, prompt_fingerprint: str) -> Optional[str]:
+    """
+    Key of the year-parameterized template for nlq, or None when the question is not a
+    candidate: it must mention exactly one year, once, and contain no other numbers.
+    """
+    normalized = normalize_nlq(nlq)
+    if _YEAR_PATTERN.findall(normalized) != [str(year)]:
+        return None
+    nlq_template = _YEAR_PATTERN.sub(YEAR_PLACEHOLDER.lower(), normalized)
+    if _DIGIT_PATTERN.search(nlq_template):
+        return None
+    return hashlib.sha256(f"{prompt_fingerprint}|{nlq_template}".encode()).hexdigest()
+
+
+def make_sql_template(sql: str, year: int) -> Optional[str]:
+    """
+    Replaces the year literal in sql with YEAR_PLACEHOLDER. Returns None when the SQL
+    does not use the year or also references other years.
+    """
+    years = set(_YEAR_PATTERN.findall(sql))
+    if years != {str(year)}:
+        return None
+    return _YEAR_PATTERN.sub(YEAR_PLACEHOLDER, sql)
+
+
+def bind_sql_template(sql_template: str, year: int) -> str:
+    return sql_template.replace(YEAR_PLACEHOLDER, str(year))
+
+
+class TranslationCache:
+    """SQLite-backed translation store with per-process hit/miss and saved-latency counters"""
+
+    def __init__(self, path: str = NLQ_CACHE_PATH, ttl: float = NLQ_CACHE_TTL,
+                 enabled: bool = NLQ_CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'saved_llm_ms': 0.0, 'llm_ms': 0.0, 'errors': 0,
+                       'template_hits': 0, 'templates_learned': 0, 'templates_confirmed': 0,
+                       'templates_rejected': 0}
+        if self.enabled:
+            try:
+                self._init_schema()
+            except sqlite3.Error as e:
+                print(f"⚠️  NLQ translation cache disabled: {e}")
+                self.enabled = False
+
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets worker processes read while one writes
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.db = db
+        return db
+
+    def _init_schema(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = self._db()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                cache_key TEXT PRIMARY KEY,
+                nlq TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                llm_ms REAL NOT NULL,
+                created_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS year_templates (
+                template_key TEXT PRIMARY KEY,
+                sql_template TEXT NOT NULL,
+                source_year INTEGER NOT NULL,
+                llm_ms REAL NOT NULL,
+                confirmations INTEGER NOT NULL DEFAULT 0,
+                rejected INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        """)
+        db.commit()
+
+    def _bump(self, key: str, amount: float = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached SQL for key, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+        try:
+            db = self._db()
+            row = db.execute("SELECT sql, llm_ms, created_at FROM translations WHERE cache_key = ?",
+                             (key,)).fetchone()
+            if row is None or (self.ttl > 0 and time.time() - row[2] > self.ttl):
+                self._bump('misses')
+                return None
+            db.execute("UPDATE translations SET hit_count = hit_count + 1 WHERE cache_key = ?", (key,))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  NLQ translation cache read failed: {e}")
+            self._bump('errors')
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+            self._stats['saved_llm_ms'] += row[1]
+        return row[0]
+
+    def record_llm_call(self, llm_ms: float):
+        """Accounts for time actually spent waiting on the LLM"""
+        self._bump('llm_ms', llm_ms)
+
+    def put(self, key: str, nlq: str, sql: str, llm_ms: float):
+        """Stores a translation together with the LLM latency it took to produce"""
+        if not self.enabled:
+            return
+        try:
+            db = self._db()
+            db.execute("""
+                INSERT OR REPLACE INTO translations (cache_key, nlq, sql, llm_ms, created_at, hit_count)
+                VALUES (?, ?, ?, ?, ?, 0)
+            """, (key, nlq, sql, llm_ms, time.time()))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  NLQ translation cache write failed: {e}")
+            self._bump('errors')
+
+    def get_template(self, template_key: str, year: int) -> Optional[tuple[str, float]]:
+        """
+        Returns (SQL bound to year, original LLM latency) from a confirmed, unexpired
+        template, or None.
+        """
+        if not (self.enabled and NLQ_TEMPLATE_ENABLED):
+            return None
+        try:
+            row = self._db().execute("""
+                SELECT sql_template, llm_ms, created_at FROM year_templates
+                WHERE template_key = ? AND rejected = 0 AND confirmations >= ?
+            """, (template_key, NLQ_TEMPLATE_MIN_CONFIRMATIONS)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️  NLQ template read failed: {e}")
+            self._bump('errors')
+            return None
+        if row is None or (self.ttl > 0 and time.time() - row[2] > self.ttl):
+            return None
+        with self._lock:
+            self._stats['template_hits'] += 1
+            self._stats['saved_llm_ms'] += row[1]
+        return bind_sql_template(row[0], year), row[1]
+
+    def learn_template(self, template_key: str, sql: str, year: int, llm_ms: float):
+        """
+        Records an LLM translation against the question's year template: creates the
+        template on first sight, confirms it when a different year binds to the same SQL,
+        and permanently rejects it on any mismatch.
+        """
+        if not (self.enabled and NLQ_TEMPLATE_ENABLED):
+            return
+        try:
+            db = self._db()
+            row = db.execute("""
+                SELECT sql_template, source_year, rejected FROM year_templates WHERE template_key = ?
+            """, (template_key,)).fetchone()
+            if row is None:
+                sql_template = make_sql_template(sql, year)
+                if sql_template is None:
+                    return
+                db.execute("""
+                    INSERT OR IGNORE INTO year_templates
+                        (template_key, sql_template, source_year, llm_ms, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (template_key, sql_template, year, llm_ms, time.time()))
+                self._bump('templates_learned')
+            elif row[2] or row[1] == year:
+                return
+            elif normalize_sql(bind_sql_template(row[0], year)) == normalize_sql(sql):
+                db.execute("UPDATE year_templates SET confirmations = confirmations + 1 WHERE template_key = ?",
+                           (template_key,))
+                self._bump('templates_confirmed')
+            else:
+                db.execute("UPDATE year_templates SET rejected = 1 WHERE template_key = ?", (template_key,))
+                self._bump('templates_rejected')
+                print(f"⚠️  Year template rejected: translation for {year} differs from the {row[1]} template")
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  NLQ template write failed: {e}")
+            self._bump('errors')
+
+    def clear(self) -> int:
+        """Deletes every stored translation and template; returns how many translations were removed"""
+        if not self.enabled:
+            return 0
+        try:
+            db = self._db()
+            removed = db.execute("DELETE FROM translations").rowcount
+            db.execute("DELETE FROM year_templates")
+            db.commit()
+            return removed
+        except sqlite3.Error as e:
+            print(f"⚠️  NLQ translation cache clear failed: {e}")
+            self._bump('errors')
+            return 0
+
+    def stats(self) -> dict:
+        """Hit rate and LLM latency saved by this process, plus the shared entry count"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['saved_llm_ms'] = round(stats['saved_llm_ms'], 1)
+        stats['llm_ms'] = round(stats['llm_ms'], 1)
+        stats['enabled'] = self.enabled
+        if self.enabled:
+            try:
+                db = self._db()
+                stats['entries'] = db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                stats['active_templates'] = db.execute(
+                    "SELECT COUNT(*) FROM year_templates WHERE rejected = 0 AND confirmations >= ?",
+                    (NLQ_TEMPLATE_MIN_CONFIRMATIONS,)).fetchone()[0]
+            except sqlite3.Error:
+                stats['entries'] = None
+        return stats
+
+
+_cache: Optional[TranslationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> TranslationCache:
+    """Returns the process-wide translation cache, opening the SQLite file on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TranslationCache()
+    return _cache